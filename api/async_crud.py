@@ -0,0 +1,292 @@
+import base64
+from datetime import datetime, timezone
+from typing import Optional
+from sqlalchemy import select, func, or_, and_, delete, update
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import contains_eager, load_only
+from . import models, crud
+from fastapi import HTTPException
+
+# Async counterparts of the crud.py functions used on the request path.
+# Background jobs keep using the sync versions in crud.py.
+
+# User operations
+async def get_user_by_clerk_id(db: AsyncSession, clerk_id: str):
+    """Get user by Clerk ID"""
+    result = await db.execute(select(models.User).where(models.User.clerk_id == clerk_id))
+    return result.scalars().first()
+
+async def upsert_user(db: AsyncSession, user_data: dict):
+    """Insert a user by Clerk ID if it doesn't exist yet
+
+    Idempotent and safe under concurrent first requests for the same user:
+    the insert is a no-op when the clerk_id is already present.
+    """
+    values = {
+        "clerk_id": user_data.get("clerk_id"),
+        "email": user_data.get("email"),
+        "username": user_data.get("username", "User"),
+    }
+    dialect = db.bind.dialect.name
+    try:
+        if dialect == "postgresql":
+            stmt = postgresql_insert(models.User).values(**values)
+        elif dialect == "sqlite":
+            stmt = sqlite_insert(models.User).values(**values)
+        else:
+            if not await get_user_by_clerk_id(db, values["clerk_id"]):
+                db.add(models.User(**values))
+                await db.commit()
+            return
+        await db.execute(stmt.on_conflict_do_nothing(index_elements=["clerk_id"]))
+        await db.commit()
+    except SQLAlchemyError as e:
+        await db.rollback()
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+# Document operations
+async def get_document(db: AsyncSession, document_id: int):
+    """Get document by ID"""
+    return await db.get(models.Document, document_id)
+
+async def create_document(db: AsyncSession, document_data: dict, clerk_id: str):
+    """Create a document record, with its stats and ingestion job rows (see crud.create_document)"""
+    return await db.run_sync(crud.create_document, document_data, clerk_id)
+
+async def create_documents(db: AsyncSession, documents: list, clerk_id: str):
+    """Create many document records in one transaction; returns their IDs (see crud.create_documents)"""
+    return await db.run_sync(crud.create_documents, documents, clerk_id)
+
+async def get_document_summary(db: AsyncSession, document_id: int):
+    """(summary, summarized_at) of a document, or None if it doesn't exist"""
+    result = await db.execute(
+        select(models.Document.summary, models.Document.summarized_at)
+        .where(models.Document.id == document_id)
+    )
+    return result.first()
+
+async def queue_ingestion_job(db: AsyncSession, document_id: int, file_url: str, lease_seconds: float) -> bool:
+    """Queue a document's ingestion from scratch, dropping old checkpoints
+
+    False, changing nothing, while the job is queued or running under a live
+    lease (see crud._lease_lapsed); the check and the reset are one UPDATE,
+    so a process claiming the job at the same time can't be overridden.
+    """
+    try:
+        now = crud._now()
+        # Unleased; the process the request hands it to takes the lease
+        values = dict(file_url=file_url, status="queued", stage=None, pages=None, error=None, attempts=0,
+                      updated_at=now, owner=None, lease_expires_at=None)
+        if await db.get(models.IngestionJob, document_id) is None:
+            db.add(models.IngestionJob(document_id=document_id, **values))
+        else:
+            job = models.IngestionJob
+            result = await db.execute(
+                update(job)
+                .where(
+                    job.document_id == document_id,
+                    or_(job.status.notin_(("queued", "running")), crud._lease_lapsed(now, lease_seconds))
+                )
+                .values(**values)
+                .execution_options(synchronize_session=False)
+            )
+            if result.rowcount != 1:
+                await db.rollback()
+                return False
+        await db.execute(delete(models.IngestionEmbedding).where(models.IngestionEmbedding.document_id == document_id))
+        await db.commit()
+        return True
+    except SQLAlchemyError as e:
+        await db.rollback()
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+async def delete_document(db: AsyncSession, document_id: int, clerk_id: str):
+    """Delete a document if it belongs to the specified user
+
+    Uses the bulk DELETEs of crud.document_delete_statements, so chunks,
+    questions and answers are never loaded. The ingestion job is marked
+    cancelled and committed first, so a worker ingesting the document stops
+    before persisting anything (see crud.ingestion_cancelled).
+    """
+    file_size = (await db.execute(
+        select(models.Document.file_size).where(
+            models.Document.id == document_id,
+            models.Document.user_id == clerk_id
+        )
+    )).first()
+    if file_size is None:
+        return False
+    try:
+        await db.execute(
+            update(models.IngestionJob)
+            .where(models.IngestionJob.document_id == document_id)
+            .values(status="cancelled", updated_at=crud._now(), owner=None, lease_expires_at=None)
+        )
+        await db.commit()
+        question_count = (await db.execute(
+            select(func.count(models.Question.id)).where(models.Question.document_id == document_id)
+        )).scalar()
+        for stmt in crud.document_delete_statements(document_id):
+            await db.execute(stmt)
+        await db.run_sync(
+            crud.apply_user_stats_delta, clerk_id,
+            documents=-1,
+            questions=-question_count,
+            storage_bytes=-(file_size[0] or 0)
+        )
+        await db.commit()
+        return True
+    except SQLAlchemyError as e:
+        await db.rollback()
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+# Columns needed by the list view (schemas.DocumentSummary)
+DOCUMENT_SUMMARY_COLUMNS = (
+    models.Document.id,
+    models.Document.title,
+    models.Document.filename,
+    models.Document.file_size,
+    models.Document.file_type,
+    models.Document.created_at,
+)
+
+def encode_document_cursor(document) -> str:
+    """Opaque keyset cursor pointing just past ``document``"""
+    raw = f"{document.created_at.isoformat()}|{document.id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+def decode_document_cursor(cursor: str):
+    """Inverse of encode_document_cursor; raises ValueError on bad input"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+        created_at, document_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(created_at), int(document_id)
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+async def get_user_documents(
+    db: AsyncSession,
+    clerk_id: str,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    summary: bool = False
+):
+    """Get documents for a user identified by Clerk ID, newest first
+
+    Ordered by (created_at, id) so pages are stable; pass the cursor of the
+    last document seen to fetch the next page without scanning the skipped
+    rows. ``summary`` loads only the columns the list view needs.
+    """
+    stmt = (
+        select(models.Document)
+        .where(models.Document.user_id == clerk_id)
+        .order_by(models.Document.created_at.desc(), models.Document.id.desc())
+    )
+    if cursor:
+        created_at, document_id = decode_document_cursor(cursor)
+        column, value = models.Document.created_at, created_at
+        if db.bind.dialect.name == "sqlite":
+            # SQLite stores the CURRENT_TIMESTAMP default as 'YYYY-MM-DD HH:MM:SS'
+            # text but binds datetimes with microseconds; compare both in one form
+            column = func.strftime("%Y-%m-%d %H:%M:%f", column)
+            value = func.strftime("%Y-%m-%d %H:%M:%f", value)
+        stmt = stmt.where(or_(
+            column < value,
+            and_(column == value, models.Document.id < document_id)
+        ))
+    elif skip:
+        stmt = stmt.offset(skip)
+    if summary:
+        stmt = stmt.options(load_only(*DOCUMENT_SUMMARY_COLUMNS))
+    result = await db.execute(stmt.limit(limit))
+    return result.scalars().all()
+
+# Question operations
+async def create_question(db: AsyncSession, question_data: dict, clerk_id: str, owner_id: Optional[str] = None):
+    """Create a new question associated with a Clerk user ID
+
+    ``owner_id`` is the document owner's clerk ID, whose stats count the
+    question; it is looked up when not given.
+    """
+    try:
+        db_question = models.Question(
+            content=question_data.get("content"),
+            document_id=question_data.get("document_id"),
+            user_id=clerk_id
+        )
+        db.add(db_question)
+        if owner_id is None:
+            owner_id = (await db.execute(
+                select(models.Document.user_id).where(models.Document.id == db_question.document_id)
+            )).scalar()
+        if owner_id:
+            await db.run_sync(crud.apply_user_stats_delta, owner_id, questions=1)
+        await db.commit()
+        await db.refresh(db_question)
+        return db_question
+    except SQLAlchemyError as e:
+        await db.rollback()
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+async def create_questions(db: AsyncSession, document_id: int, contents: list, clerk_id: str, owner_id: str):
+    """Create several questions on one document in a single transaction"""
+    try:
+        questions = [
+            models.Question(content=content, document_id=document_id, user_id=clerk_id)
+            for content in contents
+        ]
+        db.add_all(questions)
+        if owner_id:
+            await db.run_sync(crud.apply_user_stats_delta, owner_id, questions=len(questions))
+        await db.flush()
+        ids = [question.id for question in questions]
+        await db.commit()
+        return ids
+    except SQLAlchemyError as e:
+        await db.rollback()
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+async def get_document_questions(
+    db: AsyncSession,
+    document_id: int,
+    after_id: Optional[int] = None,
+    limit: Optional[int] = None,
+    updated_since: Optional[datetime] = None
+):
+    """Get questions for a document with their answers in a single query
+
+    Questions are outer-joined to their answer and ordered by ID, so
+    ``after_id`` works as a keyset cursor. ``updated_since`` keeps only
+    questions asked or answered after that time, for pollers that only
+    need what changed.
+    """
+    stmt = (
+        select(models.Question)
+        .outerjoin(models.Question.answer)
+        .options(contains_eager(models.Question.answer))
+        .where(models.Question.document_id == document_id)
+        .order_by(models.Question.id)
+    )
+    if after_id is not None:
+        stmt = stmt.where(models.Question.id > after_id)
+    if updated_since is not None:
+        if updated_since.tzinfo is not None and db.bind.dialect.name == "sqlite":
+            # SQLite compares the stored naive UTC text and would ignore the offset
+            updated_since = updated_since.astimezone(timezone.utc).replace(tzinfo=None)
+        stmt = stmt.where(or_(
+            models.Question.created_at > updated_since,
+            models.Answer.created_at > updated_since
+        ))
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    result = await db.execute(stmt)
+    return result.scalars().all()
+
+# User stats operations
+async def get_user_stats(db: AsyncSession, user_id: str):
+    """Get statistics for a user (a primary-key lookup on user_stats)"""
+    return await db.run_sync(crud.get_user_stats, user_id)
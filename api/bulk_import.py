@@ -0,0 +1,130 @@
+"""Import a directory or zip archive of PDFs for one user
+
+Files are uploaded to UploadThing in batches (one presign call per batch,
+parallel uploads), recorded as documents and ingested in this process
+through the same ingestion queue the API uses. Prints per-file status and
+aggregate throughput.
+
+    python -m api.bulk_import --user user_123 ./archive.zip --batch-size 50
+"""
+import argparse
+import os
+import time
+import zipfile
+from concurrent.futures import wait
+
+from dotenv import load_dotenv
+
+from . import crud
+from .database import SessionLocal
+from .ingestion import IngestionQueue, INGESTION_WORKERS
+from .observability import configure_logging
+from .uploadthing import upload_files, UPLOAD_CONCURRENCY
+
+
+def iter_pdfs(path: str):
+    """(name, read_bytes) for every PDF in a directory tree or zip archive"""
+    if zipfile.is_zipfile(path):
+        archive = zipfile.ZipFile(path)
+        for info in archive.infolist():
+            if not info.is_dir() and info.filename.lower().endswith(".pdf"):
+                yield info.filename, (lambda info=info: archive.read(info))
+        return
+    for root, _, filenames in os.walk(path):
+        for filename in sorted(filenames):
+            if filename.lower().endswith(".pdf"):
+                full_path = os.path.join(root, filename)
+                yield os.path.relpath(full_path, path), (lambda full_path=full_path: _read_file(full_path))
+
+
+def _read_file(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _batches(items, size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def bulk_import(path: str, clerk_id: str, api_key: str, batch_size: int = 50,
+                concurrency: int = UPLOAD_CONCURRENCY, workers: int = INGESTION_WORKERS, ingest: bool = True):
+    """Upload and ingest every PDF under ``path``; returns a summary dict"""
+    db = SessionLocal()
+    queue = IngestionQueue(workers)
+    jobs = {}
+    totals = {"files": 0, "uploaded": 0, "failed": 0, "bytes": 0}
+    start = time.perf_counter()
+    try:
+        crud.get_or_create_user(db, {"clerk_id": clerk_id, "email": f"{clerk_id}@example.com"})
+        for batch in _batches(iter_pdfs(path), batch_size):
+            files = [(os.path.basename(name), read(), "application/pdf") for name, read in batch]
+            results = upload_files(api_key, files, concurrency)
+            uploaded = [result for result in results if result["status"] == "uploaded"]
+            document_ids = crud.create_documents(db, [
+                {
+                    "title": result["fileName"],
+                    "filename": result["fileName"],
+                    "fileUrl": result["fileUrl"],
+                    "key": result["key"],
+                    "fileSize": result["fileSize"],
+                    "fileType": result["fileType"],
+                }
+                for result in uploaded
+            ], clerk_id)
+            for result, document_id in zip(uploaded, document_ids):
+                if ingest:
+                    jobs[queue.submit(document_id, result["fileUrl"])] = (document_id, result["fileName"])
+            for (name, _), result in zip(batch, results):
+                print(f"{result['status']:<8} {name} ({result['fileSize']} bytes, {result['seconds']}s)"
+                      + (f": {result['error']}" if result.get("error") else ""))
+            totals["files"] += len(results)
+            totals["uploaded"] += len(uploaded)
+            totals["failed"] += len(results) - len(uploaded)
+            totals["bytes"] += sum(result["fileSize"] for result in uploaded)
+        totals["upload_seconds"] = round(time.perf_counter() - start, 3)
+
+        for future in wait(jobs).done:
+            document_id, name = jobs[future]
+            error = future.exception()
+            print(f"{'ingested' if error is None else 'error':<8} {name} (document {document_id})"
+                  + (f": {error}" if error else ""))
+        totals["ingested"] = len(jobs)
+        totals["total_seconds"] = round(time.perf_counter() - start, 3)
+        return totals
+    finally:
+        queue.shutdown()
+        db.close()
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    configure_logging()
+    parser = argparse.ArgumentParser(description="Upload and ingest a directory or zip archive of PDFs")
+    parser.add_argument("path", help="directory or .zip archive")
+    parser.add_argument("--user", required=True, help="Clerk ID of the owner")
+    parser.add_argument("--batch-size", type=int, default=50, help="files per presign call")
+    parser.add_argument("--concurrency", type=int, default=UPLOAD_CONCURRENCY, help="parallel uploads")
+    parser.add_argument("--workers", type=int, default=INGESTION_WORKERS, help="ingestion threads")
+    parser.add_argument("--no-ingest", action="store_true", help="upload and record documents only")
+    args = parser.parse_args()
+
+    api_key = os.getenv("UPLOADTHING_API_KEY")
+    if not api_key:
+        parser.error("UPLOADTHING_API_KEY is not set")
+    totals = bulk_import(args.path, args.user, api_key, args.batch_size, args.concurrency,
+                         args.workers, ingest=not args.no_ingest)
+
+    upload_seconds = totals["upload_seconds"] or 1e-9
+    print(f"\n{totals['uploaded']}/{totals['files']} uploaded, {totals['failed']} failed, "
+          f"{totals['bytes'] / 1e6:.1f} MB in {totals['upload_seconds']}s "
+          f"({totals['uploaded'] / upload_seconds:.1f} files/s, {totals['bytes'] / 1e6 / upload_seconds:.2f} MB/s)")
+    if totals["ingested"]:
+        print(f"{totals['ingested']} ingested, {totals['total_seconds']}s total "
+              f"({totals['ingested'] / totals['total_seconds']:.2f} documents/s)")
@@ -1,10 +1,12 @@
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, defer
 from sqlalchemy.exc import SQLAlchemyError
 from . import models, schemas
 from fastapi import HTTPException
 import json
+from datetime import datetime, timedelta, timezone
 
-from sqlalchemy import func 
+from sqlalchemy import func, update, delete, select, or_, and_
+from sqlalchemy.exc import IntegrityError
 # User operations
 def create_user(db: Session, user_data: dict):
     """Create a new user with Clerk ID"""
@@ -60,6 +62,9 @@ def create_document(db: Session, document_data: dict, clerk_id: str):
             user_id=clerk_id
         )
         db.add(db_document)
+        apply_user_stats_delta(db, clerk_id, documents=1, storage_bytes=db_document.file_size or 0)
+        db.flush()
+        add_ingestion_jobs(db, [db_document])
         db.commit()
         db.refresh(db_document)
         return db_document
@@ -67,27 +72,109 @@ def create_document(db: Session, document_data: dict, clerk_id: str):
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
+def create_documents(db: Session, documents: list, clerk_id: str):
+    """Create many document records for a user in one transaction; returns their IDs"""
+    if not documents:
+        return []
+    try:
+        db_documents = [
+            models.Document(
+                title=data.get("title", data.get("filename", "Untitled Document")),
+                filename=data.get("filename"),
+                file_url=data.get("fileUrl"),
+                file_key=data.get("key"),
+                file_size=data.get("fileSize"),
+                file_type=data.get("fileType"),
+                user_id=clerk_id
+            )
+            for data in documents
+        ]
+        db.add_all(db_documents)
+        apply_user_stats_delta(
+            db, clerk_id,
+            documents=len(db_documents),
+            storage_bytes=sum(d.file_size or 0 for d in db_documents)
+        )
+        db.flush()
+        add_ingestion_jobs(db, db_documents)
+        ids = [d.id for d in db_documents]
+        db.commit()
+        return ids
+    except SQLAlchemyError as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
 def get_document(db: Session, document_id: int):
     """Get document by ID"""
     return db.query(models.Document).filter(models.Document.id == document_id).first()
 
+def set_document_summary(db: Session, document_id: int, summary: str):
+    """Store a document's generated summary"""
+    try:
+        db.execute(
+            update(models.Document)
+            .where(models.Document.id == document_id)
+            .values(summary=summary, summarized_at=func.now())
+        )
+        db.commit()
+    except SQLAlchemyError as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+def get_document_summary(db: Session, document_id: int):
+    """A document's stored summary, or None"""
+    return db.query(models.Document.summary).filter(models.Document.id == document_id).scalar()
+
 def get_user_documents(db: Session, clerk_id: str, skip: int = 0, limit: int = 100):
     """Get all documents for a user identified by Clerk ID"""
     return db.query(models.Document).filter(models.Document.user_id == clerk_id).offset(skip).limit(limit).all()
 
+def document_delete_statements(document_id: int):
+    """Bulk DELETEs that remove a document and everything under it
+
+    Children go first, so this doesn't depend on ON DELETE CASCADE (which
+    SQLite only enforces with PRAGMA foreign_keys) and never loads the rows.
+    """
+    question_ids = select(models.Question.id).where(models.Question.document_id == document_id)
+    statements = [
+        delete(models.Answer).where(models.Answer.question_id.in_(question_ids)),
+        delete(models.Question).where(models.Question.document_id == document_id),
+        delete(models.DocumentChunk).where(models.DocumentChunk.document_id == document_id),
+        delete(models.IngestionEmbedding).where(models.IngestionEmbedding.document_id == document_id),
+        delete(models.IngestionJob).where(models.IngestionJob.document_id == document_id),
+        delete(models.Document).where(models.Document.id == document_id),
+    ]
+    return [stmt.execution_options(synchronize_session=False) for stmt in statements]
+
 def delete_document(db: Session, document_id: int, clerk_id: str):
     """Delete a document if it belongs to the specified user"""
-    db_document = db.query(models.Document).filter(
+    file_size = db.query(models.Document.file_size).filter(
         models.Document.id == document_id,
         models.Document.user_id == clerk_id
     ).first()
     
-    if not db_document:
+    if file_size is None:
         return False
     
-    db.delete(db_document)
-    db.commit()
-    return True
+    # Committed on its own, so the document's ingestion stops before persisting anything
+    cancel_ingestion_job(db, document_id)
+    try:
+        question_count = db.query(func.count(models.Question.id)).filter(
+            models.Question.document_id == document_id
+        ).scalar()
+        for stmt in document_delete_statements(document_id):
+            db.execute(stmt)
+        apply_user_stats_delta(
+            db, clerk_id,
+            documents=-1,
+            questions=-question_count,
+            storage_bytes=-(file_size[0] or 0)
+        )
+        db.commit()
+        return True
+    except SQLAlchemyError as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
 # This should be in your crud.py file
 def create_document_chunk(db, document_id, chunk_index, content, embedding=None):
@@ -103,11 +190,368 @@ def create_document_chunk(db, document_id, chunk_index, content, embedding=None)
     db.refresh(db_chunk)
     return db_chunk
     
-def get_document_chunks(db: Session, document_id: int):
-    """Get all chunks for a document"""
-    return db.query(models.DocumentChunk).filter(
+def create_document_chunks(db: Session, document_id: int, chunks: list):
+    """Insert many chunks for a document in a single transaction
+
+    ``chunks`` is a list of dicts with chunk_index, content and embedding.
+    """
+    try:
+        db.add_all([
+            models.DocumentChunk(document_id=document_id, **chunk)
+            for chunk in chunks
+        ])
+        db.commit()
+    except SQLAlchemyError as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+def get_document_chunks(db: Session, document_id: int, embeddings: bool = True):
+    """Get all chunks for a document
+
+    ``embeddings=False`` leaves out the embedding JSON, for callers that
+    search the memory-mapped vectors and fetch embeddings with
+    get_chunk_embeddings only when those are missing.
+    """
+    query = db.query(models.DocumentChunk).filter(models.DocumentChunk.document_id == document_id)
+    if not embeddings:
+        query = query.options(defer(models.DocumentChunk.embedding))
+    return query.order_by(models.DocumentChunk.chunk_index).all()
+
+def get_chunk_embeddings(db: Session, chunk_ids: list, batch_size: int = 1000):
+    """{chunk id: row with embedding, embedding_model and embedding_version}"""
+    rows = {}
+    for start in range(0, len(chunk_ids), batch_size):
+        rows.update((row.id, row) for row in db.query(
+            models.DocumentChunk.id,
+            models.DocumentChunk.embedding,
+            models.DocumentChunk.embedding_model,
+            models.DocumentChunk.embedding_version
+        ).filter(models.DocumentChunk.id.in_(chunk_ids[start:start + batch_size])))
+    return rows
+
+def get_document_chunk_ids(db: Session, document_id: int):
+    """IDs of a document's chunks, in chunk order"""
+    return [row[0] for row in db.query(models.DocumentChunk.id).filter(
         models.DocumentChunk.document_id == document_id
-    ).order_by(models.DocumentChunk.chunk_index).all()
+    ).order_by(models.DocumentChunk.chunk_index).all()]
+
+def replace_document_chunks(db: Session, document_id: int, chunks: list, unless_cancelled: bool = False):
+    """Swap a document's chunks for new ones in a single transaction
+
+    Readers see either the old chunks or the new ones, never a mix. With
+    ``unless_cancelled``, nothing is written and False is returned if the
+    document was deleted during its ingestion.
+    """
+    try:
+        db.query(models.DocumentChunk).filter(
+            models.DocumentChunk.document_id == document_id
+        ).delete()
+        if unless_cancelled and ingestion_cancelled(db, document_id, for_update=True):
+            db.rollback()
+            return False
+        db.add_all([
+            models.DocumentChunk(document_id=document_id, **chunk)
+            for chunk in chunks
+        ])
+        db.commit()
+        return True
+    except SQLAlchemyError as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+def has_document_chunks(db: Session, document_id: int) -> bool:
+    return db.query(models.DocumentChunk.id).filter(
+        models.DocumentChunk.document_id == document_id
+    ).first() is not None
+
+def create_placeholder_chunk(db: Session, document_id: int, content: str):
+    """Store a chunk explaining why a document has no usable content
+
+    Skipped when the document already has chunks, so a failed re-processing
+    leaves the previous ones in place, and when it was deleted meanwhile.
+    """
+    if has_document_chunks(db, document_id) or ingestion_cancelled(db, document_id):
+        return None
+    return create_document_chunk(db, document_id, 0, content)
+
+# Ingestion jobs (see api/ingestion.py)
+def _now():
+    return datetime.now(timezone.utc)
+
+def add_ingestion_jobs(db: Session, documents):
+    """Queue ingestion jobs for the PDFs among flushed ``documents`` (not committed)"""
+    db.add_all([
+        models.IngestionJob(document_id=d.id, file_url=d.file_url, status="queued", updated_at=_now())
+        for d in documents if d.file_type == "application/pdf"
+    ])
+
+# Jobs the sweeper resumes once their lease lapses
+UNFINISHED_INGESTION_STATUSES = ("queued", "running", "retrying")
+
+def cancel_ingestion_job(db: Session, document_id: int):
+    """Mark a document's job cancelled, before the document is deleted (committed)
+
+    Its worker checks for this before persisting chunks, checkpoints and
+    vector files (see ingestion_cancelled).
+    """
+    try:
+        db.execute(
+            update(models.IngestionJob)
+            .where(models.IngestionJob.document_id == document_id)
+            .values(status="cancelled", updated_at=_now(), owner=None, lease_expires_at=None)
+        )
+        db.commit()
+    except SQLAlchemyError as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+def ingestion_cancelled(db: Session, document_id: int, for_update: bool = False) -> bool:
+    """Whether the document's job was cancelled or the document deleted
+
+    With ``for_update`` the job row is locked (where the database supports
+    it) until the caller's transaction ends, so a delete waits for what the
+    caller writes in it and then removes that too. On SQLite, call it after
+    the transaction's first write so a delete committed before is seen.
+    """
+    query = select(models.IngestionJob.status).where(models.IngestionJob.document_id == document_id)
+    if for_update:
+        query = query.with_for_update()
+    status = db.execute(query).scalar()
+    if status is not None:
+        return status == "cancelled"
+    # Documents ingested without a job (re-embedding, benchmarks) only count once deleted
+    return db.get(models.Document, document_id) is None
+
+def _lease_lapsed(now: datetime, lease_seconds: float):
+    """Condition on IngestionJob: no live process holds the lease
+
+    Jobs that were never leased (just created or requeued) get ``lease_seconds``
+    from their ``updated_at`` for their process to take the lease.
+    """
+    job = models.IngestionJob
+    return or_(
+        job.lease_expires_at < now,
+        and_(job.lease_expires_at.is_(None), job.updated_at < now - timedelta(seconds=lease_seconds))
+    )
+
+def start_ingestion_job(db: Session, document_id: int, file_url: str, owner: str, lease_seconds: float):
+    """Take the job's lease for ``owner``, mark it running and count the attempt
+
+    Returns the job, or None when another live process holds its lease or
+    the job was cancelled. Creates the job for documents uploaded before jobs were tracked.
+    """
+    try:
+        if db.get(models.IngestionJob, document_id) is None:
+            db.add(models.IngestionJob(document_id=document_id, file_url=file_url, attempts=0, updated_at=_now()))
+            db.flush()
+        now = _now()
+        job = models.IngestionJob
+        result = db.execute(
+            update(job)
+            .where(
+                job.document_id == document_id,
+                job.status != "cancelled",
+                or_(job.owner.is_(None), job.owner == owner, _lease_lapsed(now, lease_seconds))
+            )
+            .values(
+                file_url=file_url, status="running", attempts=job.attempts + 1, updated_at=now,
+                owner=owner, lease_expires_at=now + timedelta(seconds=lease_seconds)
+            )
+        )
+        db.commit()
+        if result.rowcount != 1:
+            return None
+        return db.get(models.IngestionJob, document_id, populate_existing=True)
+    except SQLAlchemyError as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+def renew_ingestion_leases(db: Session, owner: str, document_ids, lease_seconds: float):
+    """Extend ``owner``'s leases on the unfinished jobs of ``document_ids``
+
+    Unleased jobs among them are taken; jobs another process took over are left alone.
+    """
+    if not document_ids:
+        return
+    try:
+        job = models.IngestionJob
+        db.execute(
+            update(job)
+            .where(
+                job.document_id.in_(list(document_ids)),
+                job.status.in_(("queued", "running")),
+                or_(job.owner.is_(None), job.owner == owner)
+            )
+            .values(owner=owner, lease_expires_at=_now() + timedelta(seconds=lease_seconds))
+        )
+        db.commit()
+    except SQLAlchemyError as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+def checkpoint_ingestion_pages(db: Session, document_id: int, pages: list):
+    """Store the extracted pages (dicts with page_content and metadata)
+
+    Returns False, storing nothing, if the job was cancelled.
+    """
+    try:
+        result = db.execute(
+            update(models.IngestionJob)
+            .where(models.IngestionJob.document_id == document_id, models.IngestionJob.status != "cancelled")
+            .values(pages=pages, stage="extracted", updated_at=_now())
+        )
+        db.commit()
+        return result.rowcount == 1
+    except SQLAlchemyError as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+def get_ingestion_pages(db: Session, document_id: int):
+    """Pages checkpointed by an earlier attempt, or None"""
+    return db.query(models.IngestionJob.pages).filter(
+        models.IngestionJob.document_id == document_id
+    ).scalar()
+
+def get_ingestion_embeddings(db: Session, document_id: int):
+    """{embedding_key: embedding JSON} checkpointed by earlier attempts"""
+    return dict(db.query(models.IngestionEmbedding.key, models.IngestionEmbedding.embedding).filter(
+        models.IngestionEmbedding.document_id == document_id
+    ).all())
+
+def checkpoint_ingestion_embeddings(db: Session, document_id: int, rows: list):
+    """Commit a batch of (embedding_key, embedding JSON) and touch the job
+
+    Returns False, storing nothing, if the document was deleted meanwhile.
+    """
+    try:
+        db.execute(models.IngestionEmbedding.__table__.insert(), [
+            {"document_id": document_id, "key": key, "embedding": embedding}
+            for key, embedding in rows
+        ])
+        if ingestion_cancelled(db, document_id, for_update=True):
+            db.rollback()
+            return False
+        db.execute(
+            update(models.IngestionJob)
+            .where(models.IngestionJob.document_id == document_id)
+            .values(stage="embedding", updated_at=_now())
+        )
+        db.commit()
+        return True
+    except SQLAlchemyError as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+def finish_ingestion_job(db: Session, document_id: int, status: str, error: str = None):
+    """Record the outcome (done or failed), release the lease and drop the job's checkpoints
+
+    Returns False if the job was cancelled or deleted with its document.
+    """
+    try:
+        result = db.execute(
+            update(models.IngestionJob)
+            .where(models.IngestionJob.document_id == document_id, models.IngestionJob.status != "cancelled")
+            .values(status=status, stage=None, pages=None, error=error, updated_at=_now(),
+                    owner=None, lease_expires_at=None)
+        )
+        db.execute(delete(models.IngestionEmbedding).where(models.IngestionEmbedding.document_id == document_id))
+        db.commit()
+        return result.rowcount == 1
+    except SQLAlchemyError as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+def retry_ingestion_job(db: Session, document_id: int, error: str, delay: float):
+    """Release a failed attempt's lease so the job is claimed again after ``delay`` seconds
+
+    The job keeps its checkpoints; ``retrying`` jobs aren't renewed by the
+    heartbeat of the queue they failed in.
+    """
+    try:
+        now = _now()
+        db.execute(
+            update(models.IngestionJob)
+            .where(models.IngestionJob.document_id == document_id, models.IngestionJob.status != "cancelled")
+            .values(status="retrying", error=error, updated_at=now, owner=None,
+                    lease_expires_at=now + timedelta(seconds=delay))
+        )
+        db.commit()
+    except SQLAlchemyError as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+def get_reclaimable_ingestion_jobs(db: Session, lease_seconds: float, limit: int = 100):
+    """(document_id, file_url) of unfinished jobs whose lease has lapsed"""
+    return db.query(
+        models.IngestionJob.document_id,
+        models.IngestionJob.file_url
+    ).filter(
+        models.IngestionJob.status.in_(UNFINISHED_INGESTION_STATUSES),
+        _lease_lapsed(_now(), lease_seconds)
+    ).order_by(models.IngestionJob.updated_at).limit(limit).all()
+
+def claim_ingestion_job(db: Session, document_id: int, owner: str, lease_seconds: float) -> bool:
+    """Take over a job whose lease has lapsed; False if another process got it first"""
+    try:
+        now = _now()
+        result = db.execute(
+            update(models.IngestionJob)
+            .where(
+                models.IngestionJob.document_id == document_id,
+                models.IngestionJob.status.in_(UNFINISHED_INGESTION_STATUSES),
+                _lease_lapsed(now, lease_seconds)
+            )
+            .values(status="queued", updated_at=now, owner=owner,
+                    lease_expires_at=now + timedelta(seconds=lease_seconds))
+        )
+        db.commit()
+        return result.rowcount == 1
+    except SQLAlchemyError as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+def _stale_chunk_filter(model: str, version: str):
+    # Chunks stored without an embedding (placeholders and error messages)
+    # were never embedded, so re-embedding leaves them alone
+    return and_(
+        models.DocumentChunk.embedding.isnot(None),
+        or_(
+            models.DocumentChunk.embedding_model.is_(None),
+            models.DocumentChunk.embedding_version.is_(None),
+            models.DocumentChunk.embedding_model != model,
+            models.DocumentChunk.embedding_version != version,
+        )
+    )
+
+def get_stale_chunks(db: Session, model: str, version: str, after_id: int = 0, limit: int = 64, document_id: int = None):
+    """Chunks not embedded with ``model``/``version``, in ID order after ``after_id``"""
+    query = db.query(models.DocumentChunk).filter(
+        _stale_chunk_filter(model, version),
+        models.DocumentChunk.id > after_id
+    )
+    if document_id is not None:
+        query = query.filter(models.DocumentChunk.document_id == document_id)
+    return query.order_by(models.DocumentChunk.id).limit(limit).all()
+
+def count_stale_chunks(db: Session, model: str, version: str):
+    return db.query(func.count(models.DocumentChunk.id)).filter(
+        _stale_chunk_filter(model, version)
+    ).scalar()
+
+def update_chunk_embeddings(db: Session, rows: list):
+    """Bulk-update chunk embeddings by primary key and commit
+
+    ``rows`` is a list of dicts with id, embedding, embedding_model and
+    embedding_version.
+    """
+    if not rows:
+        return
+    try:
+        db.execute(update(models.DocumentChunk), rows)
+        db.commit()
+    except SQLAlchemyError as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
 # Question operations
 def create_question(db: Session, question_data: dict, clerk_id: str):
@@ -119,6 +563,12 @@ def create_question(db: Session, question_data: dict, clerk_id: str):
             user_id=clerk_id
         )
         db.add(db_question)
+        # Questions count towards the owner of the document they're asked about
+        owner_id = db.query(models.Document.user_id).filter(
+            models.Document.id == db_question.document_id
+        ).scalar()
+        if owner_id:
+            apply_user_stats_delta(db, owner_id, questions=1)
         db.commit()
         db.refresh(db_question)
         return db_question
@@ -140,7 +590,8 @@ def create_answer(db: Session, answer_data: dict):
     try:
         db_answer = models.Answer(
             content=answer_data.get("content"),
-            question_id=answer_data.get("question_id")
+            question_id=answer_data.get("question_id"),
+            sources=answer_data.get("sources")
         )
         db.add(db_answer)
         db.commit()
@@ -150,32 +601,109 @@ def create_answer(db: Session, answer_data: dict):
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
+def create_answers(db: Session, answers: list):
+    """Insert many answers (dicts with content, question_id and sources) in one commit"""
+    try:
+        db.add_all([
+            models.Answer(
+                content=answer.get("content"),
+                question_id=answer.get("question_id"),
+                sources=answer.get("sources")
+            )
+            for answer in answers
+        ])
+        db.commit()
+    except SQLAlchemyError as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
 def get_answer_by_question(db: Session, question_id: int):
     """Get the answer for a specific question"""
     return db.query(models.Answer).filter(models.Answer.question_id == question_id).first()
 
-# Then fix the get_user_stats function:
-def get_user_stats(db, user_id):
-    """Get statistics for a user"""
-    # Count documents
-    document_count = db.query(models.Document).filter(
+# User stats operations
+def compute_user_stats(db: Session, user_id: str):
+    """Aggregate a user's stats from the source tables (slow path)"""
+    document_count, storage_bytes = db.query(
+        func.count(models.Document.id),
+        func.coalesce(func.sum(models.Document.file_size), 0)
+    ).filter(
         models.Document.user_id == user_id
-    ).count()
+    ).one()
     
-    # Count questions
-    question_count = db.query(models.Question).join(
+    # Count questions asked about the user's documents
+    question_count = db.query(func.count(models.Question.id)).join(
         models.Document, models.Question.document_id == models.Document.id
     ).filter(
         models.Document.user_id == user_id
-    ).count()
-    
-    # Sum file sizes
-    # Fix: Use func from sqlalchemy instead of db.func
-    result = db.query(func.sum(models.Document.file_size)).filter(
-        models.Document.user_id == user_id
     ).scalar()
     
-    total_storage_used = result or 0
+    return {
+        "document_count": document_count,
+        "question_count": question_count,
+        "storage_bytes": int(storage_bytes),
+    }
+
+def apply_user_stats_delta(db: Session, user_id: str, documents: int = 0, questions: int = 0, storage_bytes: int = 0):
+    """Adjust a user's stats counters inside the caller's transaction
+
+    The caller commits. If the user has no stats row yet it is seeded from
+    the source tables, which already include the caller's flushed changes.
+    """
+    db.flush()
+    increment = (
+        update(models.UserStats)
+        .where(models.UserStats.user_id == user_id)
+        .values(
+            document_count=models.UserStats.document_count + documents,
+            question_count=models.UserStats.question_count + questions,
+            storage_bytes=models.UserStats.storage_bytes + storage_bytes,
+        )
+    )
+    if db.execute(increment).rowcount:
+        return
+    try:
+        # The seed is inserted in a savepoint (begin_nested), so losing the
+        # race below rolls back only the insert, not the caller's changes
+        with db.begin_nested():
+            db.add(models.UserStats(user_id=user_id, **compute_user_stats(db, user_id)))
+    except IntegrityError:
+        # A concurrent writer committed a seed first. It was computed in its
+        # own transaction without our uncommitted changes, so apply the
+        # delta to its row
+        db.execute(increment)
+
+def reconcile_user_stats(db: Session, user_id: str = None):
+    """Recompute stats from the source tables and repair any drift
+
+    Reconciles one user, or every user when ``user_id`` is None. Returns the
+    number of stats rows that were created or corrected.
+    """
+    if user_id is None:
+        user_ids = [row[0] for row in db.query(models.User.clerk_id).all()]
+    else:
+        user_ids = [user_id]
+    
+    repaired = 0
+    for uid in user_ids:
+        actual = compute_user_stats(db, uid)
+        stats = db.get(models.UserStats, uid)
+        if stats is None:
+            db.add(models.UserStats(user_id=uid, **actual))
+            repaired += 1
+        elif (stats.document_count, stats.question_count, stats.storage_bytes) != (
+            actual["document_count"], actual["question_count"], actual["storage_bytes"]
+        ):
+            stats.document_count = actual["document_count"]
+            stats.question_count = actual["question_count"]
+            stats.storage_bytes = actual["storage_bytes"]
+            repaired += 1
+        db.commit()
+    return repaired
+
+def format_user_stats(stats):
+    """Shape a UserStats row into the /api/stats response"""
+    total_storage_used = stats.storage_bytes or 0
     
     # Convert bytes to appropriate unit
     storage_unit = "B"
@@ -192,8 +720,16 @@ def get_user_stats(db, user_id):
         storage_unit = "GB"
     
     return {
-        "documentCount": document_count,
-        "questionCount": question_count,
+        "documentCount": stats.document_count,
+        "questionCount": stats.question_count,
         "totalStorageUsed": round(total_storage_used, 2),
         "storageUnit": storage_unit
-    }
\ No newline at end of file
+    }
+
+def get_user_stats(db, user_id):
+    """Get statistics for a user from the maintained counters"""
+    stats = db.get(models.UserStats, user_id)
+    if stats is None:
+        reconcile_user_stats(db, user_id)
+        stats = db.get(models.UserStats, user_id)
+    return format_user_stats(stats)
@@ -1,6 +1,8 @@
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
 import os
 from dotenv import load_dotenv
 
@@ -13,6 +15,30 @@ if not DATABASE_URL:
     DATABASE_URL = "sqlite:///./pdfetch.db"
     print(f"Warning: DATABASE_URL not set. Using SQLite database at {DATABASE_URL}")
 
+
+def get_async_database_url(url: str) -> str:
+    """Map a sync DATABASE_URL onto its async driver (aiosqlite / asyncpg)"""
+    if url.startswith("sqlite+aiosqlite:") or url.startswith("postgresql+asyncpg:"):
+        return url
+    if url.startswith("sqlite:"):
+        return url.replace("sqlite:", "sqlite+aiosqlite:", 1)
+
+    parts = urlsplit(url)
+    if parts.scheme not in ("postgres", "postgresql", "postgresql+psycopg2"):
+        return url
+
+    # asyncpg does not understand libpq-only query options
+    query = []
+    for key, value in parse_qsl(parts.query):
+        if key == "sslmode":
+            query.append(("ssl", value))
+        elif key != "channel_binding":
+            query.append((key, value))
+    return urlunsplit(("postgresql+asyncpg", parts.netloc, parts.path, urlencode(query), parts.fragment))
+
+
+ASYNC_DATABASE_URL = get_async_database_url(DATABASE_URL)
+
  
 engine = create_engine(
     DATABASE_URL, 
@@ -21,6 +47,21 @@ engine = create_engine(
  
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engine used by the request path so DB calls don't block the event loop
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    pool_pre_ping=not ASYNC_DATABASE_URL.startswith("sqlite"),
+)
+
+# expire_on_commit=False: attributes of committed objects stay readable after
+# commit, since async sessions can't lazily refresh them during serialization
+AsyncSessionLocal = async_sessionmaker(
+    async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False,
+)
+
  
 Base = declarative_base()
 
@@ -30,4 +71,8 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
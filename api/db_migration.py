@@ -2,10 +2,40 @@ from sqlalchemy import create_engine, text
 from dotenv import load_dotenv
 from api.models import Base
 from api.database import engine
+from api.migrations import run_migrations, pending_migrations
+from api.database import SessionLocal
+from api import crud
+from api.observability import configure_logging
+import argparse
 import os
 
 load_dotenv()
 
+def migrate_database():
+    """Apply pending schema migrations without touching existing data"""
+    pending = pending_migrations(engine)
+    if not pending:
+        print("Database schema is up to date.")
+        return
+    run_migrations(engine)
+    print(f"Applied {len(pending)} migration(s).")
+
+def migration_status():
+    pending = pending_migrations(engine)
+    if not pending:
+        print("Database schema is up to date.")
+    for version, description, _ in pending:
+        print(f"Pending migration {version}: {description}")
+
+def reconcile_stats():
+    """Recompute every user's stats counters and repair any drift"""
+    db = SessionLocal()
+    try:
+        repaired = crud.reconcile_user_stats(db)
+        print(f"Reconciled user stats, {repaired} row(s) repaired.")
+    finally:
+        db.close()
+
 def reset_database():
     # WARNING: This will delete all data!
     print("WARNING: This will delete all data in the database!")
@@ -17,11 +47,25 @@ def reset_database():
     
     print("Dropping all tables...")
     Base.metadata.drop_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE IF EXISTS schema_migrations"))
     
     print("Creating tables with new schema...")
-    Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
     
     print("Database reset complete!")
 
 if __name__ == "__main__":
-    reset_database()
\ No newline at end of file
+    configure_logging()
+    parser = argparse.ArgumentParser(description="Manage the PDFetch database schema")
+    parser.add_argument("command", nargs="?", default="migrate", choices=["migrate", "status", "reset", "reconcile-stats"])
+    args = parser.parse_args()
+
+    if args.command == "reset":
+        reset_database()
+    elif args.command == "reconcile-stats":
+        reconcile_stats()
+    elif args.command == "status":
+        migration_status()
+    else:
+        migrate_database()
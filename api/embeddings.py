@@ -0,0 +1,106 @@
+import hashlib
+import os
+import threading
+
+from .cache import TTLCache
+from .observability import record_cache
+
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+# Bump when vectors from the same model name change (revision, normalization,
+# pooling); chunks embedded under another model or version are stale
+EMBEDDING_VERSION = os.getenv("EMBEDDING_VERSION", "1")
+# huggingface: sentence-transformers on PyTorch. onnx: the same model on ONNX
+# Runtime (api/onnx_embeddings.py); its vectors are interchangeable, so
+# switching doesn't make stored chunks stale
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "huggingface")
+
+# Question embeddings kept per process, keyed by model and normalized text
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "4096"))
+
+_embeddings = None
+_lock = threading.Lock()
+_query_cache = TTLCache(maxsize=QUERY_CACHE_SIZE)
+
+def get_embeddings():
+    """Shared embedding model, loaded on first use
+
+    Importing langchain_huggingface pulls in sentence-transformers and torch
+    (onnxruntime for EMBEDDING_BACKEND=onnx), so it is deferred until
+    something actually needs to embed text.
+    """
+    global _embeddings
+    if _embeddings is None:
+        with _lock:
+            if _embeddings is None:
+                _embeddings = load_embeddings(EMBEDDING_BACKEND)
+    return _embeddings
+
+def load_embeddings(backend: str):
+    """A new embedding model for ``backend`` (huggingface or onnx)"""
+    if backend == "onnx":
+        from .onnx_embeddings import OnnxEmbeddings
+        return OnnxEmbeddings(EMBEDDING_MODEL)
+    if backend != "huggingface":
+        raise ValueError(f"Unknown EMBEDDING_BACKEND: {backend}")
+    from langchain_huggingface import HuggingFaceEmbeddings
+    return HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL)
+
+def embeddings_loaded() -> bool:
+    return _embeddings is not None
+
+def set_embeddings(embeddings):
+    """Replace the shared embedding model (benchmarks, local runs)
+
+    Pass None to load the default model again on next use.
+    """
+    global _embeddings
+    _embeddings = embeddings
+    _query_cache.clear()
+
+def is_current(model, version):
+    """Whether vectors tagged with ``model``/``version`` match the active model"""
+    return model == EMBEDDING_MODEL and version == EMBEDDING_VERSION
+
+def embedding_key(text: str) -> str:
+    """Identifies the embedding of ``text`` by the active model and version"""
+    return hashlib.sha256(f"{EMBEDDING_MODEL}\0{EMBEDDING_VERSION}\0{text}".encode()).hexdigest()
+
+def normalize_query(text: str) -> str:
+    """Case- and whitespace-insensitive form of a question
+
+    The default model lowercases its input anyway, so questions that differ
+    only in case or spacing share one embedding.
+    """
+    return " ".join(text.split()).casefold()
+
+def embed_queries(texts):
+    """Embeddings of questions, served from the LRU where possible
+
+    Misses are embedded in one batch (normalized, so the cached vector is
+    exactly what the key describes) and cached. Lookups are counted in
+    pdfetch_cache_requests_total{cache="query_embedding"}.
+    """
+    keys = [(EMBEDDING_MODEL, EMBEDDING_VERSION, normalize_query(text)) for text in texts]
+    vectors = [_query_cache.get(key) for key in keys]
+    missing = {}
+    for i, (key, vector) in enumerate(zip(keys, vectors)):
+        record_cache("query_embedding", vector is not None)
+        if vector is None:
+            missing.setdefault(key, []).append(i)
+    if missing:
+        embeddings = get_embeddings()
+        queries = [key[2] for key in missing]
+        if len(queries) == 1:
+            new_vectors = [embeddings.embed_query(queries[0])]
+        else:
+            # sentence-transformers embeds queries and documents the same way
+            new_vectors = embeddings.embed_documents(queries)
+        for (key, positions), vector in zip(missing.items(), new_vectors):
+            _query_cache.set(key, vector)
+            for i in positions:
+                vectors[i] = vector
+    return vectors
+
+def warm_query_cache(texts):
+    """Embed ``texts`` (e.g. the suggested questions) ahead of time"""
+    embed_queries(texts)
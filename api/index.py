@@ -1,22 +1,68 @@
-from fastapi import FastAPI, HTTPException, File, UploadFile, Depends, BackgroundTasks, Header, Request
+from fastapi import FastAPI, HTTPException, File, UploadFile, Depends, BackgroundTasks, Header, Request, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import PlainTextResponse
+from contextlib import asynccontextmanager
 import os
 from dotenv import load_dotenv
 import requests
-from typing import Any, Dict, List, Optional
-from sqlalchemy.orm import Session
+import base64
+import time
+from datetime import datetime
+from typing import List, Literal, Optional, Union
+from sqlalchemy.ext.asyncio import AsyncSession
 import json
-
-from .database import engine, get_db, Base
-from . import models, schemas, crud
-from .pdf_processor import process_pdf_file, answer_question, create_vector_store
-
-# Create database tables
-models.Base.metadata.create_all(bind=engine)
+import logging
+import asyncio
+
+from .database import engine, get_async_db, SessionLocal
+from . import schemas, crud, async_crud
+from .cache import TTLCache
+from .migrations import run_migrations
+from .observability import configure_logging, render_metrics, record_cache, trace, monitor_event_loop_lag, REQUEST_SECONDS, ANSWER_QUEUE_DEPTH
+from .pdf_processor import answer_question, answer_questions
+from .ingestion import enqueue_document, cleanup_document, run_sweeper, INGESTION_LEASE_SECONDS, INGESTION_SWEEP_INTERVAL
+from .responses import ListSerializer, json_list_response
+from .ratelimit import check_rate_limit, admit_ingestion, admit_questions, upload_limiter, ask_limiter
+from .summarizer import is_summary_question
+from .suggestions import SUGGESTED_QUESTIONS, WARM_SUGGESTIONS, warm_suggestions, warm_suggestions_once
+from .uploadthing import presign_files, upload_file, upload_files, UploadThingError
 
 load_dotenv()
 
-app = FastAPI()
+configure_logging()
+logger = logging.getLogger("pdfetch.api")
+
+# Schema changes are applied by `python -m api.db_migration migrate` at deploy
+# time. Local SQLite setups migrate on startup instead; never at import time,
+# which would add a DB round-trip to every serverless cold start.
+AUTO_MIGRATE = os.getenv("AUTO_MIGRATE", "1" if engine.dialect.name == "sqlite" else "0") == "1"
+
+# Seconds between event-loop lag probes; 0 disables the monitor
+EVENT_LOOP_LAG_INTERVAL = float(os.getenv("EVENT_LOOP_LAG_INTERVAL", "0.5"))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if AUTO_MIGRATE:
+        await run_in_threadpool(run_migrations, engine)
+    if WARM_SUGGESTIONS == "startup":
+        # Not awaited: loading the embedding model mustn't hold up startup
+        asyncio.get_running_loop().run_in_executor(None, warm_suggestions)
+    lag_monitor = None
+    if EVENT_LOOP_LAG_INTERVAL > 0:
+        lag_monitor = asyncio.create_task(monitor_event_loop_lag(EVENT_LOOP_LAG_INTERVAL))
+    # Resumes ingestion jobs left unfinished by a crashed or restarted worker
+    sweeper = None
+    if INGESTION_SWEEP_INTERVAL > 0:
+        sweeper = asyncio.create_task(run_sweeper(INGESTION_SWEEP_INTERVAL))
+    yield
+    if lag_monitor:
+        lag_monitor.cancel()
+    if sweeper:
+        sweeper.cancel()
+
+app = FastAPI(lifespan=lifespan)
 
 # Configure CORS
 app.add_middleware(
@@ -27,6 +73,38 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Responses smaller than this many bytes aren't worth compressing
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1000"))
+try:
+    # Optional: brotli for clients that accept it, gzip for the rest
+    from brotli_asgi import BrotliMiddleware
+    app.add_middleware(BrotliMiddleware, minimum_size=COMPRESSION_MIN_SIZE, gzip_fallback=True)
+except ImportError:
+    app.add_middleware(GZipMiddleware, minimum_size=COMPRESSION_MIN_SIZE)
+
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # Label by route template, not raw path, to keep cardinality bounded
+        route = request.scope.get("route")
+        REQUEST_SECONDS.observe(
+            time.perf_counter() - start,
+            method=request.method,
+            route=getattr(route, "path", "unmatched"),
+            status=status
+        )
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus text-format metrics for this worker process"""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
 # Dependency to get user clerk ID from authorization header
 async def get_current_user_id(authorization: Optional[str] = Header(None)):
     if not authorization or not authorization.startswith("Bearer "):
@@ -44,128 +122,91 @@ async def get_current_user_id(authorization: Optional[str] = Header(None)):
     except Exception as e:
         raise HTTPException(status_code=401, detail=str(e))
 
-# For development/testing, this allows specifying the user ID directly
-async def get_user_id(request: Request, db: Session = Depends(get_db)):
-    # Default test user ID
-    default_user_id = "user_test123"
-    
-    # Try to get from header first
+# Resolved bearer tokens -> clerk_id, and clerk_ids already upserted, so
+# authenticated requests on the hot path make no extra DB round-trips
+AUTH_CACHE_TTL = float(os.getenv("AUTH_CACHE_TTL", "300"))
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "10000"))
+_token_cache = TTLCache(maxsize=AUTH_CACHE_SIZE, ttl=AUTH_CACHE_TTL)
+_known_users = TTLCache(maxsize=AUTH_CACHE_SIZE)
+
+# /api/stats responses; entries are dropped when this process changes them
+STATS_CACHE_TTL = float(os.getenv("STATS_CACHE_TTL", "30"))
+_stats_cache = TTLCache(maxsize=AUTH_CACHE_SIZE, ttl=STATS_CACHE_TTL)
+
+def _parse_token(token: str):
+    """Extract the clerk ID (``sub`` claim) and expiry from a bearer token
+
+    Falls back to the ``<user_id>|...`` development token format when the
+    token isn't a decodable JWT.
+    """
     try:
-        auth_header = request.headers.get("Authorization")
-        if auth_header and auth_header.startswith("Bearer "):
-            token = auth_header.split(" ")[1]
-     
-            try:
-                # Split on periods to get the payload section of the JWT
-                payload_b64 = token.split('.')[1]
-                
-                 
-                padding = '=' * (4 - len(payload_b64) % 4) if len(payload_b64) % 4 != 0 else ''
-                payload_b64 += padding
-                
-         
-                import base64
-                import json
-                payload_json = base64.b64decode(payload_b64).decode('utf-8')
-                payload = json.loads(payload_json)
-                
-                # Extract the subject claim (user ID)
-                clerk_id = payload.get('sub')
-                
-                if not clerk_id:
-                
-                    clerk_id = token.split("|")[0] if "|" in token else token
-            except Exception as e:
-              
-                print(f"Error parsing JWT: {e}")
-                clerk_id = token.split("|")[0] if "|" in token else token
-            
- 
-            user = crud.get_user_by_clerk_id(db, clerk_id)
-            if not user: 
-                try:
-                    user = crud.create_user(db, {
-                        "clerk_id": clerk_id,
-                        "email": f"{clerk_id}@example.com",  
-                        "username": "User"
-                    })
-                except Exception as user_err:
-                    print(f"Error creating user: {user_err}")
-            
-            if user:
-                print(f"Using clerk_id from token: {clerk_id}")
-                return clerk_id
+        # Split on periods to get the payload section of the JWT
+        payload_b64 = token.split('.')[1]
+        payload_b64 += '=' * (-len(payload_b64) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(payload_b64).decode('utf-8'))
+        clerk_id = payload.get('sub')
+        if clerk_id:
+            return clerk_id, payload.get('exp')
     except Exception as e:
-        print(f"Error getting user from token: {str(e)}")
-    
-   
-    user_id = request.headers.get("x-user-id", default_user_id)
-    
-    # Ensure user exists
+        logger.warning("Error parsing JWT: %s", e)
+    return (token.split("|")[0] if "|" in token else token), None
+
+async def _ensure_user(db: AsyncSession, clerk_id: str, username: str) -> bool:
+    """Create the user row once per process; returns False if that failed"""
+    if clerk_id in _known_users:
+        return True
     try:
-        user = crud.get_user_by_clerk_id(db, user_id)
-        if not user:
-            user = crud.create_user(db, {
-                "clerk_id": user_id,
-                "email": f"{user_id}@example.com",
-                "username": "Test User"
-            })
+        await async_crud.upsert_user(db, {
+            "clerk_id": clerk_id,
+            "email": f"{clerk_id}@example.com",
+            "username": username
+        })
     except Exception as e:
-        print(f"Error with test user: {str(e)}")
-    
-    print(f"Using default or x-user-id: {user_id}")
-    return user_id
+        logger.error("Error creating user: %s", e)
+        return False
+    _known_users.set(clerk_id, True)
+    return True
+
+# For development/testing, this allows specifying the user ID directly
+async def get_user_id(request: Request, db: AsyncSession = Depends(get_async_db)):
     # Default test user ID
     default_user_id = "user_test123"
     
     # Try to get from header first
-    try:
-        auth_header = request.headers.get("Authorization")
-        if auth_header and auth_header.startswith("Bearer "):
-            token = auth_header.split(" ")[1]
-            
-            clerk_id = token.split("|")[0] if "|" in token else token
-            
-            # Ensure user exists in our database
-            user = crud.get_user_by_clerk_id(db, clerk_id)
-            if not user:
-                # Create the user
-                try:
-                    user = crud.create_user(db, {
-                        "clerk_id": clerk_id,
-                        "email": f"{clerk_id}@example.com",  # Placeholder
-                        "username": "User"
-                    })
-                except Exception as user_err:
-                    print(f"Error creating user: {user_err}")
-            
-            if user:
-                print(f"Using clerk_id from token: {clerk_id}")
-                return clerk_id
-    except Exception as e:
-        print(f"Error getting user from token: {str(e)}")
+    auth_header = request.headers.get("Authorization")
+    if auth_header and auth_header.startswith("Bearer "):
+        token = auth_header.split(" ")[1]
+
+        clerk_id = _token_cache.get(token)
+        record_cache("auth", clerk_id is not None)
+        if clerk_id:
+            return clerk_id
+
+        clerk_id, expires_at = _parse_token(token)
+        if await _ensure_user(db, clerk_id, "User"):
+            # Never keep a token cached past its own expiry
+            ttl = AUTH_CACHE_TTL
+            if expires_at:
+                ttl = min(ttl, max(float(expires_at) - time.time(), 0.0))
+            if ttl > 0:
+                _token_cache.set(token, clerk_id, ttl=ttl)
+            return clerk_id
     
-   
     user_id = request.headers.get("x-user-id", default_user_id)
-    
- 
-    try:
-        user = crud.get_user_by_clerk_id(db, user_id)
-        if not user:
-            user = crud.create_user(db, {
-                "clerk_id": user_id,
-                "email": f"{user_id}@example.com",
-                "username": "Test User"
-            })
-    except Exception as e:
-        print(f"Error with test user: {str(e)}")
-    
-    print(f"Using default or x-user-id: {user_id}")
+    await _ensure_user(db, user_id, "Test User")
     return user_id
 @app.get("/api/hello")
 async def hello():
     return {"message": "Hello from FastAPI"}
 
+@app.get("/api/suggested-questions")
+async def suggested_questions():
+    """Canned questions the document page offers; their embeddings are precomputed"""
+    return {"questions": SUGGESTED_QUESTIONS}
+
+# Files accepted per /api/upload/batch request
+UPLOAD_BATCH_MAX_FILES = int(os.getenv("UPLOAD_BATCH_MAX_FILES", "100"))
+
 async def get_upload_thing_api_key():
     api_key = os.getenv("UPLOADTHING_API_KEY")
     if not api_key:
@@ -176,100 +217,31 @@ async def get_upload_thing_api_key():
 @app.post("/api/upload")
 async def upload_file_via_uploadthing(
     file: UploadFile = File(...),
-    background_tasks: BackgroundTasks = None,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user_id: str = Depends(get_user_id)
 ):
-    print(f"Received file upload request from frontend. User ID: {current_user_id}")
-    print(f"Frontend file details: filename={file.filename}, content_type={file.content_type}")
+    logger.info("Upload request user=%s filename=%s content_type=%s", current_user_id, file.filename, file.content_type)
+    admit_ingestion()
+    check_rate_limit(upload_limiter, current_user_id)
 
     try:
         api_key = await get_upload_thing_api_key()
-        print(f"Retrieved UploadThing API Key.")
     except HTTPException as e:
-        print(f"Error retrieving API key: {e.detail}")
+        logger.error("Error retrieving API key: %s", e.detail)
         raise
 
     file_content = await file.read()
     file_size = len(file_content)
-    print(f"Read file content. Size: {file_size} bytes")
-
-    uploadthing_api_url = "https://uploadthing.com/api/uploadFiles"
-
-    headers = {
-        "x-uploadthing-api-key": api_key,
-        "x-uploadthing-version": "6.4.0",
-        "Content-Type": "application/json"
-    }
-
-    request_body = {
-        "files": [
-            {
-                "name": file.filename,
-                "size": file_size,
-                "type": file.content_type,
-                "acl": "public-read",
-                "contentDisposition": "inline"
-            }
-        ]
-    }
-
-    print(f"Making request to UploadThing API: {uploadthing_api_url}")
-    print(f"With payload: {request_body}")
+    logger.debug("Read file content. Size: %d bytes", file_size)
 
     try:
-        presigned_response = requests.post(
-            uploadthing_api_url,
-            headers=headers,
-            json=request_body
-        )
+        presigned = await run_in_threadpool(presign_files, api_key, [
+            {"name": file.filename, "size": file_size, "type": file.content_type}
+        ])
+        file_data = presigned[0]
 
-        print(f"UploadThing API response status: {presigned_response.status_code}")
-
-        if not presigned_response.ok:
-            print(f"UploadThing API error response: {presigned_response.text}")
-            raise HTTPException(
-                status_code=presigned_response.status_code,
-                detail=f"UploadThing error: {presigned_response.text}"
-            )
-
-        response_data = presigned_response.json()
-        print(f"UploadThing API response data: {response_data}")
-
-        if not response_data.get("data") or len(response_data["data"]) == 0:
-            raise HTTPException(
-                status_code=500,
-                detail="Invalid response from UploadThing API: no data returned"
-            ) 
-        file_data = response_data["data"][0] 
-        presigned_url = file_data.get("url")
-        fields = file_data.get("fields", {})
-
-        if not presigned_url or not fields:
-            raise HTTPException(
-                status_code=500,
-                detail="Missing presigned URL information in UploadThing response"
-            )
- 
-        upload_files = {
-            "file": (file.filename, file_content, file.content_type)}
-
-        print(f"Uploading to presigned URL: {presigned_url}")
-
-        s3_response = requests.post(
-            presigned_url,
-            data=fields,  
-            files=upload_files  
-        )
-
-        print(f"S3 upload response status: {s3_response.status_code}")
-
-        if not s3_response.ok:
-            print(f"S3 upload error: {s3_response.text}")
-            raise HTTPException(
-                status_code=s3_response.status_code,
-                detail=f"File upload to storage failed: {s3_response.text}"
-            )
+        logger.debug("Uploading to presigned URL: %s", file_data.get("url"))
+        await run_in_threadpool(upload_file, file_data, file.filename, file_content, file.content_type)
 
         # Create document record in database
         upload_result = {
@@ -282,16 +254,12 @@ async def upload_file_via_uploadthing(
         }
         
    
-        document = crud.create_document(db, upload_result, current_user_id)
+        document = await async_crud.create_document(db, upload_result, current_user_id)
+        _stats_cache.pop(current_user_id)
         
-        # Process PDF in background 
-        if file.content_type == "application/pdf" and background_tasks:
-            background_tasks.add_task(
-                process_pdf_and_store, 
-                document.id, 
-                file_data.get("fileUrl"), 
-                db
-            )
+        # Process PDF on the ingestion queue
+        if file.content_type == "application/pdf":
+            enqueue_document(document.id, file_data.get("fileUrl"))
  
         return {
             "success": True,
@@ -303,156 +271,176 @@ async def upload_file_via_uploadthing(
             "fileType": file.content_type,
         }
 
+    except UploadThingError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
     except requests.exceptions.RequestException as e:
-        print(f"Request error: {str(e)}")
+        logger.error("Request error: %s", e)
         raise HTTPException(
             status_code=500,
             detail=f"Error during API request: {str(e)}"
         )
     except Exception as e:
-        print(f"Unexpected error: {str(e)}")
+        logger.exception("Unexpected error during upload: %s", e)
         raise HTTPException(
             status_code=500,
             detail=f"An unexpected error occurred: {str(e)}"
         )
 
-async def process_pdf_and_store(document_id: int, file_url: str, db: Session):
-    """Process a PDF and store its chunks in the database"""
+@app.post("/api/upload/batch", response_model=schemas.BatchUploadResponse)
+async def upload_files_via_uploadthing(
+    files: List[UploadFile] = File(...),
+    db: AsyncSession = Depends(get_async_db),
+    current_user_id: str = Depends(get_user_id)
+):
+    """Upload many files in one request
+
+    The whole batch is presigned with one UploadThing call and uploaded to
+    storage in parallel; document rows are created in one transaction and
+    PDFs go to the ingestion queue. A file that fails to upload is reported
+    in its status without failing the rest of the batch.
+    """
+    if len(files) > UPLOAD_BATCH_MAX_FILES:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {UPLOAD_BATCH_MAX_FILES} files per batch"
+        )
+    admit_ingestion(len(files))
+    check_rate_limit(upload_limiter, current_user_id, cost=len(files))
+    api_key = await get_upload_thing_api_key()
+    logger.info("Batch upload request user=%s files=%d", current_user_id, len(files))
+
+    start = time.perf_counter()
+    contents = [(file.filename, await file.read(), file.content_type) for file in files]
     try:
-        print(f"Starting background PDF processing for document {document_id}")
-        print(f"File URL: {file_url}")
-        
-        document = crud.get_document(db, document_id)
-        if not document:
-            print(f"Document {document_id} not found")
-            return
-        
-     
-        if not file_url.startswith('http'):
-            print(f"Warning: Invalid file URL format: {file_url}")
-         
-            alternate_urls = [document.file_url]
-            
-         
-            if hasattr(document, 'file_key') and document.file_key:
-           
-                if 'utfs.io' in file_url:
-                    alternate_urls.append(f"https://utfs.io/f/{document.file_key}")
-            
-            
-            for alt_url in alternate_urls:
-                if alt_url and alt_url.startswith('http') and alt_url != file_url:
-                    print(f"Trying alternate URL: {alt_url}")
-                    file_url = alt_url
-                    break
-         
-        pdf_text = process_pdf_file(file_url)
-        
-        if not pdf_text:
-            print(f"Failed to extract text from PDF (document_id: {document_id})")
- 
-            crud.create_document_chunk(
-                db=db,
-                document_id=document_id,
-                chunk_index=0,
-                content="Failed to extract text from this PDF. The file may be corrupted, password-protected, or in an unsupported format.",
-                embedding=None
-            )
-            return
-            
-   
-        vector_store = create_vector_store(pdf_text, document_id, db)
-        
-        if vector_store:
-            print(f"Successfully processed document {document_id}")
-        else:
-            print(f"Document {document_id} was processed, but vector store creation may have failed. Check if chunks were stored in the database.")
-            
-    except Exception as e:
-        print(f"Error processing PDF (document_id: {document_id}): {str(e)}")
-        
-        try:
-            crud.create_document_chunk(
-                db=db,
-                document_id=document_id,
-                chunk_index=0,
-                content=f"Error processing document: {str(e)}",
-                embedding=None
-            )
-        except Exception as db_error:
-            print(f"Failed to store error chunk: {str(db_error)}")
-@app.get("/api/documents", response_model=List[schemas.DocumentResponse])
+        results = await run_in_threadpool(upload_files, api_key, contents)
+    except UploadThingError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    except requests.exceptions.RequestException as e:
+        logger.error("Request error: %s", e)
+        raise HTTPException(status_code=500, detail=f"Error during API request: {str(e)}")
+
+    uploaded = [result for result in results if result["status"] == "uploaded"]
+    document_ids = await async_crud.create_documents(db, [
+        {
+            "title": result["fileName"],
+            "filename": result["fileName"],
+            "fileUrl": result["fileUrl"],
+            "key": result["key"],
+            "fileSize": result["fileSize"],
+            "fileType": result["fileType"],
+        }
+        for result in uploaded
+    ], current_user_id)
+    _stats_cache.pop(current_user_id)
+
+    for result, document_id in zip(uploaded, document_ids):
+        result["documentId"] = document_id
+        if result["fileType"] == "application/pdf":
+            enqueue_document(document_id, result["fileUrl"])
+            result["status"] = "queued"
+
+    seconds = time.perf_counter() - start
+    total_bytes = sum(result["fileSize"] for result in uploaded)
+    return {
+        "success": len(uploaded) == len(results),
+        "uploaded": len(uploaded),
+        "failed": len(results) - len(uploaded),
+        "totalBytes": total_bytes,
+        "seconds": round(seconds, 3),
+        "bytesPerSecond": round(total_bytes / seconds, 1) if seconds else 0.0,
+        "files": results,
+    }
+
+_documents = ListSerializer(schemas.DocumentResponse)
+_document_summaries = ListSerializer(schemas.DocumentSummary)
+_questions = ListSerializer(schemas.QuestionWithAnswer)
+
+@app.get(
+    "/api/documents",
+    response_model=Union[List[schemas.DocumentResponse], List[schemas.DocumentSummary]]
+)
 async def get_documents(
+    request: Request,
     skip: int = 0, 
-    limit: int = 100,
-    db: Session = Depends(get_db),
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = None,
+    view: Literal["full", "summary"] = "full",
+    db: AsyncSession = Depends(get_async_db),
     current_user_id: str = Depends(get_user_id)
 ):
-    """Get all documents for the current user"""
-    documents = crud.get_user_documents(db, current_user_id, skip, limit)
-    return documents
+    """Get documents for the current user, newest first
+
+    Pass the ``X-Next-Cursor`` header of a page back as ``cursor`` to get the
+    next one. ``view=summary`` returns only the fields the list view needs.
+    Responses carry an ETag; polling with If-None-Match gets a 304 while
+    nothing has changed.
+    """
+    summary = view == "summary"
+    try:
+        documents = await async_crud.get_user_documents(
+            db, current_user_id, skip, limit, cursor=cursor, summary=summary
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    headers = {}
+    if len(documents) == limit:
+        headers["X-Next-Cursor"] = async_crud.encode_document_cursor(documents[-1])
+    serializer = _document_summaries if summary else _documents
+    return json_list_response(request, serializer, documents, headers)
 
 @app.get("/api/documents/{document_id}", response_model=schemas.DocumentResponse)
 async def get_document(
     document_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user_id: str = Depends(get_user_id)
 ):
     """Get a single document by ID"""
-    document = crud.get_document(db, document_id)
+    document = await async_crud.get_document(db, document_id)
     if not document:
         raise HTTPException(status_code=404, detail="Document not found")
     
- 
-    print(f"Serving document {document_id} to user {current_user_id}, document owner: {document.user_id}")
-    return document
-    """Get a single document by ID"""
-    document = crud.get_document(db, document_id)
-    if not document:
-        raise HTTPException(status_code=404, detail="Document not found")
- 
-    print(f"Serving document {document_id} to user {current_user_id}, document owner: {document.user_id}")
+    logger.debug("Serving document %s to user %s, document owner: %s", document_id, current_user_id, document.user_id)
     return document
 
-    """Get a single document by ID"""
-    document = crud.get_document(db, document_id)
-    if not document:
-        raise HTTPException(status_code=404, detail="Document not found")
- 
-    return document
-
- 
-    """Get a single document by ID"""
-    document = crud.get_document(db, document_id)
-    if not document:
+@app.get("/api/documents/{document_id}/summary", response_model=schemas.DocumentSummaryText)
+async def get_document_summary(
+    document_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user_id: str = Depends(get_user_id)
+):
+    """The summary generated at ingestion; ``summary`` is null until it is ready"""
+    row = await async_crud.get_document_summary(db, document_id)
+    if row is None:
         raise HTTPException(status_code=404, detail="Document not found")
- 
-    return document
+    return {"documentId": document_id, "summary": row.summary, "summarizedAt": row.summarized_at}
 @app.post("/api/ask", response_model=schemas.AskResponse)
 async def ask_question(
     request: schemas.AskRequest,
     background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user_id: str = Depends(get_user_id)
 ):
     """Ask a question about a document"""
+    admit_questions()
+    check_rate_limit(ask_limiter, current_user_id)
     # Check if document exists
-    document = crud.get_document(db, request.document_id)
+    document = await async_crud.get_document(db, request.document_id)
     if not document:
         raise HTTPException(status_code=404, detail="Document not found")
  
-    question = crud.create_question(db, {
+    question = await async_crud.create_question(db, {
         "content": request.content,
         "document_id": request.document_id
-    }, current_user_id)
+    }, current_user_id, owner_id=document.user_id)
+    _stats_cache.pop(document.user_id)
     
     # Process answer in background
+    ANSWER_QUEUE_DEPTH.inc()
     background_tasks.add_task(
         process_answer,
         question.id,
         request.content,
-        request.document_id,
-        db
+        request.document_id
     )
     
  
@@ -462,81 +450,204 @@ async def ask_question(
         "answer": "Generating answer..."
     }
 
-async def process_answer(question_id: int, question_content: str, document_id: int, db: Session):
+def process_answer(question_id: int, question_content: str, document_id: int):
     """Generate an answer for a question"""
-    try:
-        # Get document chunks
-        chunks = crud.get_document_chunks(db, document_id)
-        if not chunks:
-            answer_content = "Sorry, I couldn't find any content in that document to answer your question."
-        else:
-            # Get answer
-            answer_content = answer_question(question_content, chunks)
+    with trace("question", question_id=question_id, document_id=document_id):
+        db = SessionLocal()
+        try:
+            summary = crud.get_document_summary(db, document_id) if is_summary_question(question_content) else None
+            # Get document chunks
+            # Retrieval searches the memory-mapped vectors; embeddings are only
+            # read from the database when those are missing or stale
+            chunks = crud.get_document_chunks(db, document_id, embeddings=False) if summary is None else None
+            if summary is not None:
+                # Precomputed at ingestion
+                result = {"answer": summary, "sources": []}
+            elif not chunks:
+                result = {"answer": "Sorry, I couldn't find any content in that document to answer your question.", "sources": []}
+            else:
+                # Get answer and the chunks it cites
+                result = answer_question(question_content, chunks, document_id,
+                                         lambda chunk_ids: crud.get_chunk_embeddings(db, chunk_ids))
         
-        # Create answer
-        crud.create_answer(db, {
-            "content": answer_content,
-            "question_id": question_id
-        })
+            # Create answer
+            crud.create_answer(db, {
+                "content": result["answer"],
+                "question_id": question_id,
+                "sources": result["sources"]
+            })
+            warm_suggestions_once()
         
-    except Exception as e:
-        print(f"Error generating answer: {str(e)}")
+        except Exception as e:
+            logger.exception("Error generating answer: %s", e)
  
-        crud.create_answer(db, {
-            "content": f"Sorry, I encountered an error: {str(e)}",
-            "question_id": question_id
-        })
+            crud.create_answer(db, {
+                "content": f"Sorry, I encountered an error: {str(e)}",
+                "question_id": question_id
+            })
+        finally:
+            db.close()
+            ANSWER_QUEUE_DEPTH.dec()
+@app.post("/api/ask/batch", response_model=schemas.AskBatchResponse)
+async def ask_questions(
+    request: schemas.AskBatchRequest,
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_async_db),
+    current_user_id: str = Depends(get_user_id)
+):
+    """Ask many questions about one document
+
+    Answers are generated together in the background (see process_answers)
+    and show up in ``GET /api/questions/{document_id}`` like single ones.
+    """
+    admit_questions(len(request.questions))
+    check_rate_limit(ask_limiter, current_user_id, cost=len(request.questions))
+    document = await async_crud.get_document(db, request.document_id)
+    if not document:
+        raise HTTPException(status_code=404, detail="Document not found")
+
+    question_ids = await async_crud.create_questions(
+        db, request.document_id, request.questions, current_user_id, owner_id=document.user_id
+    )
+    _stats_cache.pop(document.user_id)
+    ANSWER_QUEUE_DEPTH.inc(len(question_ids))
+    background_tasks.add_task(process_answers, question_ids, request.questions, request.document_id)
+    return {"success": True, "questionIds": question_ids}
+
+def process_answers(question_ids: List[int], questions: List[str], document_id: int):
+    """Generate answers for a batch of questions on one document
+
+    Chunks are loaded and the document index built once for the whole batch;
+    the answers are stored in a single transaction. Requests for a summary
+    get the one stored at ingestion, if any.
+    """
+    with trace("question_batch", document_id=document_id, questions=len(questions)):
+        db = SessionLocal()
+        try:
+            answers = [None] * len(questions)
+            if any(is_summary_question(question) for question in questions):
+                summary = crud.get_document_summary(db, document_id)
+                if summary is not None:
+                    for i, question in enumerate(questions):
+                        if is_summary_question(question):
+                            answers[i] = {"answer": summary, "sources": []}
+            pending = [i for i, answer in enumerate(answers) if answer is None]
+            if pending:
+                chunks = crud.get_document_chunks(db, document_id, embeddings=False)
+                if not chunks:
+                    results = [{"answer": "Sorry, I couldn't find any content in that document to answer your question.", "sources": []}] * len(pending)
+                else:
+                    results = answer_questions([questions[i] for i in pending], chunks, document_id,
+                                               lambda chunk_ids: crud.get_chunk_embeddings(db, chunk_ids))
+                for i, result in zip(pending, results):
+                    answers[i] = result
+        except Exception as e:
+            logger.exception("Error generating answers: %s", e)
+            answers = [{"answer": f"Sorry, I encountered an error: {str(e)}", "sources": []}] * len(questions)
+        try:
+            crud.create_answers(db, [
+                {"content": result["answer"], "question_id": question_id, "sources": result["sources"]}
+                for question_id, result in zip(question_ids, answers)
+            ])
+            warm_suggestions_once()
+        finally:
+            db.close()
+            ANSWER_QUEUE_DEPTH.dec(len(question_ids))
 @app.delete("/api/documents/{document_id}")
 async def delete_document_endpoint(
     document_id: int,
-    db: Session = Depends(get_db),
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_async_db),
     current_user_id: str = Depends(get_user_id)
 ):
-    """Delete a document if it belongs to the current user"""
-    success = crud.delete_document(db, document_id, current_user_id)
+    """Delete a document if it belongs to the current user
+
+    Rows are removed with bulk DELETEs; anything kept outside the database is
+    cleaned up after the response is sent.
+    """
+    success = await async_crud.delete_document(db, document_id, current_user_id)
     if not success:
         raise HTTPException(
             status_code=404,
             detail="Document not found or you don't have permission to delete it"
         )
+    _stats_cache.pop(current_user_id)
+    background_tasks.add_task(cleanup_document, document_id)
     return {"message": "Document deleted successfully"}
+@app.post("/api/documents/{document_id}/reprocess")
+async def reprocess_document(
+    document_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user_id: str = Depends(get_user_id)
+):
+    """Queue a document for ingestion again
+
+    Chunks whose text is unchanged keep their embeddings (when they come from
+    the current model); the new chunks replace the old ones in one
+    transaction, so questions keep working while it runs. A document that is
+    still queued or being ingested gets a 409.
+    """
+    document = await async_crud.get_document(db, document_id)
+    if not document or document.user_id != current_user_id:
+        raise HTTPException(status_code=404, detail="Document not found")
+    admit_ingestion()
+    check_rate_limit(upload_limiter, current_user_id)
+    if not await async_crud.queue_ingestion_job(db, document.id, document.file_url, INGESTION_LEASE_SECONDS):
+        raise HTTPException(status_code=409, detail="Document is already being processed")
+    enqueue_document(document.id, document.file_url)
+    return {"success": True, "documentId": document.id}
 @app.get("/api/questions/{document_id}", response_model=List[schemas.QuestionWithAnswer])
 async def get_questions(
     document_id: int,
-    db: Session = Depends(get_db),
+    request: Request,
+    after: Optional[int] = None,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    updated_since: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_async_db),
     current_user_id: str = Depends(get_user_id)
 ):
-    """Get all questions for a document"""
+    """Get questions for a document
+
+    ``after`` is a question ID cursor; when a full page is returned the next
+    cursor is sent in the ``X-Next-Cursor`` header. ``updated_since`` limits
+    the result to questions asked or answered after that time. Unchanged
+    results get a 304 when the request's If-None-Match has their ETag.
+    """
     # Check if document exists
-    document = crud.get_document(db, document_id)
+    document = await async_crud.get_document(db, document_id)
     if not document:
         raise HTTPException(status_code=404, detail="Document not found")
     
-    # Get questions for the document
-    questions = crud.get_document_questions(db, document_id)
-    
-    # For each question, get its answer
-    for question in questions:
-        question.answer = crud.get_answer_by_question(db, question.id)
+    # Get questions for the document, answers are joined in the same query
+    questions = await async_crud.get_document_questions(
+        db, document_id, after_id=after, limit=limit, updated_since=updated_since
+    )
+    headers = {}
+    if limit is not None and len(questions) == limit:
+        headers["X-Next-Cursor"] = str(questions[-1].id)
     
-    return questions
+    return json_list_response(request, _questions, questions, headers)
 
 @app.get("/api/stats", response_model=schemas.UserStats)
 async def get_stats(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user_id: str = Depends(get_user_id)
 ):
     """Get usage statistics for the current user"""
-    stats = crud.get_user_stats(db, current_user_id)
+    stats = _stats_cache.get(current_user_id)
+    record_cache("stats", stats is not None)
+    if stats is None:
+        stats = await async_crud.get_user_stats(db, current_user_id)
+        _stats_cache.set(current_user_id, stats)
     return stats
 
 @app.get("/api/user", response_model=schemas.UserResponse)
 async def get_current_user(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user_id: str = Depends(get_user_id)
 ):
     """Get the current user's profile"""
-    user = crud.get_user_by_clerk_id(db, current_user_id)
+    user = await async_crud.get_user_by_clerk_id(db, current_user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     return user
\ No newline at end of file
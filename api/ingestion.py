@@ -0,0 +1,290 @@
+"""Ingestion jobs and the queue that runs them
+
+Every upload path (single and batch uploads, re-processing, bulk imports)
+submits documents to one process-wide queue served by a fixed number of
+worker threads, so a large batch can't starve the API of CPU or threads.
+``pdfetch_ingestion_queue_depth`` reports how many documents are waiting or
+being processed.
+
+Jobs are tracked in the ingestion_jobs table and checkpoint their progress:
+the extracted pages, then every batch of chunk embeddings. Each queue holds
+a lease on the jobs it has queued or running, renewed by a heartbeat
+thread every INGESTION_LEASE_SECONDS / 4, so jobs waiting in another
+process's queue are never taken. Once a lease lapses (the process crashed,
+was OOM-killed or redeployed) the sweeper (run_sweeper) in some process
+claims the job and resumes it from its last checkpoint. A job that fails
+with an error (a download timeout, a database hiccup) is released for a
+retry after a backoff of INGESTION_RETRY_BACKOFF seconds, doubling per
+attempt; after INGESTION_MAX_ATTEMPTS the document is marked failed.
+Deleting a document marks its job cancelled first, and a job stops without
+persisting anything once it sees that.
+"""
+import asyncio
+import logging
+import os
+import socket
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from . import crud
+from .database import SessionLocal
+from .observability import trace, INGESTION_QUEUE_DEPTH
+from .pdf_processor import process_pdf_file, create_vector_store, IngestionCancelled
+from .summarizer import SUMMARIZE_DOCUMENTS, summarize_document
+
+logger = logging.getLogger("pdfetch.ingestion")
+
+# Documents ingested concurrently per process; ingestion is CPU-bound
+# (extraction, embedding), so more workers than cores rarely helps
+INGESTION_WORKERS = int(os.getenv("INGESTION_WORKERS", "2"))
+# Attempts per document before it is marked failed
+INGESTION_MAX_ATTEMPTS = int(os.getenv("INGESTION_MAX_ATTEMPTS", "3"))
+# Seconds before the first retry of a failed attempt; doubles with each attempt
+INGESTION_RETRY_BACKOFF = float(os.getenv("INGESTION_RETRY_BACKOFF", "30"))
+# How long a job's lease lasts without a heartbeat before other processes
+# may take the job over
+INGESTION_LEASE_SECONDS = float(os.getenv("INGESTION_LEASE_SECONDS", "120"))
+# Seconds between sweeps for jobs with lapsed leases; 0 disables the sweeper
+INGESTION_SWEEP_INTERVAL = float(os.getenv("INGESTION_SWEEP_INTERVAL", "60"))
+
+# Lease owner for this process's jobs
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def _checkpoint_pages(documents):
+    return [{"page_content": doc.page_content, "metadata": doc.metadata} for doc in documents]
+
+
+def _restore_pages(pages):
+    from langchain.schema import Document
+    return [Document(page_content=page["page_content"], metadata=page["metadata"]) for page in pages]
+
+
+def process_pdf_and_store(document_id: int, file_url: str):
+    """Process a PDF and store its chunks in the database
+
+    Runs on an ingestion worker thread with its own session, since the
+    request's session is closed by the time the job runs.
+    """
+    with trace("ingestion", document_id=document_id):
+        db = SessionLocal()
+        attempts = None
+        try:
+            logger.info("Starting background PDF processing for document %s from %s", document_id, file_url)
+        
+            document = crud.get_document(db, document_id)
+            if not document:
+                logger.warning("Document %s not found", document_id)
+                return
+
+            job = crud.start_ingestion_job(db, document_id, file_url, WORKER_ID, INGESTION_LEASE_SECONDS)
+            if job is None:
+                logger.info("Document %s is being ingested by another process or was deleted", document_id)
+                return
+            attempts = job.attempts
+            if job.attempts > INGESTION_MAX_ATTEMPTS:
+                logger.error("Giving up on document %s after %d attempts", document_id, job.attempts - 1)
+                crud.create_placeholder_chunk(
+                    db, document_id,
+                    "Processing this document failed repeatedly. Try uploading it again."
+                )
+                crud.finish_ingestion_job(db, document_id, "failed", "Too many attempts")
+                return
+        
+     
+            if not file_url.startswith('http'):
+                logger.warning("Invalid file URL format: %s", file_url)
+         
+                alternate_urls = [document.file_url]
+            
+         
+                if hasattr(document, 'file_key') and document.file_key:
+           
+                    if 'utfs.io' in file_url:
+                        alternate_urls.append(f"https://utfs.io/f/{document.file_key}")
+            
+            
+                for alt_url in alternate_urls:
+                    if alt_url and alt_url.startswith('http') and alt_url != file_url:
+                        logger.info("Trying alternate URL: %s", alt_url)
+                        file_url = alt_url
+                        break
+         
+            pages = crud.get_ingestion_pages(db, document_id)
+            if pages:
+                logger.info("Resuming document %s from %d checkpointed pages (attempt %d)",
+                            document_id, len(pages), job.attempts)
+                pdf_text = _restore_pages(pages)
+            else:
+                pdf_text = process_pdf_file(file_url)
+                if pdf_text and not crud.checkpoint_ingestion_pages(db, document_id, _checkpoint_pages(pdf_text)):
+                    raise IngestionCancelled(document_id)
+        
+            if not pdf_text:
+                logger.error("Failed to extract text from PDF (document_id: %s)", document_id)
+ 
+                crud.create_placeholder_chunk(
+                    db, document_id,
+                    "Failed to extract text from this PDF. The file may be corrupted, password-protected, or in an unsupported format."
+                )
+                crud.finish_ingestion_job(db, document_id, "failed", "No text extracted")
+                return
+            
+   
+            # The last attempt stores the chunks even if embedding still fails
+            vector_store = create_vector_store(pdf_text, document_id, db,
+                                               allow_unembedded=attempts >= INGESTION_MAX_ATTEMPTS)
+        
+            if vector_store:
+                logger.info("Successfully processed document %s", document_id)
+            else:
+                logger.warning("Document %s was processed, but vector store creation may have failed. Check if chunks were stored in the database.", document_id)
+            if not crud.finish_ingestion_job(db, document_id, "done"):
+                raise IngestionCancelled(document_id)
+
+            if SUMMARIZE_DOCUMENTS:
+                # The chunks are already stored, so a failed summary costs nothing else
+                try:
+                    summarize_document(db, document_id)
+                except Exception as e:
+                    logger.exception("Error summarizing document %s: %s", document_id, e)
+            
+        except IngestionCancelled:
+            logger.info("Document %s was deleted during its ingestion", document_id)
+        except Exception as e:
+            logger.exception("Error processing PDF (document_id: %s): %s", document_id, e)
+        
+            try:
+                if crud.ingestion_cancelled(db, document_id):
+                    logger.info("Document %s was deleted during its ingestion", document_id)
+                    return
+                if attempts is not None and attempts < INGESTION_MAX_ATTEMPTS:
+                    # Keeps the checkpoints; the sweeper resumes it once the backoff is over
+                    delay = INGESTION_RETRY_BACKOFF * 2 ** (attempts - 1)
+                    logger.info("Retrying document %s in %.0f seconds (attempt %d of %d)",
+                                document_id, delay, attempts, INGESTION_MAX_ATTEMPTS)
+                    crud.retry_ingestion_job(db, document_id, str(e), delay)
+                    return
+                crud.create_placeholder_chunk(
+                    db, document_id,
+                    f"Error processing document: {str(e)}"
+                )
+                crud.finish_ingestion_job(db, document_id, "failed", str(e))
+            except Exception as db_error:
+                logger.error("Failed to record the error of document %s: %s", document_id, db_error)
+        finally:
+            db.close()
+
+
+def cleanup_document(document_id: int):
+    """Drop what is kept outside the database for a deleted document"""
+    from . import mmap_store
+    from .vector_index import invalidate_document
+    invalidate_document(document_id)
+    mmap_store.remove(document_id)
+
+
+class IngestionQueue:
+    """FIFO of ingestion jobs served by ``workers`` threads
+
+    Threads are started on first use, so importing the API stays cheap. A
+    heartbeat thread renews the leases of the jobs queued or running here.
+    """
+
+    def __init__(self, workers: int = INGESTION_WORKERS):
+        self.workers = workers
+        self._executor = None
+        self._lock = threading.Lock()
+        # Documents queued or running here, which the sweeper must not resubmit
+        self._active = set()
+        self._stopped = threading.Event()
+
+    def submit(self, document_id: int, file_url: str):
+        """Queue a document for ingestion; returns a Future"""
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="ingestion")
+                    self._stopped.clear()
+                    threading.Thread(target=self._heartbeat, name="ingestion-heartbeat", daemon=True).start()
+        INGESTION_QUEUE_DEPTH.inc()
+        with self._lock:
+            self._active.add(document_id)
+        return self._executor.submit(self._run, document_id, file_url)
+
+    def _run(self, document_id: int, file_url: str):
+        try:
+            process_pdf_and_store(document_id, file_url)
+        finally:
+            with self._lock:
+                self._active.discard(document_id)
+            INGESTION_QUEUE_DEPTH.dec()
+
+    def is_active(self, document_id: int) -> bool:
+        with self._lock:
+            return document_id in self._active
+
+    def renew_leases(self):
+        with self._lock:
+            document_ids = list(self._active)
+        if not document_ids:
+            return
+        db = SessionLocal()
+        try:
+            crud.renew_ingestion_leases(db, WORKER_ID, document_ids, INGESTION_LEASE_SECONDS)
+        finally:
+            db.close()
+
+    def _heartbeat(self):
+        while not self._stopped.wait(INGESTION_LEASE_SECONDS / 4):
+            try:
+                self.renew_leases()
+            except Exception as e:
+                logger.warning("Renewing ingestion leases failed: %s", e)
+
+    def shutdown(self, wait: bool = True):
+        self._stopped.set()
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
+
+
+ingestion_queue = IngestionQueue()
+
+
+def enqueue_document(document_id: int, file_url: str):
+    return ingestion_queue.submit(document_id, file_url)
+
+
+def resume_abandoned_jobs(limit: int = 100):
+    """Requeue unfinished jobs whose lease has lapsed
+
+    Each job is claimed with a conditional UPDATE that takes its lease, so
+    when several workers sweep at once only one of them resubmits it.
+    Returns the number of jobs resubmitted.
+    """
+    db = SessionLocal()
+    try:
+        resumed = 0
+        for document_id, file_url in crud.get_reclaimable_ingestion_jobs(db, INGESTION_LEASE_SECONDS, limit):
+            if ingestion_queue.is_active(document_id) or not crud.claim_ingestion_job(
+                db, document_id, WORKER_ID, INGESTION_LEASE_SECONDS
+            ):
+                continue
+            logger.info("Resuming abandoned ingestion of document %s", document_id)
+            ingestion_queue.submit(document_id, file_url)
+            resumed += 1
+        return resumed
+    finally:
+        db.close()
+
+
+async def run_sweeper(interval: float):
+    """Resume abandoned jobs now and every ``interval`` seconds until cancelled"""
+    while True:
+        try:
+            await asyncio.to_thread(resume_abandoned_jobs)
+        except Exception as e:
+            logger.warning("Ingestion sweep failed: %s", e)
+        await asyncio.sleep(interval)
@@ -0,0 +1,45 @@
+import os
+import threading
+
+# Using Mixtral-8x7B which has good summarization capabilities
+DEFAULT_ENDPOINT_URL = "https://api-inference.huggingface.co/models/mistralai/Mixtral-8x7B-Instruct-v0.1"
+
+# Most LLM requests in flight at once from this process
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "4"))
+LLM_SLOTS = threading.BoundedSemaphore(LLM_CONCURRENCY)
+
+_llm = None
+_override = None
+_lock = threading.Lock()
+
+def get_llm():
+    """LLM used to generate answers, or None if no HuggingFace token is set
+
+    The endpoint client is created once and shared. HUGGINGFACE_ENDPOINT_URL
+    points it at a different (e.g. local) text-generation endpoint.
+    """
+    global _llm
+    if _override is not None:
+        return _override
+    huggingface_api_token = os.getenv("HUGGINGFACEHUB_API_TOKEN")
+    if not huggingface_api_token:
+        return None
+    if _llm is None:
+        with _lock:
+            if _llm is None:
+                from langchain_huggingface import HuggingFaceEndpoint
+                _llm = HuggingFaceEndpoint(
+                    endpoint_url=os.getenv("HUGGINGFACE_ENDPOINT_URL", DEFAULT_ENDPOINT_URL),
+                    huggingfacehub_api_token=huggingface_api_token,
+                    task="text-generation",
+                    max_length=150  # Keep this low to avoid token limit errors
+                )
+    return _llm
+
+def set_llm(llm):
+    """Use ``llm`` instead of the HuggingFace endpoint (benchmarks, local runs)
+
+    Pass None to go back to the configured endpoint.
+    """
+    global _override
+    _override = llm
@@ -0,0 +1,200 @@
+"""Versioned, non-destructive schema migrations
+
+Each migration is registered with ``@migration(version, description)`` and is
+applied at most once; applied versions are recorded in ``schema_migrations``.
+Migrations only ever add tables, columns and indexes, so they are safe to run
+against a live database. Run them with ``python -m api.db_migration migrate``.
+"""
+import logging
+
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from .database import Base
+from . import models, crud
+
+logger = logging.getLogger("pdfetch.migrations")
+
+MIGRATIONS = []
+
+# Arbitrary key for the Postgres advisory lock that serializes migration runs
+_ADVISORY_LOCK_KEY = 7305419
+
+
+def migration(version: int, description: str):
+    """Register a migration function taking a MigrationContext"""
+    def decorator(fn):
+        MIGRATIONS.append((version, description, fn))
+        MIGRATIONS.sort(key=lambda m: m[0])
+        return fn
+    return decorator
+
+
+class MigrationContext:
+    """Dialect-aware helpers for additive schema changes"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.dialect = engine.dialect.name
+
+    def has_column(self, table: str, column: str) -> bool:
+        return column in {c["name"] for c in inspect(self.engine).get_columns(table)}
+
+    def add_column(self, table: str, column: str, ddl: str):
+        """Add ``column`` with the given type/default DDL if it is missing"""
+        if self.has_column(table, column):
+            return
+        with self.engine.begin() as conn:
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+
+    def create_index(self, name: str, table: str, columns, unique: bool = False):
+        """Create an index if it doesn't exist
+
+        On Postgres the index is built with CREATE INDEX CONCURRENTLY, which
+        doesn't block writes to the table; that can't run inside a
+        transaction, so it goes through an autocommit connection. An invalid
+        leftover from an interrupted concurrent build is dropped and rebuilt.
+        """
+        unique_sql = "UNIQUE " if unique else ""
+        column_sql = ", ".join(columns)
+        if self.dialect != "postgresql":
+            with self.engine.begin() as conn:
+                conn.execute(text(
+                    f"CREATE {unique_sql}INDEX IF NOT EXISTS {name} ON {table} ({column_sql})"
+                ))
+            return
+
+        with self.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            valid = conn.execute(text(
+                "SELECT i.indisvalid FROM pg_index i "
+                "JOIN pg_class c ON c.oid = i.indexrelid WHERE c.relname = :name"
+            ), {"name": name}).scalar()
+            if valid is False:
+                logger.warning("Dropping invalid index %s left by an interrupted build", name)
+                conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+            conn.execute(text(
+                f"CREATE {unique_sql}INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} ({column_sql})"
+            ))
+
+
+def _ensure_version_table(engine):
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE IF NOT EXISTS schema_migrations ("
+            "version INTEGER PRIMARY KEY, "
+            "description VARCHAR, "
+            "applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)"
+        ))
+
+
+def applied_versions(engine):
+    _ensure_version_table(engine)
+    with engine.connect() as conn:
+        return {row[0] for row in conn.execute(text("SELECT version FROM schema_migrations"))}
+
+
+def pending_migrations(engine):
+    applied = applied_versions(engine)
+    return [m for m in MIGRATIONS if m[0] not in applied]
+
+
+def run_migrations(engine):
+    """Apply every pending migration in version order"""
+    lock_conn = None
+    if engine.dialect.name == "postgresql":
+        # Serialize concurrent runs (e.g. several workers starting at once)
+        lock_conn = engine.connect().execution_options(isolation_level="AUTOCOMMIT")
+        lock_conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": _ADVISORY_LOCK_KEY})
+    try:
+        ctx = MigrationContext(engine)
+        for version, description, fn in pending_migrations(engine):
+            logger.info("Applying migration %s: %s", version, description)
+            fn(ctx)
+            try:
+                with engine.begin() as conn:
+                    conn.execute(
+                        text("INSERT INTO schema_migrations (version, description) VALUES (:v, :d)"),
+                        {"v": version, "d": description}
+                    )
+            except IntegrityError:
+                # Another process recorded it first; every step is idempotent
+                pass
+    finally:
+        if lock_conn is not None:
+            lock_conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": _ADVISORY_LOCK_KEY})
+            lock_conn.close()
+
+
+# Migrations. Never edit or reorder an applied migration; add a new one.
+
+@migration(1, "Create missing tables")
+def _create_tables(ctx):
+    # create_all only creates tables that don't exist yet
+    Base.metadata.create_all(bind=ctx.engine)
+
+
+@migration(2, "Index documents by (user_id, created_at, id)")
+def _document_listing_index(ctx):
+    ctx.create_index("ix_documents_user_created_id", "documents", ["user_id", "created_at", "id"])
+
+
+@migration(3, "Index chunk and question foreign keys")
+def _foreign_key_indexes(ctx):
+    ctx.create_index("ix_document_chunks_document_chunk_index", "document_chunks", ["document_id", "chunk_index"])
+    ctx.create_index("ix_questions_document_id", "questions", ["document_id"])
+    ctx.create_index("ix_questions_user_id", "questions", ["user_id"])
+
+
+@migration(4, "Add user_stats counters")
+def _user_stats(ctx):
+    Base.metadata.create_all(bind=ctx.engine, tables=[models.UserStats.__table__])
+    with Session(bind=ctx.engine) as db:
+        crud.reconcile_user_stats(db)
+
+
+@migration(5, "Record the embedding model and version of each chunk")
+def _chunk_embedding_model(ctx):
+    ctx.add_column("document_chunks", "embedding_model", "VARCHAR")
+    ctx.add_column("document_chunks", "embedding_version", "VARCHAR")
+    # Every embedding stored so far came from the previously hard-coded model
+    with ctx.engine.begin() as conn:
+        conn.execute(text(
+            "UPDATE document_chunks SET embedding_model = :model, embedding_version = '1' "
+            "WHERE embedding IS NOT NULL AND embedding LIKE '[%' AND embedding_model IS NULL"
+        ), {"model": "sentence-transformers/all-MiniLM-L6-v2"})
+
+
+@migration(6, "Store chunk pages and spans, and answer sources")
+def _chunk_provenance(ctx):
+    for column in ("page", "end_page", "start_char", "end_char"):
+        ctx.add_column("document_chunks", column, "INTEGER")
+    ctx.add_column("answers", "sources", "JSON")
+
+
+@migration(7, "Store document summaries")
+def _document_summaries(ctx):
+    ctx.add_column("documents", "summary", "TEXT")
+    ctx.add_column("documents", "summarized_at", "TIMESTAMP WITH TIME ZONE")
+
+
+@migration(8, "Track ingestion jobs and their checkpoints")
+def _ingestion_jobs(ctx):
+    Base.metadata.create_all(bind=ctx.engine, tables=[models.IngestionJob.__table__, models.IngestionEmbedding.__table__])
+    # PDFs that never got chunks (e.g. their ingestion died) are retried by
+    # the sweeper once their job looks abandoned
+    with ctx.engine.begin() as conn:
+        conn.execute(text(
+            "INSERT INTO ingestion_jobs (document_id, file_url, status, attempts, updated_at) "
+            "SELECT d.id, d.file_url, 'queued', 0, CURRENT_TIMESTAMP FROM documents d "
+            "WHERE d.file_type = 'application/pdf' "
+            "AND NOT EXISTS (SELECT 1 FROM document_chunks c WHERE c.document_id = d.id) "
+            "AND NOT EXISTS (SELECT 1 FROM ingestion_jobs j WHERE j.document_id = d.id)"
+        ))
+
+
+@migration(9, "Lease ingestion jobs to the process running them")
+def _ingestion_job_leases(ctx):
+    ctx.add_column("ingestion_jobs", "owner", "VARCHAR")
+    ctx.add_column("ingestion_jobs", "lease_expires_at", "TIMESTAMP WITH TIME ZONE")
+    ctx.create_index("ix_ingestion_jobs_status_lease_expires_at", "ingestion_jobs", ["status", "lease_expires_at"])
@@ -0,0 +1,105 @@
+"""Memory-mapped per-document vector files
+
+Each document's vectors are kept on disk as one contiguous float32 array of
+unit-length rows plus an int64 array of the chunk IDs of those rows, and are
+opened with ``np.load(mmap_mode="r")``. Every uvicorn worker on the host then
+maps the same page-cache pages instead of holding its own copy of the
+vectors.
+
+A document's files are written under a fresh generation token and then
+published by atomically replacing its small ``<id>.json`` manifest, so
+readers always see one complete generation. The files are derived from the
+chunk embeddings in the database and are rebuilt whenever they are missing
+or don't match the chunks; set VECTOR_STORE_DIR to an empty string to keep
+vectors in process memory only.
+"""
+import glob
+import json
+import logging
+import os
+import tempfile
+import uuid
+
+import numpy as np
+
+logger = logging.getLogger("pdfetch.mmap_store")
+
+VECTOR_STORE_DIR = os.getenv("VECTOR_STORE_DIR", os.path.join(tempfile.gettempdir(), "pdfetch-vectors"))
+
+
+def enabled():
+    return bool(VECTOR_STORE_DIR)
+
+
+def _manifest_path(document_id):
+    return os.path.join(VECTOR_STORE_DIR, f"{document_id}.json")
+
+
+def _array_path(document_id, token, name):
+    return os.path.join(VECTOR_STORE_DIR, f"{document_id}-{token}.{name}.npy")
+
+
+def load(document_id):
+    """(manifest, chunk_ids, vectors) of a document, mapped read-only, or None"""
+    if not enabled():
+        return None
+    try:
+        with open(_manifest_path(document_id), encoding="utf-8") as f:
+            manifest = json.load(f)
+        token = manifest["token"]
+        chunk_ids = np.load(_array_path(document_id, token, "ids"), mmap_mode="r")
+        vectors = np.load(_array_path(document_id, token, "vectors"), mmap_mode="r")
+    except FileNotFoundError:
+        # Never written, or replaced by a newer generation while reading
+        return None
+    except (OSError, ValueError, KeyError) as e:
+        logger.warning("Unreadable vector files for document %s: %s", document_id, e)
+        return None
+    if len(chunk_ids) != len(vectors):
+        return None
+    return manifest, chunk_ids, vectors
+
+
+def _write_array(path, array):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        np.save(f, array)
+    os.replace(tmp_path, path)
+
+
+def save(document_id, chunk_ids, vectors: np.ndarray, model: str, version: str):
+    """Write a new generation of a document's vectors and publish it"""
+    os.makedirs(VECTOR_STORE_DIR, exist_ok=True)
+    token = uuid.uuid4().hex
+    _write_array(_array_path(document_id, token, "ids"), np.asarray(chunk_ids, dtype=np.int64))
+    _write_array(_array_path(document_id, token, "vectors"), np.ascontiguousarray(vectors, dtype=np.float32))
+
+    manifest_path = _manifest_path(document_id)
+    tmp_path = f"{manifest_path}.{token}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"token": token, "model": model, "version": version,
+                   "count": len(chunk_ids), "dim": int(vectors.shape[1])}, f)
+    os.replace(tmp_path, manifest_path)
+    # Processes that already mapped an older generation keep their mapping
+    # after the unlink; new readers only find the current one
+    _remove_arrays(document_id, keep=token)
+
+
+def _remove_arrays(document_id, keep=None):
+    for path in glob.glob(os.path.join(VECTOR_STORE_DIR, f"{document_id}-*.npy")):
+        if keep is None or not os.path.basename(path).startswith(f"{document_id}-{keep}."):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+def remove(document_id):
+    """Delete all of a document's vector files"""
+    if not enabled():
+        return
+    try:
+        os.remove(_manifest_path(document_id))
+    except FileNotFoundError:
+        pass
+    _remove_arrays(document_id)
@@ -1,5 +1,5 @@
-from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime, JSON
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, BigInteger, String, Text, ForeignKey, DateTime, JSON, Index
+from sqlalchemy.orm import relationship, deferred
 from sqlalchemy.sql import func
 from .database import Base
 
@@ -28,11 +28,22 @@ class Document(Base):
     file_type = Column(String)
     user_id = Column(String, ForeignKey("users.clerk_id"))  # Foreign key to clerk_id
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Generated at ingestion (api/summarizer.py); deferred so listing and
+    # loading documents never reads it
+    summary = deferred(Column(Text, nullable=True))
+    summarized_at = deferred(Column(DateTime(timezone=True), nullable=True))
     
     # Relationships
     owner = relationship("User", back_populates="documents")
-    chunks = relationship("DocumentChunk", back_populates="document", cascade="all, delete-orphan")
-    questions = relationship("Question", back_populates="document", cascade="all, delete-orphan")
+    # passive_deletes: rows are removed by the database (ON DELETE CASCADE) or
+    # by crud.document_delete_statements, not loaded and deleted one by one
+    chunks = relationship("DocumentChunk", back_populates="document", cascade="all, delete-orphan", passive_deletes=True)
+    questions = relationship("Question", back_populates="document", cascade="all, delete-orphan", passive_deletes=True)
+
+    __table_args__ = (
+        # Backs keyset pagination of a user's documents by (created_at, id)
+        Index("ix_documents_user_created_id", "user_id", "created_at", "id"),
+    )
 
 class DocumentChunk(Base):
     __tablename__ = "document_chunks"
@@ -42,23 +53,37 @@ class DocumentChunk(Base):
     chunk_index = Column(Integer)
     content = Column(Text)
     embedding = Column(Text, nullable=True)  # JSON string of the embedding
+    # Model and version that produced ``embedding`` (see api/embeddings.py)
+    embedding_model = Column(String, nullable=True)
+    embedding_version = Column(String, nullable=True)
+    # Provenance: 1-based page range the chunk was cut from, and its character
+    # span in the text of its first page (None when unknown)
+    page = Column(Integer, nullable=True)
+    end_page = Column(Integer, nullable=True)
+    start_char = Column(Integer, nullable=True)
+    end_char = Column(Integer, nullable=True)
     
     # Relationships
     document = relationship("Document", back_populates="chunks")
 
+    __table_args__ = (
+        # get_document_chunks filters by document and orders by chunk_index
+        Index("ix_document_chunks_document_chunk_index", "document_id", "chunk_index"),
+    )
+
 class Question(Base):
     __tablename__ = "questions"
     
     id = Column(Integer, primary_key=True, index=True)
     content = Column(Text)
-    document_id = Column(Integer, ForeignKey("documents.id", ondelete="CASCADE"))
-    user_id = Column(String, ForeignKey("users.clerk_id"))
+    document_id = Column(Integer, ForeignKey("documents.id", ondelete="CASCADE"), index=True)
+    user_id = Column(String, ForeignKey("users.clerk_id"), index=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     # Relationships
     document = relationship("Document", back_populates="questions")
     user = relationship("User", back_populates="questions")
-    answer = relationship("Answer", back_populates="question", uselist=False, cascade="all, delete-orphan")
+    answer = relationship("Answer", back_populates="question", uselist=False, cascade="all, delete-orphan", passive_deletes=True)
 
 class Answer(Base):
     __tablename__ = "answers"
@@ -66,7 +91,64 @@ class Answer(Base):
     id = Column(Integer, primary_key=True, index=True)
     content = Column(Text)
     question_id = Column(Integer, ForeignKey("questions.id", ondelete="CASCADE"), unique=True)
+    # Chunks the answer was generated from (pdf_processor.chunk_source)
+    sources = Column(JSON, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     # Relationships
-    question = relationship("Question", back_populates="answer")
\ No newline at end of file
+    question = relationship("Question", back_populates="answer")
+
+class UserStats(Base):
+    """Per-user counters kept in step with documents and questions
+
+    Updated in the same transaction as the writes they count (see
+    crud.apply_user_stats_delta); crud.reconcile_user_stats repairs drift.
+    """
+    __tablename__ = "user_stats"
+
+    user_id = Column(String, ForeignKey("users.clerk_id"), primary_key=True)
+    document_count = Column(Integer, nullable=False, default=0, server_default="0")
+    question_count = Column(Integer, nullable=False, default=0, server_default="0")
+    storage_bytes = Column(BigInteger, nullable=False, default=0, server_default="0")
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class IngestionJob(Base):
+    """Progress of a document's ingestion, so a crashed job can resume
+
+    ``pages`` checkpoints the extracted page texts and IngestionEmbedding
+    rows the chunk batches embedded so far; both are cleared when the job
+    finishes. The process that has the job queued or running holds a lease
+    (``owner``, ``lease_expires_at``) and keeps renewing it; api/ingestion.py's
+    sweeper only takes over jobs whose lease has run out.
+    """
+    __tablename__ = "ingestion_jobs"
+
+    document_id = Column(Integer, ForeignKey("documents.id", ondelete="CASCADE"), primary_key=True)
+    file_url = Column(String)
+    status = Column(String, nullable=False, default="queued", server_default="queued")  # queued, running, retrying, done, failed, cancelled
+    stage = Column(String, nullable=True)  # extracted, embedding
+    attempts = Column(Integer, nullable=False, default=0, server_default="0")
+    pages = deferred(Column(JSON, nullable=True))
+    error = Column(Text, nullable=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now())
+    owner = Column(String, nullable=True)  # ingestion.WORKER_ID of the lease holder
+    lease_expires_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        Index("ix_ingestion_jobs_status_updated_at", "status", "updated_at"),
+        # The sweeper looks for unfinished jobs whose lease has expired
+        Index("ix_ingestion_jobs_status_lease_expires_at", "status", "lease_expires_at"),
+    )
+
+class IngestionEmbedding(Base):
+    """A chunk embedding computed by an unfinished ingestion job
+
+    Keyed by embeddings.embedding_key (model, version and chunk text), so a
+    resumed job only embeds the chunks it hadn't reached.
+    """
+    __tablename__ = "ingestion_embeddings"
+
+    id = Column(Integer, primary_key=True)
+    document_id = Column(Integer, ForeignKey("documents.id", ondelete="CASCADE"), index=True)
+    key = Column(String(64))
+    embedding = Column(Text)
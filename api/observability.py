@@ -0,0 +1,263 @@
+"""Metrics, trace spans and logging setup
+
+Metrics are kept in-process and rendered in the Prometheus text format by
+``/metrics``; with several uvicorn workers each process reports its own
+series. Spans time a stage of an ingestion job or question, record it in the
+``pdfetch_stage_seconds`` histogram and emit a DEBUG log line tagged with the
+current trace ID.
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+logger = logging.getLogger("pdfetch.trace")
+
+_trace_id: ContextVar = ContextVar("trace_id", default=None)
+
+# Seconds; covers fast DB lookups through multi-minute ingestion stages
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+
+def configure_logging():
+    """Structured, level-gated logging for the API (LOG_LEVEL, default INFO)"""
+    level = os.getenv("LOG_LEVEL", "INFO").upper()
+    root = logging.getLogger("pdfetch")
+    if root.handlers:
+        return
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter(
+        "%(asctime)s level=%(levelname)s logger=%(name)s trace_id=%(trace_id)s %(message)s"
+    ))
+    handler.addFilter(_TraceIdFilter())
+    root.addHandler(handler)
+    root.setLevel(level)
+    root.propagate = False
+
+
+class _TraceIdFilter(logging.Filter):
+    def filter(self, record):
+        record.trace_id = _trace_id.get() or "-"
+        return True
+
+
+def _label_key(labelnames, labels):
+    if set(labels) != set(labelnames):
+        raise ValueError(f"Expected labels {labelnames}, got {sorted(labels)}")
+    return tuple(str(labels[name]) for name in labelnames)
+
+
+def _format_labels(labelnames, key, extra=()):
+    pairs = list(zip(labelnames, key)) + list(extra)
+    if not pairs:
+        return ""
+    body = ",".join(f'{name}="{_escape(value)}"' for name, value in pairs)
+    return "{" + body + "}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(_label_key(self.labelnames, labels), 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Gauge(Counter):
+    def set(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = value
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def render(self):
+        lines = super().render()
+        lines[1] = f"# TYPE {self.name} gauge"
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._series.items()):
+                for bound, bucket_count in zip(self.buckets, counts):
+                    labels = _format_labels(self.labelnames, key, [("le", bound)])
+                    lines.append(f"{self.name}_bucket{labels} {bucket_count}")
+                labels = _format_labels(self.labelnames, key, [("le", "+Inf")])
+                lines.append(f"{self.name}_bucket{labels} {count}")
+                labels = _format_labels(self.labelnames, key)
+                lines.append(f"{self.name}_sum{labels} {total}")
+                lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "pdfetch_stage_seconds",
+    "Time spent per pipeline stage (download, extraction, ocr, splitting, embedding, db_write, summary, retrieval, llm)",
+    ["stage"],
+))
+REQUEST_SECONDS = REGISTRY.register(Histogram(
+    "pdfetch_request_seconds",
+    "HTTP request latency by route",
+    ["method", "route", "status"],
+))
+PAGES_TOTAL = REGISTRY.register(Counter(
+    "pdfetch_pages_total", "PDF pages extracted"))
+CHUNKS_TOTAL = REGISTRY.register(Counter(
+    "pdfetch_chunks_total", "Document chunks created"))
+TOKENS_TOTAL = REGISTRY.register(Counter(
+    "pdfetch_tokens_total",
+    "Tokens processed; LLM counts are whitespace-token estimates",
+    ["kind"],
+))
+OCR_PAGES_TOTAL = REGISTRY.register(Counter(
+    "pdfetch_ocr_pages_total", "Pages without a text layer sent to OCR, by outcome", ["outcome"]))
+CACHE_REQUESTS_TOTAL = REGISTRY.register(Counter(
+    "pdfetch_cache_requests_total", "Cache lookups by cache and result", ["cache", "result"]))
+JOBS_TOTAL = REGISTRY.register(Counter(
+    "pdfetch_jobs_total", "Background jobs by kind and outcome", ["kind", "outcome"]))
+INGESTION_QUEUE_DEPTH = REGISTRY.register(Gauge(
+    "pdfetch_ingestion_queue_depth", "Documents queued or being ingested"))
+ANSWER_QUEUE_DEPTH = REGISTRY.register(Gauge(
+    "pdfetch_answer_queue_depth", "Questions accepted and waiting for an answer"))
+REJECTED_REQUESTS_TOTAL = REGISTRY.register(Counter(
+    "pdfetch_rejected_requests_total", "Requests refused with 429, by limit", ["limit"]))
+EVENT_LOOP_LAG_SECONDS = REGISTRY.register(Histogram(
+    "pdfetch_event_loop_lag_seconds",
+    "How late the event loop woke up a periodic probe",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+))
+
+
+async def monitor_event_loop_lag(interval: float):
+    """Record event-loop lag until cancelled
+
+    Sleeps ``interval`` seconds at a time; any extra delay before the loop
+    resumes the task is time the loop spent blocked or saturated.
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        EVENT_LOOP_LAG_SECONDS.observe(max(0.0, loop.time() - start - interval))
+
+
+def render_metrics():
+    return REGISTRY.render()
+
+
+def record_cache(cache: str, hit: bool):
+    CACHE_REQUESTS_TOTAL.inc(cache=cache, result="hit" if hit else "miss")
+
+
+def current_trace_id():
+    return _trace_id.get()
+
+
+@contextmanager
+def trace(kind: str, **attrs):
+    """Start a new trace for one ingestion job or question"""
+    trace_id = uuid.uuid4().hex[:16]
+    token = _trace_id.set(trace_id)
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        logger.info("trace_start kind=%s %s", kind, _format_attrs(attrs))
+        yield trace_id
+        outcome = "ok"
+    finally:
+        JOBS_TOTAL.inc(kind=kind, outcome=outcome)
+        logger.info(
+            "trace_end kind=%s outcome=%s duration_ms=%.1f",
+            kind, outcome, (time.perf_counter() - start) * 1000
+        )
+        _trace_id.reset(token)
+
+
+@contextmanager
+def span(stage: str, **attrs):
+    """Time one stage within the current trace"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, stage=stage)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("span stage=%s duration_ms=%.1f %s", stage, elapsed * 1000, _format_attrs(attrs))
+
+
+def _format_attrs(attrs):
+    return " ".join(f"{key}={value}" for key, value in attrs.items())
@@ -0,0 +1,161 @@
+"""OCR fallback for pages without a text layer
+
+Pages whose extracted text is empty are rendered with PyMuPDF and read with
+Tesseract in a dedicated process pool (OCR_WORKERS processes), so OCR has its
+own concurrency cap and recognition never competes with ingestion threads
+for the GIL.
+Every page is bounded by OCR_PAGE_TIMEOUT; a page that times out or fails is
+left empty. Results are cached by the SHA-256 of the rendered page image, in
+memory and, with OCR_CACHE_DIR set, on disk.
+
+Needs PyMuPDF, pytesseract and the tesseract binary; without them OCR is
+skipped with a warning.
+"""
+import hashlib
+import logging
+import os
+import threading
+from concurrent.futures import BrokenExecutor, ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+
+from .cache import TTLCache
+from .observability import span, OCR_PAGES_TOTAL
+
+logger = logging.getLogger("pdfetch.ocr")
+
+OCR_ENABLED = os.getenv("OCR_ENABLED", "1") == "1"
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", "2"))
+OCR_PAGE_TIMEOUT = float(os.getenv("OCR_PAGE_TIMEOUT", "60"))
+OCR_DPI = int(os.getenv("OCR_DPI", "200"))
+OCR_LANGUAGE = os.getenv("OCR_LANGUAGE", "eng")
+OCR_CACHE_SIZE = int(os.getenv("OCR_CACHE_SIZE", "2048"))
+OCR_CACHE_DIR = os.getenv("OCR_CACHE_DIR")
+
+_cache = TTLCache(maxsize=OCR_CACHE_SIZE)
+_pool = None
+_pool_lock = threading.Lock()
+_unavailable_logged = False
+
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                import multiprocessing
+                # spawn, not fork: forking a process with running threads can deadlock
+                _pool = ProcessPoolExecutor(max_workers=OCR_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+def shutdown():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def _ocr_image(png: bytes, language: str, timeout: float) -> str:
+    """Runs in a pool process: Tesseract on one rendered page"""
+    import io
+    import pytesseract
+    from PIL import Image
+
+    # pytesseract kills tesseract itself when the timeout expires, which
+    # frees the worker for the next page
+    return pytesseract.image_to_string(Image.open(io.BytesIO(png)), lang=language, timeout=timeout)
+
+
+def _available():
+    global _unavailable_logged
+    try:
+        import fitz  # noqa: F401
+        import pytesseract
+        pytesseract.get_tesseract_version()
+        return True
+    except Exception as e:
+        if not _unavailable_logged:
+            logger.warning("OCR unavailable, pages without text will stay empty: %s", e)
+            _unavailable_logged = True
+        return False
+
+
+def _cache_get(digest):
+    text = _cache.get(digest)
+    if text is None and OCR_CACHE_DIR:
+        path = os.path.join(OCR_CACHE_DIR, f"{digest}.txt")
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                text = f.read()
+            _cache.set(digest, text)
+    return text
+
+
+def _cache_set(digest, text):
+    _cache.set(digest, text)
+    if OCR_CACHE_DIR:
+        os.makedirs(OCR_CACHE_DIR, exist_ok=True)
+        tmp_path = os.path.join(OCR_CACHE_DIR, f"{digest}.txt.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, os.path.join(OCR_CACHE_DIR, f"{digest}.txt"))
+
+
+def ocr_pages(pdf_path: str, page_indexes):
+    """OCR text for the given 0-based pages of a PDF, as {page_index: text}
+
+    Pages that fail or time out are left out.
+    """
+    if not page_indexes or not OCR_ENABLED or not _available():
+        return {}
+    import fitz
+
+    results = {}
+    # Pages rendered ahead of the pool; bounds the page images held in memory
+    window = OCR_WORKERS * 2
+    with span("ocr", pages=len(page_indexes)), fitz.open(pdf_path) as pdf:
+        for start in range(0, len(page_indexes), window):
+            pending = {}
+            for index in page_indexes[start:start + window]:
+                png = pdf[index].get_pixmap(dpi=OCR_DPI).tobytes("png")
+                digest = hashlib.sha256(png).hexdigest()
+                text = _cache_get(digest)
+                if text is not None:
+                    OCR_PAGES_TOTAL.inc(outcome="cached")
+                    results[index] = text
+                else:
+                    pending[index] = (digest, _get_pool().submit(_ocr_image, png, OCR_LANGUAGE, OCR_PAGE_TIMEOUT))
+
+            for index, (digest, future) in pending.items():
+                try:
+                    # Small margin over tesseract's own timeout for the pool round-trip
+                    text = future.result(timeout=OCR_PAGE_TIMEOUT + 5)
+                except Exception as e:
+                    # pytesseract raises RuntimeError("Tesseract process timeout")
+                    # after killing tesseract
+                    timed_out = isinstance(e, FutureTimeoutError) or "timeout" in str(e).lower()
+                    logger.warning("OCR %s on page %d of %s: %s", "timed out" if timed_out else "failed", index, pdf_path, e)
+                    OCR_PAGES_TOTAL.inc(outcome="timeout" if timed_out else "error")
+                    if isinstance(e, BrokenExecutor):
+                        # A worker died; later pages get a fresh pool
+                        shutdown()
+                    continue
+                OCR_PAGES_TOTAL.inc(outcome="ok")
+                _cache_set(digest, text)
+                results[index] = text
+    return results
+
+
+def fill_empty_pages(pdf_path: str, documents):
+    """OCR the pages of ``documents`` (one langchain Document per page, in page order) that have no text
+
+    Filled pages get ``metadata["ocr"] = True``; returns ``documents``.
+    """
+    empty = [i for i, doc in enumerate(documents) if not doc.page_content.strip()]
+    if not empty:
+        return documents
+    logger.info("Running OCR on %d of %d pages without text", len(empty), len(documents))
+    for index, text in ocr_pages(pdf_path, empty).items():
+        documents[index].page_content = text
+        documents[index].metadata["ocr"] = True
+    return documents
@@ -0,0 +1,113 @@
+"""Sentence embeddings with ONNX Runtime instead of PyTorch
+
+Runs an ONNX export of EMBEDDING_MODEL with the same tokenizer, mean pooling
+and L2 normalization as the sentence-transformers pipeline, so its vectors
+match the PyTorch backend's within float tolerance and chunks embedded by
+either backend can be searched together (benchmarks/bench_embeddings.py
+measures the drift). Selected with EMBEDDING_BACKEND=onnx.
+
+The model comes from EMBEDDING_ONNX_PATH (a local directory with the .onnx
+file and tokenizer.json) or is downloaded from the model's Hugging Face repo,
+which ships exports under onnx/. EMBEDDING_ONNX_QUANTIZE=1 quantizes the
+weights to int8 once (dynamic quantization, cached next to the model).
+Threads are pinned with EMBEDDING_THREADS. onnxruntime is an optional
+dependency (requirements-onnx.txt), imported only when this backend is used.
+"""
+import logging
+import os
+
+import numpy as np
+
+logger = logging.getLogger("pdfetch.onnx_embeddings")
+
+EMBEDDING_ONNX_PATH = os.getenv("EMBEDDING_ONNX_PATH")
+EMBEDDING_ONNX_FILE = os.getenv("EMBEDDING_ONNX_FILE", "onnx/model.onnx")
+EMBEDDING_ONNX_QUANTIZE = os.getenv("EMBEDDING_ONNX_QUANTIZE", "0") == "1"
+# Intra-op threads per inference; ingestion workers each run their own batches
+EMBEDDING_THREADS = int(os.getenv("EMBEDDING_THREADS", str(max(1, (os.cpu_count() or 2) // 2))))
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "32"))
+# all-MiniLM-L6-v2's max_seq_length; longer inputs are truncated like in sentence-transformers
+EMBEDDING_MAX_TOKENS = int(os.getenv("EMBEDDING_MAX_TOKENS", "256"))
+
+
+def _model_files(model_name: str):
+    """Paths of the .onnx model and tokenizer.json"""
+    if EMBEDDING_ONNX_PATH:
+        return (os.path.join(EMBEDDING_ONNX_PATH, EMBEDDING_ONNX_FILE),
+                os.path.join(EMBEDDING_ONNX_PATH, "tokenizer.json"))
+    from huggingface_hub import hf_hub_download
+    return (hf_hub_download(model_name, EMBEDDING_ONNX_FILE),
+            hf_hub_download(model_name, "tokenizer.json"))
+
+
+def quantize(model_path: str) -> str:
+    """int8 dynamic quantization of ``model_path``; returns the quantized file, reused if present"""
+    quantized_path = model_path[:-len(".onnx")] + "_int8.onnx"
+    if not os.path.exists(quantized_path):
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        logger.info("Quantizing %s to int8", model_path)
+        tmp_path = quantized_path + ".tmp"
+        quantize_dynamic(model_path, tmp_path, weight_type=QuantType.QInt8)
+        os.replace(tmp_path, quantized_path)
+    return quantized_path
+
+
+class OnnxEmbeddings:
+    """Drop-in for HuggingFaceEmbeddings' embed_documents/embed_query"""
+
+    def __init__(self, model_name: str, threads: int = EMBEDDING_THREADS,
+                 quantized: bool = EMBEDDING_ONNX_QUANTIZE, batch_size: int = EMBEDDING_BATCH_SIZE):
+        try:
+            import onnxruntime
+        except ImportError as e:
+            raise RuntimeError(
+                "EMBEDDING_BACKEND=onnx needs onnxruntime: pip install -r requirements-onnx.txt"
+            ) from e
+        from tokenizers import Tokenizer
+
+        model_path, tokenizer_path = _model_files(model_name)
+        if quantized:
+            model_path = quantize(model_path)
+
+        self.tokenizer = Tokenizer.from_file(tokenizer_path)
+        self.tokenizer.enable_truncation(max_length=EMBEDDING_MAX_TOKENS)
+        self.tokenizer.enable_padding()
+        self.batch_size = batch_size
+
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = threads
+        options.inter_op_num_threads = 1
+        options.execution_mode = onnxruntime.ExecutionMode.ORT_SEQUENTIAL
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = onnxruntime.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self._input_names = {i.name for i in self.session.get_inputs()}
+        logger.info("Loaded ONNX embedding model %s (%d threads%s)", model_path, threads, ", int8" if quantized else "")
+
+    def _embed_batch(self, texts):
+        encodings = self.tokenizer.encode_batch(texts)
+        input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        inputs = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self._input_names:
+            inputs["token_type_ids"] = np.array([e.type_ids for e in encodings], dtype=np.int64)
+        token_vectors = self.session.run(None, inputs)[0]
+
+        # Mean pooling over real tokens, then unit length, as sentence-transformers does
+        mask = attention_mask[:, :, None].astype(np.float32)
+        pooled = (token_vectors * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+        return pooled / np.clip(norms, 1e-12, None)
+
+    def embed_documents(self, texts):
+        texts = [text.replace("\n", " ") for text in texts]
+        # Batches of similar length waste less work on padding
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        vectors = [None] * len(texts)
+        for start in range(0, len(order), self.batch_size):
+            batch = order[start:start + self.batch_size]
+            for i, vector in zip(batch, self._embed_batch([texts[i] for i in batch])):
+                vectors[i] = vector.tolist()
+        return vectors
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
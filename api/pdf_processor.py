@@ -1,277 +1,408 @@
 import os
 import requests
 import tempfile
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.document_loaders import PyPDFLoader
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_community.vectorstores import FAISS
-from langchain_huggingface import HuggingFaceEndpoint
-from langchain.chains import LLMChain
-from langchain.prompts import PromptTemplate
 from dotenv import load_dotenv
 import json
+import logging
 from . import crud, models
+from .embeddings import get_embeddings, embed_queries, is_current, embedding_key, EMBEDDING_MODEL, EMBEDDING_VERSION
+from .llm import get_llm, LLM_CONCURRENCY, LLM_SLOTS
+from .ocr import fill_empty_pages
+from .observability import span, PAGES_TOTAL, CHUNKS_TOTAL, TOKENS_TOTAL
+
+logger = logging.getLogger("pdfetch.pdf_processor")
+
+# "recursive" (langchain, by characters) or "token" (api/text_splitter.py, by
+# embedding-model tokens); see benchmarks/bench_splitter.py before switching
+TEXT_SPLITTER = os.getenv("TEXT_SPLITTER", "recursive")
+# Chunks embedded per checkpoint; a resumed ingestion redoes at most one batch
+EMBED_BATCH_SIZE = int(os.getenv("INGESTION_EMBED_BATCH_SIZE", "256"))
+
+# langchain, FAISS and the HuggingFace stack are imported inside the functions
+# that use them, so importing this module (and the API) stays cheap
+
+
+class IngestionCancelled(Exception):
+    """The document was deleted while it was being ingested"""
 
  
 def process_pdf_file(file_url):
     """
     Download a PDF from a URL and extract its text
+
+    Download errors are raised so the ingestion job can retry; None means
+    the file isn't a PDF or no text could be extracted.
     """
     temp_file_path = None
     try: 
-        print(f"Downloading PDF from {file_url}")
+        logger.info("Downloading PDF from %s", file_url)
         headers = {
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
         }
-        response = requests.get(file_url, headers=headers, stream=True)
-        response.raise_for_status() 
-        content_type = response.headers.get('Content-Type', '')
-        if 'application/pdf' not in content_type.lower() and 'binary/octet-stream' not in content_type.lower():
-            print(f"Warning: Content type '{content_type}' may not be a PDF") 
-            pdf_signature = response.content[:5]
-            if not pdf_signature.startswith(b'%PDF-'):
-                print(f"Error: Not a valid PDF file. Content starts with: {pdf_signature}")
-                return None
-         
-        with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as temp_file:
-            temp_file_path = temp_file.name 
-            for chunk in response.iter_content(chunk_size=8192):
-                if chunk:
-                    temp_file.write(chunk)
+        with span("download", url=file_url):
+            response = requests.get(file_url, headers=headers, stream=True)
+            response.raise_for_status() 
+            content_type = response.headers.get('Content-Type', '')
+            if 'application/pdf' not in content_type.lower() and 'binary/octet-stream' not in content_type.lower():
+                logger.warning("Content type '%s' may not be a PDF", content_type)
+                pdf_signature = response.content[:5]
+                if not pdf_signature.startswith(b'%PDF-'):
+                    logger.error("Not a valid PDF file. Content starts with: %r", pdf_signature)
+                    return None
+             
+            with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as temp_file:
+                temp_file_path = temp_file.name 
+                for chunk in response.iter_content(chunk_size=8192):
+                    if chunk:
+                        temp_file.write(chunk)
         
  
         file_size = os.path.getsize(temp_file_path)
         if file_size == 0:
-            print("Error: Downloaded file is empty")
+            logger.error("Downloaded file is empty")
             os.unlink(temp_file_path)
             return None
         
-        print(f"Successfully downloaded PDF ({file_size} bytes) to {temp_file_path}")
+        logger.info("Downloaded PDF (%d bytes) to %s", file_size, temp_file_path)
  
         try:
-            print(f"Extracting text from {temp_file_path}")
-            loader = PyPDFLoader(temp_file_path)
-            documents = loader.load()
+            logger.debug("Extracting text from %s", temp_file_path)
+            from langchain_community.document_loaders import PyPDFLoader
+            with span("extraction"):
+                loader = PyPDFLoader(temp_file_path)
+                documents = loader.load()
+            PAGES_TOTAL.inc(len(documents))
+            # Scanned pages have no text layer; OCR only those
+            documents = fill_empty_pages(temp_file_path, documents)
             
             if not documents:
-                print("Warning: No text extracted from PDF")
+                logger.warning("No text extracted from PDF")
   
             os.unlink(temp_file_path)
             
             return documents
         except Exception as e:
-            print(f"Error extracting text from PDF: {str(e)}") 
+            logger.warning("Error extracting text from PDF, trying fallback: %s", e)
             try:
                  
                 import pdfplumber
                 
-                extracted_text = []
+                from langchain.schema import Document
+                
+                pages = []
                 with pdfplumber.open(temp_file_path) as pdf:
                     for i, page in enumerate(pdf.pages):
-                        text = page.extract_text() or ""
-                        if text.strip():
-                            from langchain.schema import Document
-                            extracted_text.append(Document(
-                                page_content=text,
-                                metadata={"page": i + 1, "source": file_url}
-                            ))
+                        pages.append(Document(
+                            page_content=page.extract_text() or "",
+                            metadata={"page": i, "source": file_url}
+                        ))
+                pages = fill_empty_pages(temp_file_path, pages)
+                extracted_text = [page for page in pages if page.page_content.strip()]
                 
                 if extracted_text:
-                    print(f"Successfully extracted text using fallback method")
+                    PAGES_TOTAL.inc(len(extracted_text))
+                    logger.info("Extracted text using fallback method")
                     return extracted_text
                 else:
-                    print("Failed to extract text with fallback method")
+                    logger.error("Failed to extract text with fallback method")
                     return None
             except Exception as fallback_error:
-                print(f"Fallback extraction also failed: {str(fallback_error)}")
+                logger.error("Fallback extraction also failed: %s", fallback_error)
                 return None
     except requests.exceptions.RequestException as e:
-        print(f"Error downloading PDF: {str(e)}")
-        return None
+        logger.error("Error downloading PDF: %s", e)
+        raise
     finally: 
         if temp_file_path and os.path.exists(temp_file_path):
             try:
                 os.unlink(temp_file_path)
-                print(f"Cleaned up temporary file: {temp_file_path}")
+                logger.debug("Cleaned up temporary file: %s", temp_file_path)
             except Exception as cleanup_error:
-                print(f"Error during cleanup: {str(cleanup_error)}")
+                logger.warning("Error during cleanup: %s", cleanup_error)
  
-def create_vector_store(documents, document_id, db):
+def split_documents(documents):
+    """Split extracted pages into chunks with the configured splitter
+
+    TEXT_SPLITTER=recursive (default) uses langchain's character-based
+    RecursiveCharacterTextSplitter; TEXT_SPLITTER=token chunks by
+    embedding-model tokens and keeps page/offset metadata.
+    """
+    if TEXT_SPLITTER == "recursive":
+        from langchain.text_splitter import RecursiveCharacterTextSplitter
+        text_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=1000,
+            chunk_overlap=200
+        )
+        return text_splitter.split_documents(documents)
+
+    from .text_splitter import TokenTextSplitter
+    chunks = TokenTextSplitter().split_documents(documents)
+    TOKENS_TOTAL.inc(sum(chunk.metadata["token_count"] for chunk in chunks), kind="chunk")
+    return chunks
+ 
+def chunk_provenance(metadata):
+    """Page and span columns for a chunk from its splitter metadata
+
+    Loaders number pages from 0; the stored page numbers start at 1. The
+    recursive splitter keeps the page but has no character span.
+    """
+    page = metadata.get("page")
+    end_page = metadata.get("end_page", page)
+    return {
+        "page": page + 1 if page is not None else None,
+        "end_page": end_page + 1 if end_page is not None else None,
+        "start_char": metadata.get("start_char"),
+        "end_char": metadata.get("end_char"),
+    }
+
+def create_vector_store(documents, document_id, db, allow_unembedded=False):
     """
     Create a vector store from documents and store in the database
+
+    Errors are raised, so the ingestion job can retry; batches already
+    embedded stay checkpointed. With ``allow_unembedded`` (the last attempt)
+    a failed embedding instead stores the chunks without vectors. Raises
+    IngestionCancelled, leaving no chunks, checkpoints or vector files, if
+    the document is deleted meanwhile.
     """
     try:
         if not documents:
-            print(f"Warning: No documents provided for document_id {document_id}")
-            crud.create_document_chunk(
-                db=db,
-                document_id=document_id,
-                chunk_index=0,
-                content="No content could be extracted from this document.",
-                embedding=None
+            logger.warning("No documents provided for document_id %s", document_id)
+            crud.create_placeholder_chunk(
+                db, document_id,
+                "No content could be extracted from this document."
             )
             return None
             
-        print(f"Creating vector store for document {document_id} with {len(documents)} pages")
+        logger.info("Creating vector store for document %s with %d pages", document_id, len(documents))
         
         # Split text into chunks
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200
-        )
-        chunks = text_splitter.split_documents(documents)
+        with span("splitting", document_id=document_id):
+            chunks = split_documents(documents)
         
-        print(f"Split into {len(chunks)} chunks")
+        logger.info("Split document %s into %d chunks", document_id, len(chunks))
+        CHUNKS_TOTAL.inc(len(chunks))
         
         if len(chunks) == 0:
-            print("Warning: No chunks were created from the document")
-            crud.create_document_chunk(
-                db=db,
-                document_id=document_id,
-                chunk_index=0,
-                content="This document appears to be empty or could not be processed correctly.",
-                embedding=None
+            logger.warning("No chunks were created from document %s", document_id)
+            crud.create_placeholder_chunk(
+                db, document_id,
+                "This document appears to be empty or could not be processed correctly."
             )
             return None
         
-        # Create embeddings
-        embeddings = HuggingFaceEmbeddings(
-            model_name="sentence-transformers/all-MiniLM-L6-v2"
-        )
+        # Re-processing keeps the vectors of chunks whose text is unchanged and
+        # were embedded by the current model, and a resumed ingestion the
+        # batches it checkpointed before; only new text is embedded
+        texts = [chunk.page_content for chunk in chunks]
+        reusable = {
+            chunk.content: chunk.embedding
+            for chunk in crud.get_document_chunks(db, document_id)
+            if chunk.embedding and is_current(chunk.embedding_model, chunk.embedding_version)
+        }
+        checkpointed = crud.get_ingestion_embeddings(db, document_id)
+        keys = [embedding_key(text) for text in texts]
+        vectors = [
+            json.loads(reusable[text]) if text in reusable
+            else json.loads(checkpointed[key]) if key in checkpointed
+            else None
+            for text, key in zip(texts, keys)
+        ]
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if reusable or checkpointed:
+            logger.info("Reusing %d of %d chunk embeddings for document %s",
+                        len(texts) - len(missing), len(texts), document_id)
+
+        # Embed in batches, committing each one as a checkpoint
+        embeddings = get_embeddings()
+        try:
+            if missing:
+                with span("embedding", document_id=document_id, chunks=len(missing)):
+                    for start in range(0, len(missing), EMBED_BATCH_SIZE):
+                        batch = missing[start:start + EMBED_BATCH_SIZE]
+                        new_vectors = embeddings.embed_documents([texts[i] for i in batch])
+                        for i, vector in zip(batch, new_vectors):
+                            vectors[i] = vector
+                        if not crud.checkpoint_ingestion_embeddings(db, document_id, [
+                            (keys[i], json.dumps(vectors[i])) for i in batch
+                        ]):
+                            raise IngestionCancelled(document_id)
+        except IngestionCancelled:
+            raise
+        except Exception as embed_error:
+            if not allow_unembedded:
+                raise
+            logger.error("Error embedding chunks of document %s, storing them without embeddings: %s",
+                         document_id, embed_error)
+            vectors = [None] * len(texts)
         
         # Store chunks in database first - even if vector store creation fails
-        print(f"Storing {len(chunks)} chunks in database for document {document_id}")
-        for i, chunk in enumerate(chunks):
-            try:
- 
-                embedding = embeddings.embed_query(chunk.page_content)
- 
-                crud.create_document_chunk(
-                    db=db,
-                    document_id=document_id,
-                    chunk_index=i,
-                    content=chunk.page_content,
-                    embedding=embedding
-                )
-                print(f"Successfully saved chunk {i} to database")
-            except Exception as chunk_error:
-                print(f"Error saving chunk {i}: {str(chunk_error)}") 
-                try:
-                    crud.create_document_chunk(
-                        db=db,
-                        document_id=document_id,
-                        chunk_index=i,
-                        content=chunk.page_content,
-                        embedding=None
-                    )
-                    print(f"Saved chunk {i} without embedding")
-                except Exception as fallback_error:
-                    print(f"Failed to save chunk {i} even without embedding: {str(fallback_error)}")
+        logger.debug("Storing %d chunks in database for document %s", len(chunks), document_id)
+        with span("db_write", document_id=document_id, chunks=len(texts)):
+            stored = crud.replace_document_chunks(db, document_id, [
+                {
+                    "chunk_index": i,
+                    "content": text,
+                    "embedding": json.dumps(vector) if vector is not None else None,
+                    "embedding_model": EMBEDDING_MODEL if vector is not None else None,
+                    "embedding_version": EMBEDDING_VERSION if vector is not None else None,
+                    **chunk_provenance(chunk.metadata)
+                }
+                for i, (chunk, text, vector) in enumerate(zip(chunks, texts, vectors))
+            ], unless_cancelled=True)
+        if not stored:
+            raise IngestionCancelled(document_id)
+        from .vector_index import invalidate_document, save_document_vectors
+        invalidate_document(document_id)
          
+        if vectors[0] is None:
+            return None
+        # Memory-mapped copy of the vectors that API worker processes share
+        save_document_vectors(document_id, crud.get_document_chunk_ids(db, document_id), vectors,
+                              cancelled=lambda: crud.ingestion_cancelled(db, document_id))
         try:
-            vectorstore = FAISS.from_documents(chunks, embeddings)
-            print(f"Successfully created vector store for document {document_id}")
+            from langchain_community.vectorstores import FAISS
+            # Reuse the vectors computed above instead of embedding again
+            vectorstore = FAISS.from_embeddings(list(zip(texts, vectors)), embeddings)
+            logger.info("Created vector store for document %s", document_id)
             return vectorstore
         except Exception as vs_error:
-            print(f"Error creating vector store: {str(vs_error)}")
+            logger.error("Error creating vector store: %s", vs_error)
           
             return None
             
-    except Exception as e:
-        print(f"Error in create_vector_store: {str(e)}")
-        try:
-            crud.create_document_chunk(
-                db=db,
-                document_id=document_id,
-                chunk_index=0,
-                content=f"Error processing document: {str(e)}",
-                embedding=None
-            )
-            print("Created error chunk in database")
-        except Exception as db_error:
-            print(f"Failed to create error chunk: {str(db_error)}")
-        return None
- 
-def answer_question(question, chunks):
-    """
-    Find relevant information in document chunks and generate a coherent answer using HuggingFace
-    """
-    try:
-  
-        if not chunks:
-            return "No document content is available to answer this question."
-            
-      
-        documents = []
-        for chunk in chunks:
-            content = chunk.content if hasattr(chunk, 'content') else str(chunk)
-            documents.append({
-                "page_content": content,
-                "metadata": {"chunk_id": chunk.id if hasattr(chunk, 'id') else 0}
-            })
-        
- 
-        embeddings = HuggingFaceEmbeddings(
-            model_name="sentence-transformers/all-MiniLM-L6-v2"
-        )
-        
- 
-        vectorstore = FAISS.from_texts(
-            [doc["page_content"] for doc in documents],
-            embeddings,
-            metadatas=[doc["metadata"] for doc in documents]
-        )
-         
-        docs = vectorstore.similarity_search(question, k=2)
-        
-        if not docs:
-            return "I couldn't find any relevant information in the document to answer your question."
-        
- 
-        context = "\n\n".join([f"Document {i+1}:\n{doc.page_content[:250]}..." for i, doc in enumerate(docs)])
-        
-     
-        huggingface_api_token = os.getenv("HUGGINGFACEHUB_API_TOKEN")
-        if not huggingface_api_token: 
-            response = f"Here's what I found in the document related to '{question}':\n\n"
-            for i, doc in enumerate(docs, 1):
-                response += f"Excerpt {i}:\n{doc.page_content}\n\n"
-            
-            response += "(Note: To get an AI-generated answer, please configure your HUGGINGFACEHUB_API_TOKEN.)"
-            return response
-        
+    except IngestionCancelled:
+        raise
+    except Exception:
+        # The ingestion job decides between a retry and the error placeholder
+        logger.exception("Error in create_vector_store for document %s", document_id)
+        raise
  
-        prompt_template = """
+PROMPT_TEMPLATE = """
         Context: {context}
         
         Question: {question}
         
         Answer:
         """
+
+# Characters of chunk text included with each cited source
+SOURCE_EXCERPT_CHARS = 300
+
+def _chunk_text(chunk):
+    return chunk.content if hasattr(chunk, 'content') else str(chunk)
+
+def chunk_source(chunk):
+    """Citation for a retrieved chunk, built from the columns stored at ingestion"""
+    return {
+        "chunk_id": getattr(chunk, "id", None),
+        "chunk_index": getattr(chunk, "chunk_index", None),
+        "page": getattr(chunk, "page", None),
+        "end_page": getattr(chunk, "end_page", None),
+        "start_char": getattr(chunk, "start_char", None),
+        "end_char": getattr(chunk, "end_char", None),
+        "excerpt": _chunk_text(chunk)[:SOURCE_EXCERPT_CHARS],
+    }
+
+def retrieve_chunks(questions, chunks, document_id=None, k=2, load_embeddings=None):
+    """Top-k chunks for each question, best first
+
+    The document index is loaded once; questions not in the query-embedding
+    cache are embedded in one batch, and all are searched as a single matrix
+    of query vectors. Pass ``load_embeddings`` for chunks loaded without
+    their embeddings (see vector_index.get_document_index).
+    """
+    from .vector_index import get_document_index, search_chunks
+    embeddings = get_embeddings()
+
+    with span("embedding", questions=len(questions)):
+        query_vectors = embed_queries(questions)
+
+    with span("retrieval", questions=len(questions)):
+        index = get_document_index(document_id, chunks, embeddings.embed_documents, load_embeddings)
+        positions = search_chunks(index, chunks, query_vectors, k=k, load_embeddings=load_embeddings)
+    return [[chunks[p] for p in row] for row in positions]
+
+def generate_answer(question, contexts):
+    """Answer ``question`` from the retrieved chunk texts with the LLM
+
+    Without an LLM configured the excerpts themselves are returned. Calls go
+    through llm.LLM_SLOTS, which caps concurrent requests to the endpoint
+    across all questions being answered in this process.
+    """
+    if not contexts:
+        return "I couldn't find any relevant information in the document to answer your question."
+
+    context = "\n\n".join([f"Document {i+1}:\n{text[:250]}..." for i, text in enumerate(contexts)])
+
+    llm = get_llm()
+    if llm is None: 
+        response = f"Here's what I found in the document related to '{question}':\n\n"
+        for i, text in enumerate(contexts, 1):
+            response += f"Excerpt {i}:\n{text}\n\n"
         
-        prompt = PromptTemplate(
-            template=prompt_template,
-            input_variables=["context", "question"]
-        )
-        
-        # Create HuggingFace LLM
-        # Using Mixtral-8x7B which has good summarization capabilities
-        llm = HuggingFaceEndpoint(
-            endpoint_url="https://api-inference.huggingface.co/models/mistralai/Mixtral-8x7B-Instruct-v0.1",
-            huggingfacehub_api_token=huggingface_api_token,
-            task="text-generation",
-            max_length=150  # Keep this low to avoid token limit errors
-        )
-        
-        # Create chain
-        chain = LLMChain(llm=llm, prompt=prompt)
-        
-        # Run chain
+        response += "(Note: To get an AI-generated answer, please configure your HUGGINGFACEHUB_API_TOKEN.)"
+        return response
+
+    from langchain.chains import LLMChain
+    from langchain.prompts import PromptTemplate
+
+    prompt = PromptTemplate(
+        template=PROMPT_TEMPLATE,
+        input_variables=["context", "question"]
+    )
+    
+    # Create chain
+    chain = LLMChain(llm=llm, prompt=prompt)
+    
+    # Run chain
+    with LLM_SLOTS, span("llm"):
         response = chain.invoke({"context": context, "question": question})
-        
-        # Return the generated answer
-        return response["text"].strip()
-        
+    TOKENS_TOTAL.inc(len(context.split()) + len(question.split()), kind="llm_prompt")
+    TOKENS_TOTAL.inc(len(response["text"].split()), kind="llm_completion")
+    
+    # Return the generated answer
+    return response["text"].strip()
+
+def answer_question(question, chunks, document_id=None, load_embeddings=None):
+    """
+    Find relevant information in document chunks and generate a coherent answer using HuggingFace
+
+    Retrieval uses the chunks' stored embeddings through a per-document index
+    (cached when ``document_id`` is given), so only the question is embedded.
+    Returns ``{"answer": str, "sources": [...]}``; see answer_questions.
+    """
+    return answer_questions([question], chunks, document_id, load_embeddings)[0]
+
+def answer_questions(questions, chunks, document_id=None, load_embeddings=None):
+    """Answer many questions about one document
+
+    Retrieval is batched (see retrieve_chunks) and the LLM calls run
+    concurrently, up to LLM_CONCURRENCY at a time. Returns one
+    ``{"answer": str, "sources": [...]}`` per question, in order, where the
+    sources are the retrieved chunks with their pages and character spans
+    (chunk_source); a failure only affects the answers it touched.
+    """
+    if not chunks:
+        return [{"answer": "No document content is available to answer this question.", "sources": []}] * len(questions)
+    try:
+        retrieved = retrieve_chunks(questions, chunks, document_id, load_embeddings=load_embeddings)
     except Exception as e:
-        print(f"Error generating answer: {str(e)}")
-        return f"Sorry, I encountered an error: {str(e)}"
\ No newline at end of file
+        logger.error("Error retrieving chunks: %s", e)
+        return [{"answer": f"Sorry, I encountered an error: {str(e)}", "sources": []}] * len(questions)
+
+    def answer(args):
+        question, question_chunks = args
+        sources = [chunk_source(chunk) for chunk in question_chunks]
+        try:
+            text = generate_answer(question, [_chunk_text(chunk) for chunk in question_chunks])
+        except Exception as e:
+            logger.error("Error generating answer: %s", e)
+            text = f"Sorry, I encountered an error: {str(e)}"
+        return {"answer": text, "sources": sources}
+
+    if len(questions) == 1:
+        return [answer((questions[0], retrieved[0]))]
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(max_workers=min(LLM_CONCURRENCY, len(questions))) as pool:
+        return list(pool.map(answer, zip(questions, retrieved)))
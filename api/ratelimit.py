@@ -0,0 +1,113 @@
+"""Per-user rate limits and queue-depth admission control
+
+Expensive endpoints take tokens from a per-user token bucket (keyed on the
+clerk ID) and are refused while the ingestion or answer queue is at its
+limit, so one user can't flood the background work and latency stays
+bounded under overload. Refusals are 429s with a Retry-After header.
+
+Limits are kept per worker process.
+"""
+import math
+import os
+import threading
+import time
+
+from fastapi import HTTPException
+
+from .cache import TTLCache
+from .observability import INGESTION_QUEUE_DEPTH, ANSWER_QUEUE_DEPTH, REJECTED_REQUESTS_TOTAL
+
+# Sustained rate per user (per minute) and burst size; a rate of 0 disables the limit
+UPLOAD_RATE_PER_MINUTE = float(os.getenv("UPLOAD_RATE_PER_MINUTE", "10"))
+UPLOAD_RATE_BURST = int(os.getenv("UPLOAD_RATE_BURST", "20"))
+ASK_RATE_PER_MINUTE = float(os.getenv("ASK_RATE_PER_MINUTE", "30"))
+ASK_RATE_BURST = int(os.getenv("ASK_RATE_BURST", "30"))
+
+# Documents queued for ingestion and questions waiting for an answer at
+# which new work is refused; 0 disables the check
+INGESTION_QUEUE_LIMIT = int(os.getenv("INGESTION_QUEUE_LIMIT", "100"))
+ANSWER_QUEUE_LIMIT = int(os.getenv("ANSWER_QUEUE_LIMIT", "200"))
+# Retry-After sent when a queue is full
+QUEUE_RETRY_AFTER = int(os.getenv("QUEUE_RETRY_AFTER", "30"))
+
+# Users tracked per limiter; idle buckets are full, so evicting them is harmless
+_MAX_USERS = 10000
+
+
+class RateLimiter:
+    """Token buckets per key: ``burst`` tokens, refilled at ``rate_per_minute``"""
+
+    def __init__(self, name: str, rate_per_minute: float, burst: int):
+        self.name = name
+        self.rate = rate_per_minute / 60.0
+        self.burst = burst
+        # Buckets idle long enough to refill completely are dropped
+        ttl = burst / self.rate if self.rate > 0 else None
+        self._buckets = TTLCache(maxsize=_MAX_USERS, ttl=ttl)
+        self._lock = threading.Lock()
+
+    def acquire(self, key, cost: int = 1) -> float:
+        """Take ``cost`` tokens for ``key``; 0 if allowed, else seconds until they'd be available
+
+        A ``cost`` above ``burst`` never fits; check_rate_limit refuses it up front.
+        """
+        if self.rate <= 0:
+            return 0.0
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            if tokens < cost:
+                self._buckets.set(key, (tokens, now))
+                return (cost - tokens) / self.rate
+            self._buckets.set(key, (tokens - cost, now))
+            return 0.0
+
+
+upload_limiter = RateLimiter("upload", UPLOAD_RATE_PER_MINUTE, UPLOAD_RATE_BURST)
+ask_limiter = RateLimiter("ask", ASK_RATE_PER_MINUTE, ASK_RATE_BURST)
+
+
+def _too_many_requests(limit: str, detail: str, retry_after: float):
+    REJECTED_REQUESTS_TOTAL.inc(limit=limit)
+    return HTTPException(
+        status_code=429,
+        detail=detail,
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+    )
+
+
+def check_rate_limit(limiter: RateLimiter, clerk_id: str, cost: int = 1):
+    """Raise a 429 if ``clerk_id`` is over ``limiter``'s rate
+
+    A batch costing more than the whole bucket could never be admitted, so
+    it is refused with a 413 instead of being told to retry.
+    """
+    if limiter.rate > 0 and cost > limiter.burst:
+        REJECTED_REQUESTS_TOTAL.inc(limit=limiter.name)
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {limiter.burst} items per request under the {limiter.name} rate limit"
+        )
+    retry_after = limiter.acquire(clerk_id, cost)
+    if retry_after:
+        raise _too_many_requests(limiter.name, "Rate limit exceeded, try again later", retry_after)
+
+
+def _queue_full(depth: float, limit: int, count: int) -> bool:
+    # Work bigger than the whole queue is admitted once the queue is empty
+    return bool(limit) and depth + min(count, limit) > limit
+
+
+def admit_ingestion(count: int = 1):
+    """Raise a 429 unless ``count`` more documents fit in the ingestion queue"""
+    if _queue_full(INGESTION_QUEUE_DEPTH.value(), INGESTION_QUEUE_LIMIT, count):
+        raise _too_many_requests("ingestion_queue", "Too many documents are being processed, try again later",
+                                 QUEUE_RETRY_AFTER)
+
+
+def admit_questions(count: int = 1):
+    """Raise a 429 unless ``count`` more questions fit in the answer queue"""
+    if _queue_full(ANSWER_QUEUE_DEPTH.value(), ANSWER_QUEUE_LIMIT, count):
+        raise _too_many_requests("answer_queue", "Too many questions are waiting for answers, try again later",
+                                 QUEUE_RETRY_AFTER)
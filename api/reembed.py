@@ -0,0 +1,112 @@
+"""Re-embed chunks produced by another embedding model or version
+
+Walks stale chunks (whose embedding_model/embedding_version don't match
+api/embeddings.py) in ID order, embeds each batch in one call and writes it
+back in its own transaction. The job can be stopped at any point and run
+again: committed batches are no longer stale, so it picks up where it left
+off. ``--sleep`` throttles it to run alongside live traffic; questions on
+chunks it hasn't reached yet embed them on the fly, so nothing needs to go
+offline during a model upgrade.
+
+    python -m api.reembed run --batch-size 64 --sleep 0.5
+    python -m api.reembed status
+"""
+import argparse
+import json
+import logging
+import time
+from typing import Callable, Optional
+
+from dotenv import load_dotenv
+from sqlalchemy.orm import Session
+
+from . import crud
+from .embeddings import EMBEDDING_MODEL, EMBEDDING_VERSION, get_embeddings
+from .observability import span, trace, configure_logging
+
+logger = logging.getLogger("pdfetch.reembed")
+
+
+def reembed_stale_chunks(
+    db: Session,
+    batch_size: int = 64,
+    sleep: float = 0.0,
+    after_id: int = 0,
+    max_batches: Optional[int] = None,
+    document_id: Optional[int] = None,
+    embed_texts: Optional[Callable] = None
+):
+    """Re-embed stale chunks batch by batch; returns a progress summary
+
+    ``after_id`` skips chunks up to that ID (the ``last_id`` a previous run
+    logged), ``max_batches`` bounds a single run and ``sleep`` is the pause
+    in seconds between batches.
+    """
+    embed_texts = embed_texts or get_embeddings().embed_documents
+    done = batches = 0
+    documents = set()
+    with trace("reembed", model=EMBEDDING_MODEL, version=EMBEDDING_VERSION):
+        while max_batches is None or batches < max_batches:
+            chunks = crud.get_stale_chunks(
+                db, EMBEDDING_MODEL, EMBEDDING_VERSION,
+                after_id=after_id, limit=batch_size, document_id=document_id
+            )
+            if not chunks:
+                break
+            with span("embedding", chunks=len(chunks)):
+                vectors = embed_texts([chunk.content or "" for chunk in chunks])
+            with span("db_write", chunks=len(chunks)):
+                crud.update_chunk_embeddings(db, [
+                    {
+                        "id": chunk.id,
+                        "embedding": json.dumps(vector),
+                        "embedding_model": EMBEDDING_MODEL,
+                        "embedding_version": EMBEDDING_VERSION
+                    }
+                    for chunk, vector in zip(chunks, vectors)
+                ])
+            after_id = chunks[-1].id
+            documents.update(chunk.document_id for chunk in chunks)
+            done += len(chunks)
+            batches += 1
+            logger.info("Re-embedded %d chunks (last_id=%d)", done, after_id)
+            # Drop the ORM copies so a long run doesn't grow the identity map
+            db.expunge_all()
+            if sleep:
+                time.sleep(sleep)
+
+    from .vector_index import invalidate_document
+    for doc_id in documents:
+        invalidate_document(doc_id)
+    return {"chunks": done, "batches": batches, "documents": len(documents), "last_id": after_id}
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    configure_logging()
+    parser = argparse.ArgumentParser(description="Re-embed chunks from another embedding model or version")
+    parser.add_argument("command", nargs="?", default="run", choices=["run", "status"])
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--sleep", type=float, default=0.0, help="seconds to pause between batches")
+    parser.add_argument("--after-id", type=int, default=0, help="resume after this chunk ID")
+    parser.add_argument("--max-batches", type=int, default=None)
+    parser.add_argument("--document-id", type=int, default=None)
+    args = parser.parse_args()
+
+    from .database import SessionLocal
+    db = SessionLocal()
+    try:
+        stale = crud.count_stale_chunks(db, EMBEDDING_MODEL, EMBEDDING_VERSION)
+        print(f"{stale} chunk(s) not embedded with {EMBEDDING_MODEL} (version {EMBEDDING_VERSION}).")
+        if args.command == "run" and stale:
+            result = reembed_stale_chunks(
+                db,
+                batch_size=args.batch_size,
+                sleep=args.sleep,
+                after_id=args.after_id,
+                max_batches=args.max_batches,
+                document_id=args.document_id
+            )
+            print(f"Re-embedded {result['chunks']} chunk(s) across {result['documents']} document(s); last_id={result['last_id']}.")
+    finally:
+        db.close()
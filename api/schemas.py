@@ -1,5 +1,5 @@
 from typing import List, Optional, Dict, Any
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import datetime
 
 # User schemas
@@ -38,6 +38,24 @@ class DocumentResponse(DocumentBase):
     class Config:
         from_attributes = True
 
+class DocumentSummary(BaseModel):
+    """Lightweight projection for document list views"""
+    id: int
+    title: Optional[str] = None
+    filename: str
+    file_size: int
+    file_type: str
+    created_at: datetime
+    
+    class Config:
+        from_attributes = True
+
+class DocumentSummaryText(BaseModel):
+    """Generated summary of a document; ``summary`` is None until it exists"""
+    documentId: int
+    summary: Optional[str] = None
+    summarizedAt: Optional[datetime] = None
+
 # Document chunk schemas
 class DocumentChunkBase(BaseModel):
     chunk_index: int
@@ -77,10 +95,20 @@ class AnswerBase(BaseModel):
 class AnswerCreate(AnswerBase):
     question_id: int
 
+class AnswerSource(BaseModel):
+    chunk_id: Optional[int] = None
+    chunk_index: Optional[int] = None
+    page: Optional[int] = None
+    end_page: Optional[int] = None
+    start_char: Optional[int] = None
+    end_char: Optional[int] = None
+    excerpt: str = ""
+
 class AnswerResponse(AnswerBase):
     id: int
     question_id: int
     created_at: datetime
+    sources: Optional[List[AnswerSource]] = None
     
     class Config:
         from_attributes = True
@@ -108,6 +136,26 @@ class UploadResponse(BaseModel):
     fileSize: int
     fileType: str
 
+class BatchUploadFileResult(BaseModel):
+    fileName: str
+    fileSize: int
+    fileType: Optional[str] = None
+    status: str  # "queued" (PDF sent to ingestion), "uploaded" or "failed"
+    documentId: Optional[int] = None
+    fileUrl: Optional[str] = None
+    key: Optional[str] = None
+    error: Optional[str] = None
+    seconds: float
+
+class BatchUploadResponse(BaseModel):
+    success: bool
+    uploaded: int
+    failed: int
+    totalBytes: int
+    seconds: float
+    bytesPerSecond: float
+    files: List[BatchUploadFileResult]
+
 class AskRequest(BaseModel):
     content: str
     document_id: int
@@ -117,6 +165,14 @@ class AskResponse(BaseModel):
     questionId: int
     answer: str
 
+class AskBatchRequest(BaseModel):
+    document_id: int
+    questions: List[str] = Field(..., min_length=1, max_length=100)
+
+class AskBatchResponse(BaseModel):
+    success: bool
+    questionIds: List[int]
+
 class UserStats(BaseModel):
     documentCount: int
     questionCount: int
@@ -0,0 +1,74 @@
+"""Canned questions offered by the document page
+
+Their embeddings are computed ahead of time (see warm_suggestions), so
+asking one costs no embedding work. SUGGESTED_QUESTIONS_FILE replaces the
+default list with one question per line.
+"""
+import logging
+import os
+import threading
+
+logger = logging.getLogger("pdfetch.suggestions")
+
+DEFAULT_SUGGESTED_QUESTIONS = [
+    "Summarize this document.",
+    "What are the key points?",
+    "What are the main conclusions?",
+    "What dates and deadlines are mentioned?",
+    "Who are the parties involved?",
+    "What obligations or requirements does it describe?",
+    "What numbers or figures are reported?",
+    "What risks or issues are mentioned?",
+]
+
+# When to embed the suggested questions: "lazy" (once the first question has
+# loaded the embedding model), "startup" (in the background when the API
+# starts, which imports the ML stack on every cold start) or "0" (never)
+WARM_SUGGESTIONS = os.getenv("WARM_SUGGESTED_QUESTIONS", "lazy")
+if WARM_SUGGESTIONS == "1":  # the former on/off setting
+    WARM_SUGGESTIONS = "startup"
+
+_warm_lock = threading.Lock()
+_warmed = False
+
+
+def load_suggested_questions():
+    path = os.getenv("SUGGESTED_QUESTIONS_FILE")
+    if not path:
+        return list(DEFAULT_SUGGESTED_QUESTIONS)
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+SUGGESTED_QUESTIONS = load_suggested_questions()
+
+
+def warm_suggestions():
+    """Put the suggested questions' embeddings in the query cache
+
+    Loads the embedding model, so it runs in a background thread after
+    startup rather than delaying it.
+    """
+    from .embeddings import warm_query_cache
+    try:
+        warm_query_cache(SUGGESTED_QUESTIONS)
+        logger.info("Embedded %d suggested questions", len(SUGGESTED_QUESTIONS))
+    except Exception as e:
+        logger.warning("Could not embed suggested questions: %s", e)
+
+
+def warm_suggestions_once():
+    """warm_suggestions once the embedding model is loaded, with WARM_SUGGESTED_QUESTIONS=lazy
+
+    Called after answering questions; does nothing until one of them has
+    loaded the model.
+    """
+    global _warmed
+    from .embeddings import embeddings_loaded
+    if WARM_SUGGESTIONS != "lazy" or _warmed or not embeddings_loaded():
+        return
+    with _warm_lock:
+        if _warmed:
+            return
+        _warmed = True
+    warm_suggestions()
@@ -0,0 +1,143 @@
+"""Document summaries generated at ingestion
+
+A map-reduce over the document's chunks: consecutive chunks are packed into
+groups of about SUMMARY_GROUP_CHARS characters and each group is summarized
+(map); the partial summaries are then packed and summarized again, level by
+level, until one summary with the document's key facts is left (reduce).
+The calls of a level run in parallel, at most LLM_CONCURRENCY at a time and
+through llm.LLM_SLOTS, so summaries share the LLM budget with answering.
+
+Enabled with SUMMARIZE_DOCUMENTS=1 and an LLM configured; the summary is
+stored on the document, served by GET /api/documents/{id}/summary and used
+to answer "summarize this document" without retrieval or an LLM call.
+"""
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from . import crud
+from .embeddings import normalize_query
+from .llm import get_llm, LLM_CONCURRENCY, LLM_SLOTS
+from .observability import span, TOKENS_TOTAL
+
+logger = logging.getLogger("pdfetch.summarizer")
+
+SUMMARIZE_DOCUMENTS = os.getenv("SUMMARIZE_DOCUMENTS", "0") == "1"
+# Characters of text per map or reduce call
+SUMMARY_GROUP_CHARS = int(os.getenv("SUMMARY_GROUP_CHARS", "3000"))
+# Most map calls per document; larger documents are sampled evenly
+SUMMARY_MAX_GROUPS = int(os.getenv("SUMMARY_MAX_GROUPS", "32"))
+
+MAP_TEMPLATE = """
+        Summarize this part of a document in a few sentences. Keep key facts:
+        names, dates, figures, obligations and conclusions.
+
+        Text: {text}
+
+        Summary:
+        """
+
+REDUCE_TEMPLATE = """
+        Combine these summaries of consecutive parts of one document into a
+        single summary: a short paragraph, then its key facts as a bulleted list.
+
+        Summaries: {text}
+
+        Summary:
+        """
+
+# Questions answered with the stored summary (compared after normalize_query,
+# without trailing punctuation)
+SUMMARY_QUESTIONS = {
+    "summarize",
+    "summarize this",
+    "summarize this document",
+    "summarize the document",
+    "summarise this document",
+    "give me a summary",
+    "what is this document about",
+}
+
+
+def is_summary_question(question: str) -> bool:
+    return normalize_query(question).rstrip("?.! ") in SUMMARY_QUESTIONS
+
+
+def pack(texts, max_chars: int, min_items: int = 1):
+    """Consecutive ``texts`` joined into groups of about ``max_chars``
+
+    Each text is cut to ``max_chars``; a group holds at least ``min_items``
+    texts (when that many are left) even if that exceeds the budget.
+    """
+    groups, group, size = [], [], 0
+    for text in texts:
+        text = text[:max_chars]
+        if group and size + len(text) > max_chars and len(group) >= min_items:
+            groups.append("\n\n".join(group))
+            group, size = [], 0
+        group.append(text)
+        size += len(text)
+    if group:
+        groups.append("\n\n".join(group))
+    return groups
+
+
+def _sample(items, count: int):
+    if len(items) <= count:
+        return items
+    step = len(items) / count
+    return [items[int(i * step)] for i in range(count)]
+
+
+def _summarize_group(llm, template: str, text: str) -> str:
+    from langchain.chains import LLMChain
+    from langchain.prompts import PromptTemplate
+
+    chain = LLMChain(llm=llm, prompt=PromptTemplate(template=template, input_variables=["text"]))
+    with LLM_SLOTS, span("llm"):
+        response = chain.invoke({"text": text})
+    TOKENS_TOTAL.inc(len(text.split()), kind="llm_prompt")
+    TOKENS_TOTAL.inc(len(response["text"].split()), kind="llm_completion")
+    return response["text"].strip()
+
+
+def _summarize_level(llm, template: str, groups):
+    if len(groups) == 1:
+        return [_summarize_group(llm, template, groups[0])]
+    with ThreadPoolExecutor(max_workers=min(LLM_CONCURRENCY, len(groups))) as pool:
+        return list(pool.map(lambda group: _summarize_group(llm, template, group), groups))
+
+
+def summarize_texts(texts, llm=None):
+    """Map-reduce summary of ``texts`` (chunk texts in document order)"""
+    llm = llm or get_llm()
+    groups = pack(texts, SUMMARY_GROUP_CHARS)
+    if len(groups) > SUMMARY_MAX_GROUPS:
+        logger.info("Summarizing %d of %d chunk groups", SUMMARY_MAX_GROUPS, len(groups))
+        groups = _sample(groups, SUMMARY_MAX_GROUPS)
+    summaries = _summarize_level(llm, MAP_TEMPLATE, groups)
+    # Single-group documents still get a reduce pass for the key facts list
+    while True:
+        summaries = _summarize_level(llm, REDUCE_TEMPLATE, pack(summaries, SUMMARY_GROUP_CHARS, min_items=2))
+        if len(summaries) == 1:
+            return summaries[0]
+
+
+def summarize_document(db, document_id: int):
+    """Generate and store a document's summary; returns it, or None if skipped
+
+    Uses the chunks that have an embedding, which leaves out the placeholder
+    stored when no text could be extracted.
+    """
+    llm = get_llm()
+    if llm is None:
+        logger.info("No LLM configured; not summarizing document %s", document_id)
+        return None
+    texts = [chunk.content for chunk in crud.get_document_chunks(db, document_id) if chunk.embedding]
+    if not texts:
+        return None
+    with span("summary", document_id=document_id, chunks=len(texts)):
+        summary = summarize_texts(texts, llm)
+    crud.set_document_summary(db, document_id, summary)
+    logger.info("Stored summary of document %s", document_id)
+    return summary
@@ -0,0 +1,399 @@
+import json
+import logging
+import os
+import re
+import threading
+import unicodedata
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass
+from typing import List, Optional
+
+import numpy as np
+
+from .embeddings import EMBEDDING_MODEL
+
+logger = logging.getLogger("pdfetch.text_splitter")
+
+# all-MiniLM-L6-v2 truncates input at 256 tokens including [CLS] and [SEP],
+# so the default window leaves room for both
+CHUNK_TOKENS = int(os.getenv("CHUNK_TOKENS", "254"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "48"))
+
+# Rough WordPiece tokens per whitespace word, used when no tokenizer is available
+_TOKENS_PER_WORD = 1.4
+# Code points str.split() splits on (all below U+3001), so the word offsets
+# found with numpy line up with text.split(); indexed by code point, with
+# every higher code point mapped to the final (non-space) entry
+_WHITESPACE = np.array([chr(c).isspace() for c in range(0x3002)], dtype=bool)
+# Lone surrogates (from broken PDF text) can't be encoded for numpy, the
+# tokenizer or the database; replaced one for one so offsets are unchanged
+_SURROGATES = re.compile("[\ud800-\udfff]")
+
+_tokenizer = None
+_tokenizer_lock = threading.Lock()
+# WordPieceCounter per tokenizer, keyed on id() (the tokenizer is kept alive with it)
+_counters = {}
+
+
+@dataclass
+class TextChunk:
+    text: str
+    page: int          # page the chunk starts on
+    end_page: int      # page the chunk ends on
+    start_char: int    # offsets into the text of ``page``; a chunk that runs onto
+    end_char: int      # later pages ends past it (the pages joined with the separator)
+    token_count: int
+
+
+def get_tokenizer():
+    """Fast (Rust) tokenizer of the embedding model, or None if unavailable"""
+    global _tokenizer
+    if _tokenizer is None:
+        with _tokenizer_lock:
+            if _tokenizer is None:
+                try:
+                    from tokenizers import Tokenizer
+                    tokenizer = Tokenizer.from_pretrained(EMBEDDING_MODEL)
+                    tokenizer.no_truncation()
+                    tokenizer.no_padding()
+                    _tokenizer = tokenizer
+                except Exception as e:
+                    logger.warning("Embedding tokenizer unavailable, approximating tokens by words: %s", e)
+                    _tokenizer = False
+    return _tokenizer or None
+
+
+class WordPieceCounter:
+    """Counts a BERT WordPiece tokenizer's tokens per word with array ops
+
+    The tokenizer's per-call overhead (about 10µs a word) dominates when a
+    document has tens of thousands of distinct words, so counts are
+    computed here instead, for all words at once. Exact for words made of
+    printable ASCII and punctuation, which the BERT normalizer only
+    lowercases: every punctuation character is a token of its own, and the
+    runs between them are matched greedily longest-first against the
+    vocabulary, comparing 64-bit polynomial hashes of substrings. Other
+    words (accented letters, control characters, added tokens like [CLS])
+    are left for the tokenizer.
+    """
+
+    _BASE = 0x100000001B3
+    _LENGTH_SALT = 0x9E3779B97F4A7C15
+    _CONTINUATION_SALT = 0xC2B2AE3D27D4EB4F
+    # Code points this counter handles; built on first use
+    _simple = None
+    _punctuation = None
+
+    def __init__(self, vocab, continuation_prefix: str, max_chars: int, lowercase: bool, added_tokens):
+        self.max_chars = max_chars
+        self.lowercase = lowercase
+        self.added_tokens = [token for token in added_tokens if token]
+        keys, lengths = [], [0]
+        for token in vocab:
+            continuation = token.startswith(continuation_prefix)
+            if continuation:
+                token = token[len(continuation_prefix):]
+            if not token:
+                continue
+            keys.append((self._hash(token) + len(token) * self._LENGTH_SALT
+                         + continuation * self._CONTINUATION_SALT) % 2 ** 64)
+            lengths.append(len(token))
+        self.max_length = max(lengths)
+        # Open addressing with linear probing; 0 marks an empty slot
+        bits = max(16, (4 * len(keys)).bit_length())
+        table, mask = [0] * (1 << bits), (1 << bits) - 1
+        for key in set(self._mix(np.array(keys, dtype=np.uint64)).tolist()):
+            slot = key >> (64 - bits)
+            while table[slot]:
+                slot = (slot + 1) & mask
+            table[slot] = key
+        self.table = np.array(table, dtype=np.uint64)
+        self.shift = np.uint64(64 - bits)
+
+    @classmethod
+    def from_tokenizer(cls, tokenizer) -> Optional["WordPieceCounter"]:
+        """Counter for a BERT WordPiece tokenizer, or None for other kinds"""
+        config = json.loads(tokenizer.to_str())
+        normalizer, pre_tokenizer, model = (config.get(k) or {} for k in ("normalizer", "pre_tokenizer", "model"))
+        if (normalizer.get("type"), pre_tokenizer.get("type"), model.get("type")) != (
+            "BertNormalizer", "BertPreTokenizer", "WordPiece"
+        ):
+            return None
+        return cls(
+            model["vocab"], model.get("continuing_subword_prefix", "##"), model.get("max_input_chars_per_word", 100),
+            normalizer.get("lowercase", True), [token["content"] for token in config.get("added_tokens") or []],
+        )
+
+    @classmethod
+    def _tables(cls):
+        if cls._simple is None:
+            # BERT punctuation: ASCII punctuation and Unicode categories P*,
+            # except characters normalization would change
+            punctuation = np.zeros(0x10000, dtype=bool)
+            for c in range(0x10000):
+                char = chr(c)
+                if (c < 128 and not char.isalnum() and 33 <= c <= 126) or (
+                    unicodedata.category(char).startswith("P") and unicodedata.normalize("NFD", char) == char
+                ):
+                    punctuation[c] = True
+            simple = punctuation.copy()
+            simple[33:127] = True
+            cls._punctuation, cls._simple = punctuation, simple
+        return cls._simple, cls._punctuation
+
+    @classmethod
+    def _hash(cls, token: str) -> int:
+        h, power = 0, 1
+        for char in token:
+            h = (h + ord(char) * power) % 2 ** 64
+            power = power * cls._BASE % 2 ** 64
+        return h
+
+    @staticmethod
+    def _mix(keys: np.ndarray) -> np.ndarray:
+        """splitmix64 finalizer, so every bit of a key depends on the whole substring"""
+        with np.errstate(over="ignore"):
+            keys = (keys ^ (keys >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+            keys = (keys ^ (keys >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+            return keys ^ (keys >> np.uint64(31))
+
+    def count(self, words: List[str]) -> np.ndarray:
+        """Tokens in each word, or -1 for the words left to the tokenizer"""
+        counts = np.full(len(words), -1, dtype=np.int64)
+        if not words:
+            return counts
+        simple_table, punctuation_table = self._tables()
+        # Words separated by a space, which no word contains
+        text = " ".join(words)
+        codepoints = np.frombuffer(text.encode("utf-32-le", "surrogatepass"), dtype=np.uint32).astype(np.int64)
+        lengths = np.fromiter(map(len, words), dtype=np.int64, count=len(words))
+        starts = np.concatenate(([0], np.cumsum(lengths + 1)[:-1]))
+        word_of = np.repeat(np.arange(len(words)), lengths + 1)[:len(codepoints)]
+
+        in_table = codepoints < 0x10000
+        simple = np.zeros(len(codepoints), dtype=bool)
+        simple[in_table] = simple_table[codepoints[in_table]]
+        is_space = codepoints == 32
+        # A word is handled here if all its characters are
+        handled = np.logical_and.reduceat(simple | is_space, starts)
+        # Added tokens are matched before (or after) normalization
+        for token in self.added_tokens:
+            for match in re.finditer(re.escape(token), text, re.IGNORECASE):
+                handled[word_of[match.start()]] = False
+
+        punctuation = np.zeros(len(codepoints), dtype=bool)
+        punctuation[in_table] = punctuation_table[codepoints[in_table]]
+        # Every punctuation character is one token
+        tokens = np.bincount(word_of[punctuation], minlength=len(words))
+
+        # Runs of other characters between punctuation and spaces
+        boundary = punctuation | is_space | ~simple
+        edges = np.diff(np.concatenate(([1], boundary.astype(np.int8), [1])))
+        run_starts, run_ends = np.flatnonzero(edges == -1), np.flatnonzero(edges == 1)
+        run_words = word_of[run_starts]
+        keep = handled[run_words]
+        run_starts, run_ends, run_words = run_starts[keep], run_ends[keep], run_words[keep]
+        if self.lowercase:
+            upper = (codepoints >= 65) & (codepoints <= 90)
+            codepoints = codepoints + 32 * upper
+        run_tokens = self._count_runs(codepoints.astype(np.uint64), run_starts, run_ends)
+        tokens += np.bincount(run_words, weights=run_tokens, minlength=len(words)).astype(np.int64)
+        counts[handled] = tokens[handled]
+        return counts
+
+    def _lookup(self, keys: np.ndarray) -> np.ndarray:
+        """Sorted indices of the ``keys`` that are in the vocabulary"""
+        mask = np.uint64(len(self.table) - 1)
+        slots = keys >> self.shift
+        pending = np.arange(len(keys))
+        hits = []
+        while len(pending):
+            found = self.table[slots]
+            hits.append(pending[found == keys[pending]])
+            # Probe on past occupied slots holding other keys
+            probing = (found != 0) & (found != keys[pending])
+            pending, slots = pending[probing], (slots[probing] + np.uint64(1)) & mask
+        return np.sort(np.concatenate(hits))
+
+    def _count_runs(self, codepoints: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+        """WordPiece tokens of each run, greedy longest-match-first like the tokenizer"""
+        tokens = np.zeros(len(starts), dtype=np.int64)
+        with np.errstate(over="ignore"):
+            # prefix[i] = sum of codepoints[j] * BASE**j for j < i
+            powers = np.cumprod(np.full(len(codepoints), self._BASE, dtype=np.uint64))
+            powers = np.concatenate(([np.uint64(1)], powers[:-1]))
+            inverse = np.cumprod(np.full(len(codepoints), pow(self._BASE, -1, 2 ** 64), dtype=np.uint64))
+            inverse = np.concatenate(([np.uint64(1)], inverse[:-1]))
+            prefix = np.concatenate(([np.uint64(0)], np.cumsum(codepoints * powers, dtype=np.uint64)))
+
+            # Runs longer than the tokenizer's limit are one [UNK]
+            too_long = ends - starts > self.max_chars
+            tokens[too_long] = 1
+            active = np.flatnonzero(~too_long)
+            position = starts[active]
+            salt = np.uint64(0)
+            while len(active):
+                # Every (run, length) candidate for the next token, by run
+                # and then by increasing length
+                candidates = np.minimum(ends[active] - position, self.max_length)
+                first = np.cumsum(candidates) - candidates
+                rows = np.repeat(np.arange(len(active)), candidates)
+                lengths = np.arange(len(rows)) - np.repeat(first, candidates) + 1
+                start = position[rows]
+                keys = self._mix((prefix[start + lengths] - prefix[start]) * inverse[start]
+                                 + lengths.astype(np.uint64) * np.uint64(self._LENGTH_SALT) + salt)
+                hits = self._lookup(keys)
+                # The longest match of each run is its last hit
+                hit_rows = rows[hits]
+                last = np.flatnonzero(np.append(hit_rows[1:] != hit_rows[:-1], True)) if len(hits) else hits
+                matched = np.zeros(len(active), dtype=np.int64)
+                matched[hit_rows[last]] = lengths[hits[last]]
+
+                # A run with a part that matches nothing is one [UNK]
+                unknown = matched == 0
+                tokens[active[unknown]] = 1
+                tokens[active[~unknown]] += 1
+                position = position + matched
+                done = unknown | (position == ends[active])
+                active, position = active[~done], position[~done]
+                salt = np.uint64(self._CONTINUATION_SALT)
+        return tokens
+
+
+def get_word_counter(tokenizer) -> Optional[WordPieceCounter]:
+    """Cached WordPieceCounter for ``tokenizer``, or None if it isn't BERT WordPiece"""
+    entry = _counters.get(id(tokenizer))
+    if entry is None:
+        try:
+            counter = WordPieceCounter.from_tokenizer(tokenizer)
+        except Exception as e:
+            logger.warning("Counting tokens with the tokenizer itself: %s", e)
+            counter = None
+        entry = _counters[id(tokenizer)] = (tokenizer, counter)
+    return entry[1]
+
+
+class TokenTextSplitter:
+    """Split page texts into overlapping windows of embedding-model tokens
+
+    Windows are made of whole whitespace-delimited words, found with array
+    ops over the code points of the text. A BERT-style tokenizer never
+    merges tokens across whitespace, so a word's token count doesn't depend
+    on its context: each distinct word of the document is counted once,
+    with WordPieceCounter where it can and by the Rust tokenizer otherwise,
+    rather than encoding every page in full. The only strings created are
+    the words and the final chunks. Chunks fit the model's input limit
+    (unless one word alone exceeds it) and keep their page numbers and
+    character spans.
+    """
+
+    def __init__(self, chunk_tokens: int = CHUNK_TOKENS, overlap_tokens: int = CHUNK_OVERLAP_TOKENS,
+                 tokenizer=None, separator: str = "\n\n"):
+        if overlap_tokens >= chunk_tokens:
+            raise ValueError("overlap_tokens must be smaller than chunk_tokens")
+        self.chunk_tokens = chunk_tokens
+        self.overlap_tokens = overlap_tokens
+        # None loads the model's tokenizer; False forces the word approximation
+        self.tokenizer = get_tokenizer() if tokenizer is None else (tokenizer or None)
+        self.separator = separator
+
+    @staticmethod
+    def _word_offsets(text: str) -> np.ndarray:
+        """(n, 2) character offsets of the whitespace-delimited words in ``text``"""
+        codepoints = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32)
+        is_word = ~_WHITESPACE[np.minimum(codepoints, len(_WHITESPACE) - 1)]
+        edges = np.diff(np.concatenate(([False], is_word, [False])).astype(np.int8))
+        return np.stack([np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)], axis=1)
+
+    def _token_counts(self, text: str, offsets: np.ndarray) -> np.ndarray:
+        """Model tokens in each word, counting every distinct word once"""
+        # Same words as ``offsets`` (see _WHITESPACE), split in C
+        words = text.split()
+        distinct = list(set(words))
+        counter = get_word_counter(self.tokenizer)
+        counts = counter.count(distinct) if counter is not None else np.full(len(distinct), -1, dtype=np.int64)
+        # The words the counter leaves out are encoded by the tokenizer
+        left = np.flatnonzero(counts < 0)
+        if len(left):
+            encodings = self.tokenizer.encode_batch([distinct[i] for i in left], add_special_tokens=False)
+            counts[left] = [len(encoding.ids) for encoding in encodings]
+        tokens = dict(zip(distinct, counts.tolist()))
+        return np.fromiter(map(tokens.__getitem__, words), dtype=np.int64, count=len(words))
+
+    def split_pages(self, pages: List[str], page_numbers: Optional[List[int]] = None) -> List[TextChunk]:
+        if not pages:
+            return []
+        if page_numbers is None:
+            page_numbers = list(range(len(pages)))
+        pages = [_SURROGATES.sub("\ufffd", page) for page in pages]
+        text = self.separator.join(pages)
+        page_starts = np.cumsum([0] + [len(p) + len(self.separator) for p in pages[:-1]])
+
+        offsets = self._word_offsets(text)
+        total = len(offsets)
+        if total == 0:
+            return []
+
+        chunk_tokens, overlap = self.chunk_tokens, self.overlap_tokens
+        if self.tokenizer is not None:
+            counts = self._token_counts(text, offsets)
+        else:
+            counts = np.ones(total, dtype=np.int64)
+            chunk_tokens = max(1, int(chunk_tokens / _TOKENS_PER_WORD))
+            overlap = min(int(overlap / _TOKENS_PER_WORD), chunk_tokens - 1)
+        # cumulative[i] is the number of tokens in words [0, i)
+        cumulative = np.concatenate(([0], np.cumsum(counts))).tolist()
+
+        starts, ends = [], []
+        start = 0
+        while True:
+            # Most words from ``start`` that fit the window (at least one)
+            end = max(bisect_right(cumulative, cumulative[start] + chunk_tokens) - 1, start + 1)
+            starts.append(start)
+            ends.append(end)
+            if end == total:
+                break
+            # The next window repeats up to ``overlap`` tokens of trailing words
+            start = max(bisect_left(cumulative, cumulative[end] - overlap), start + 1)
+
+        starts, last = np.array(starts), np.array(ends) - 1
+        cumulative = np.asarray(cumulative)
+        page_numbers = np.asarray(page_numbers, dtype=np.int64)
+
+        def page_indexes(words):
+            return np.searchsorted(page_starts, offsets[words, 0], side="right") - 1
+
+        first, final = page_indexes(starts), page_indexes(last)
+        # Spans are stored relative to the chunk's first page
+        page_offsets = page_starts[first]
+        return [
+            TextChunk(text=text[start_char + page_offset:end_char + page_offset], page=page, end_page=end_page,
+                      start_char=start_char, end_char=end_char, token_count=token_count)
+            for start_char, end_char, page_offset, page, end_page, token_count in zip(
+                (offsets[starts, 0] - page_offsets).tolist(), (offsets[last, 1] - page_offsets).tolist(),
+                page_offsets.tolist(), page_numbers[first].tolist(), page_numbers[final].tolist(),
+                (cumulative[last + 1] - cumulative[starts]).tolist(),
+            )
+        ]
+
+    def split_documents(self, documents):
+        """Split langchain page Documents, keeping page and span metadata"""
+        from langchain_core.documents import Document
+
+        pages = [doc.page_content for doc in documents]
+        page_numbers = [doc.metadata.get("page", i) for i, doc in enumerate(documents)]
+        metadata = documents[0].metadata if documents else {}
+        return [
+            Document(
+                page_content=chunk.text,
+                metadata={
+                    "source": metadata.get("source"),
+                    "page": chunk.page,
+                    "end_page": chunk.end_page,
+                    "start_char": chunk.start_char,
+                    "end_char": chunk.end_char,
+                    "token_count": chunk.token_count,
+                },
+            )
+            for chunk in self.split_pages(pages, page_numbers)
+        ]
@@ -0,0 +1,119 @@
+"""UploadThing client: batched presigning and parallel uploads
+
+UploadThing's uploadFiles call presigns any number of files at once, so a
+batch costs one presign round-trip; the uploads to the presigned targets
+then run in a thread pool.
+"""
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+logger = logging.getLogger("pdfetch.uploadthing")
+
+UPLOADTHING_API_URL = os.getenv("UPLOADTHING_API_URL", "https://uploadthing.com/api/uploadFiles")
+# Parallel uploads to storage per batch
+UPLOAD_CONCURRENCY = int(os.getenv("UPLOAD_CONCURRENCY", "8"))
+
+_local = threading.local()
+
+
+class UploadThingError(Exception):
+    """An UploadThing or storage request failed; carries the HTTP status to return"""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def _session():
+    # requests.Session isn't thread-safe; keep one (and its connection pool) per thread
+    if not hasattr(_local, "session"):
+        _local.session = requests.Session()
+    return _local.session
+
+
+def presign_files(api_key: str, files: list):
+    """Presigned upload targets for ``files`` (dicts with name, size, type) in one call"""
+    headers = {
+        "x-uploadthing-api-key": api_key,
+        "x-uploadthing-version": "6.4.0",
+        "Content-Type": "application/json"
+    }
+    request_body = {
+        "files": [
+            {
+                "name": file["name"],
+                "size": file["size"],
+                "type": file["type"],
+                "acl": "public-read",
+                "contentDisposition": "inline"
+            }
+            for file in files
+        ]
+    }
+    logger.debug("Presigning %d file(s) with %s", len(files), UPLOADTHING_API_URL)
+    response = _session().post(UPLOADTHING_API_URL, headers=headers, json=request_body)
+    if not response.ok:
+        logger.error("UploadThing API error response: %s", response.text)
+        raise UploadThingError(response.status_code, f"UploadThing error: {response.text}")
+
+    data = response.json().get("data") or []
+    if len(data) != len(files):
+        raise UploadThingError(500, "Invalid response from UploadThing API: expected "
+                                    f"{len(files)} presigned file(s), got {len(data)}")
+    for file_data in data:
+        if not file_data.get("url") or not file_data.get("fields"):
+            raise UploadThingError(500, "Missing presigned URL information in UploadThing response")
+    return data
+
+
+def upload_file(file_data: dict, filename: str, content: bytes, content_type: str):
+    """POST one file to the presigned target returned by presign_files"""
+    response = _session().post(
+        file_data["url"],
+        data=file_data.get("fields", {}),
+        files={"file": (filename, content, content_type)}
+    )
+    if not response.ok:
+        logger.error("S3 upload error: %s", response.text)
+        raise UploadThingError(response.status_code, f"File upload to storage failed: {response.text}")
+
+
+def upload_files(api_key: str, files: list, concurrency: int = UPLOAD_CONCURRENCY):
+    """Presign and upload ``files`` ((filename, content, content_type) tuples)
+
+    Returns one result dict per file, in order, with ``status`` "uploaded" or
+    "failed"; a failed upload doesn't stop the others. A failed presign
+    raises UploadThingError since no file can be uploaded.
+    """
+    presigned = presign_files(api_key, [
+        {"name": name, "size": len(content), "type": content_type}
+        for name, content, content_type in files
+    ])
+
+    def upload(args):
+        (name, content, content_type), file_data = args
+        result = {
+            "fileName": name,
+            "fileSize": len(content),
+            "fileType": content_type,
+            "key": file_data.get("key"),
+            "fileUrl": file_data.get("fileUrl"),
+        }
+        start = time.perf_counter()
+        try:
+            upload_file(file_data, name, content, content_type)
+            result["status"] = "uploaded"
+        except (UploadThingError, requests.exceptions.RequestException) as e:
+            result["status"] = "failed"
+            result["error"] = str(e)
+        result["seconds"] = round(time.perf_counter() - start, 3)
+        return result
+
+    with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(files)))) as pool:
+        return list(pool.map(upload, zip(files, presigned)))
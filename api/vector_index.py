@@ -0,0 +1,337 @@
+import json
+import logging
+import os
+from typing import Callable, Optional
+
+import numpy as np
+
+from . import mmap_store
+from .cache import TTLCache
+from .embeddings import EMBEDDING_MODEL, EMBEDDING_VERSION, is_current
+from .observability import record_cache
+
+logger = logging.getLogger("pdfetch.vector_index")
+
+# flat: exact float32 search. sq8: 8-bit scalar quantization (4x smaller).
+# ivfpq: inverted file + product quantization (~30x smaller), for large documents.
+VECTOR_INDEX = os.getenv("VECTOR_INDEX", "flat")
+# Quantized indexes fetch k * RESCORE_FACTOR candidates and re-rank them exactly
+RESCORE_FACTOR = int(os.getenv("VECTOR_INDEX_RESCORE_FACTOR", "4"))
+IVFPQ_NPROBE = int(os.getenv("VECTOR_INDEX_NPROBE", "8"))
+# IVF-PQ needs enough vectors to train 256-centroid codebooks; smaller
+# documents use SQ8 instead
+IVFPQ_MIN_VECTORS = int(os.getenv("VECTOR_INDEX_IVFPQ_MIN_VECTORS", "10000"))
+# Documents whose index is kept in memory between questions
+INDEX_CACHE_SIZE = int(os.getenv("VECTOR_INDEX_CACHE_SIZE", "64"))
+
+# Rows per block when scanning int8 codes with numpy
+_BLOCK_ROWS = 8192
+
+_index_cache = TTLCache(maxsize=INDEX_CACHE_SIZE)
+
+
+def normalize(vectors) -> np.ndarray:
+    """float32 copy of ``vectors`` scaled to unit length (rows)"""
+    vectors = np.array(vectors, dtype=np.float32, ndmin=2)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _faiss():
+    try:
+        import faiss
+        return faiss
+    except ImportError:
+        return None
+
+
+def _top_k(scores: np.ndarray, k: int):
+    """Indices and scores of the k best columns per row, best first"""
+    k = min(k, scores.shape[1])
+    idx = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    part = np.take_along_axis(scores, idx, axis=1)
+    order = np.argsort(-part, axis=1)
+    return np.take_along_axis(part, order, axis=1), np.take_along_axis(idx, order, axis=1)
+
+
+class FlatIndex:
+    """Exact inner-product search over float32 vectors"""
+
+    kind = "flat"
+    exact = True
+
+    def __init__(self, vectors: np.ndarray):
+        self.vectors = vectors
+        self.ntotal, self.dim = vectors.shape
+
+    @property
+    def memory_bytes(self):
+        return self.vectors.nbytes
+
+    def search(self, queries: np.ndarray, k: int):
+        return _top_k(queries @ self.vectors.T, k)
+
+
+class SQ8Index:
+    """8-bit scalar quantization: one byte per dimension per vector
+
+    Uses faiss' IndexScalarQuantizer when available; otherwise codes are
+    scanned with numpy in fixed-size blocks to bound temporary memory.
+    """
+
+    kind = "sq8"
+    exact = False
+
+    def __init__(self, vectors: np.ndarray):
+        self.ntotal, self.dim = vectors.shape
+        faiss = _faiss()
+        if faiss is not None:
+            self._index = faiss.IndexScalarQuantizer(self.dim, faiss.ScalarQuantizer.QT_8bit, faiss.METRIC_INNER_PRODUCT)
+            self._index.train(vectors)
+            self._index.add(vectors)
+            return
+        self._index = None
+        self.vmin = vectors.min(axis=0)
+        self.scale = (vectors.max(axis=0) - self.vmin) / 255.0
+        self.scale[self.scale == 0] = 1.0
+        self.codes = np.rint((vectors - self.vmin) / self.scale).astype(np.uint8)
+
+    @property
+    def memory_bytes(self):
+        if self._index is not None:
+            return self._index.sa_code_size() * self.ntotal
+        return self.codes.nbytes + self.vmin.nbytes + self.scale.nbytes
+
+    def search(self, queries: np.ndarray, k: int):
+        if self._index is not None:
+            return self._index.search(queries, min(k, self.ntotal))
+        # q . (code * scale + vmin) == (q * scale) . code + q . vmin
+        scaled = queries * self.scale
+        offset = queries @ self.vmin
+        scores = np.empty((len(queries), self.ntotal), dtype=np.float32)
+        for start in range(0, self.ntotal, _BLOCK_ROWS):
+            block = self.codes[start:start + _BLOCK_ROWS].astype(np.float32)
+            scores[:, start:start + len(block)] = scaled @ block.T
+        scores += offset[:, None]
+        return _top_k(scores, k)
+
+
+class IVFPQIndex:
+    """faiss IVF-PQ: coarse clustering plus product-quantized residuals"""
+
+    kind = "ivfpq"
+    exact = False
+
+    def __init__(self, vectors: np.ndarray, nprobe: int = IVFPQ_NPROBE):
+        faiss = _faiss()
+        self.ntotal, self.dim = vectors.shape
+        nlist = max(1, min(int(np.sqrt(self.ntotal)), self.ntotal // 39))
+        # Sub-quantizer count must divide the dimension; 8 dims per sub-vector
+        m = next(m for m in (self.dim // 8, 48, 32, 24, 16, 8, 4, 2, 1) if m and self.dim % m == 0)
+        quantizer = faiss.IndexFlatIP(self.dim)
+        self._index = faiss.IndexIVFPQ(quantizer, self.dim, nlist, m, 8, faiss.METRIC_INNER_PRODUCT)
+        self._index.train(vectors)
+        self._index.add(vectors)
+        self._index.nprobe = min(nprobe, nlist)
+
+    @property
+    def memory_bytes(self):
+        # PQ codes plus the 8-byte IDs stored in the inverted lists
+        return (self._index.code_size + 8) * self.ntotal
+
+    def search(self, queries: np.ndarray, k: int):
+        return self._index.search(queries, min(k, self.ntotal))
+
+
+def build_index(vectors, kind: str = None, normalized: bool = False):
+    """Build an index of the configured kind over (normalized) vectors
+
+    With ``normalized``, ``vectors`` must already be unit-length float32 rows
+    and are used as given, so a memory-mapped array isn't copied.
+    """
+    kind = kind or VECTOR_INDEX
+    if not normalized:
+        vectors = normalize(vectors)
+    if kind == "ivfpq":
+        if _faiss() is None:
+            logger.warning("faiss is not installed; using sq8 instead of ivfpq")
+            kind = "sq8"
+        elif len(vectors) < IVFPQ_MIN_VECTORS:
+            kind = "sq8"
+        else:
+            return IVFPQIndex(vectors)
+    if kind == "sq8":
+        return SQ8Index(vectors)
+    if kind != "flat":
+        raise ValueError(f"Unknown VECTOR_INDEX: {kind}")
+    return FlatIndex(vectors)
+
+
+def search(index, queries, k: int, fetch_vectors: Optional[Callable] = None,
+           rescore_factor: int = RESCORE_FACTOR):
+    """Top-k (scores, positions) for each query row
+
+    For quantized indexes, ``k * rescore_factor`` candidates are taken and
+    re-ranked with exact scores from ``fetch_vectors(positions)``, which must
+    return the original float vectors of those positions.
+    """
+    queries = normalize(queries)
+    if index.exact or fetch_vectors is None:
+        return index.search(queries, k)
+
+    _, candidates = index.search(queries, k * max(rescore_factor, 1))
+    scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+    positions = np.full((len(queries), k), -1, dtype=np.int64)
+    for row, query in enumerate(queries):
+        cand = candidates[row][candidates[row] >= 0]
+        if not len(cand):
+            continue
+        exact = normalize(fetch_vectors(cand)) @ query
+        best_scores, best = _top_k(exact[None, :], k)
+        n = best.shape[1]
+        scores[row, :n] = best_scores[0]
+        positions[row, :n] = cand[best[0]]
+    return scores, positions
+
+
+class DocumentIndex:
+    """A document's index plus what is needed to map hits back to chunks"""
+
+    def __init__(self, key, index, extra_vectors, vectors=None):
+        self.key = key
+        self.index = index
+        # Vectors computed at build time for chunks stored without one
+        self.extra_vectors = extra_vectors
+        # Memory-mapped vectors of all chunks (in chunk order), if on disk
+        self.vectors = vectors
+
+
+def _chunk_vector(chunk):
+    """Stored vector of a chunk, or None if missing or from another model"""
+    embedding = getattr(chunk, "embedding", None)
+    if not embedding or not is_current(getattr(chunk, "embedding_model", None),
+                                       getattr(chunk, "embedding_version", None)):
+        return None
+    return json.loads(embedding)
+
+
+def _embedding_sources(chunks, positions, load_embeddings: Optional[Callable]):
+    """What holds the stored embedding of each of ``chunks[positions]``
+
+    The chunks themselves, or when they were loaded without their
+    embeddings, rows fetched with ``load_embeddings(chunk_ids)`` (a dict by
+    chunk ID).
+    """
+    if load_embeddings is None:
+        return [chunks[p] for p in positions]
+    rows = load_embeddings([chunks[p].id for p in positions])
+    return [rows.get(chunks[p].id) for p in positions]
+
+
+def _chunk_ids(chunks):
+    ids = [getattr(chunk, "id", None) for chunk in chunks]
+    return ids if all(chunk_id is not None for chunk_id in ids) else None
+
+
+def load_document_vectors(document_id, chunks):
+    """Memory-mapped vectors of ``chunks`` from the vector store, or None
+
+    Only returned when the files hold exactly these chunks, in this order,
+    embedded by the current model.
+    """
+    chunk_ids = _chunk_ids(chunks)
+    if document_id is None or chunk_ids is None or not mmap_store.enabled():
+        return None
+    stored = mmap_store.load(document_id)
+    valid = (
+        stored is not None
+        and is_current(stored[0].get("model"), stored[0].get("version"))
+        and np.array_equal(stored[1], chunk_ids)
+    )
+    record_cache("vector_store", valid)
+    return stored[2] if valid else None
+
+
+def save_document_vectors(document_id, chunk_ids, vectors, cancelled: Optional[Callable[[], bool]] = None):
+    """Write a document's vectors (in chunk order) to the vector store
+
+    Returns them memory-mapped, or None if the store is disabled, the write
+    failed or ``cancelled`` returned True. It's called before the write and
+    again after it, when the files are removed, so an ingestion racing the
+    document's deletion leaves no files behind.
+    """
+    if document_id is None or not chunk_ids or not mmap_store.enabled():
+        return None
+    if cancelled is not None and cancelled():
+        return None
+    try:
+        mmap_store.save(document_id, chunk_ids, normalize(vectors), EMBEDDING_MODEL, EMBEDDING_VERSION)
+    except OSError as e:
+        logger.warning("Could not write vectors of document %s to %s: %s", document_id, mmap_store.VECTOR_STORE_DIR, e)
+        return None
+    if cancelled is not None and cancelled():
+        mmap_store.remove(document_id)
+        return None
+    stored = mmap_store.load(document_id)
+    return stored[2] if stored is not None else None
+
+
+def get_document_index(document_id, chunks, embed_texts: Callable, load_embeddings: Optional[Callable] = None):
+    """Cached index over ``chunks`` (ordered as given) for a document
+
+    Built from the document's memory-mapped vector files when they match
+    the chunks; otherwise from the stored chunk embeddings, after which the
+    files are (re)written. Chunks without an embedding, or with one from
+    another model or version that the re-embedding job (api/reembed.py)
+    hasn't reached yet, are embedded with ``embed_texts``. Chunks loaded
+    without their embeddings pass ``load_embeddings`` (see
+    _embedding_sources), which is only called on this path. Flat indexes
+    search the mapped array directly, so worker processes share its pages;
+    quantized kinds keep just their codes in memory and rescore from the
+    mapping. The cache entry is rebuilt when the document's chunks change;
+    nothing is cached without a document_id.
+    """
+    key = (document_id, VECTOR_INDEX, EMBEDDING_MODEL, EMBEDDING_VERSION, len(chunks), max(getattr(chunk, "id", 0) or 0 for chunk in chunks))
+    if document_id is not None:
+        entry = _index_cache.get(document_id)
+        record_cache("vector_index", entry is not None and entry.key == key)
+        if entry is not None and entry.key == key:
+            return entry
+
+    mapped = load_document_vectors(document_id, chunks)
+    if mapped is not None:
+        entry = DocumentIndex(key, build_index(mapped, normalized=True), {}, mapped)
+    else:
+        vectors = [_chunk_vector(source) for source in _embedding_sources(chunks, range(len(chunks)), load_embeddings)]
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        extra_vectors = {}
+        if missing:
+            texts = [getattr(chunks[i], "content", None) or str(chunks[i]) for i in missing]
+            for i, vector in zip(missing, embed_texts(texts)):
+                vectors[i] = extra_vectors[i] = vector
+        mapped = save_document_vectors(document_id, _chunk_ids(chunks), vectors)
+        if mapped is not None:
+            entry = DocumentIndex(key, build_index(mapped, normalized=True), {}, mapped)
+        else:
+            entry = DocumentIndex(key, build_index(vectors), extra_vectors)
+    if document_id is not None:
+        _index_cache.set(document_id, entry)
+    return entry
+
+
+def search_chunks(entry, chunks, query_vectors, k: int, load_embeddings: Optional[Callable] = None):
+    """Positions in ``chunks`` of the top-k hits for each query vector"""
+    def fetch_vectors(positions):
+        if entry.vectors is not None:
+            return entry.vectors[positions]
+        positions = positions.tolist()
+        sources = _embedding_sources(chunks, positions, load_embeddings)
+        return [entry.extra_vectors.get(p) or _chunk_vector(source) for p, source in zip(positions, sources)]
+
+    _, positions = search(entry.index, query_vectors, k, fetch_vectors)
+    return [[p for p in row if p >= 0] for row in positions.tolist()]
+
+
+def invalidate_document(document_id):
+    _index_cache.pop(document_id)
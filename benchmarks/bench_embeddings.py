@@ -0,0 +1,101 @@
+"""Throughput and drift of the embedding backends
+
+Embeds the same generated chunk texts with the PyTorch backend
+(sentence-transformers) and with ONNX Runtime (api/onnx_embeddings.py), fp32
+and int8, and reports texts/sec per thread count plus the cosine similarity
+of each ONNX vector to the PyTorch one (the drift stored chunks would see
+when switching EMBEDDING_BACKEND) and how often the top-k chunks for a set
+of queries stay the same.
+
+    python benchmarks/bench_embeddings.py --texts 512 --threads 1 2 4
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import common  # noqa: E402
+
+
+def timed_embed(model, texts, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        vectors = model.embed_documents(texts)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return vectors, best
+
+
+def drift(np, reference, vectors, queries_ref, queries, k):
+    reference, vectors = np.asarray(reference), np.asarray(vectors)
+    cosines = (reference * vectors).sum(axis=1) / (
+        np.linalg.norm(reference, axis=1) * np.linalg.norm(vectors, axis=1))
+    top_ref = np.argsort(-(np.asarray(queries_ref) @ reference.T), axis=1)[:, :k]
+    top = np.argsort(-(np.asarray(queries) @ vectors.T), axis=1)[:, :k]
+    overlap = np.mean([len(set(a) & set(b)) / k for a, b in zip(top_ref.tolist(), top.tolist())])
+    return {"cosine_mean": round(float(cosines.mean()), 6), "cosine_min": round(float(cosines.min()), 6),
+            f"top{k}_overlap": round(float(overlap), 4)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--texts", type=int, default=512)
+    parser.add_argument("--words", type=int, default=150, help="words per text (about one chunk)")
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=2)
+    parser.add_argument("--no-torch", action="store_true", help="skip the PyTorch backend (no drift numbers)")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--output", help="results JSON path (default: benchmarks/results/)")
+    args = parser.parse_args()
+
+    import numpy as np
+    from api.embeddings import EMBEDDING_MODEL, load_embeddings
+    from api.onnx_embeddings import OnnxEmbeddings
+
+    rng = random.Random(args.seed)
+    texts = [common.make_text(rng, args.words) for _ in range(args.texts)]
+    queries = [common.make_text(rng, 10) for _ in range(args.queries)]
+
+    runs = []
+    reference = reference_queries = None
+    if not args.no_torch:
+        import torch
+        for threads in args.threads:
+            torch.set_num_threads(threads)
+            model = load_embeddings("huggingface")
+            vectors, seconds = timed_embed(model, texts, args.repeat)
+            if reference is None:
+                reference, reference_queries = vectors, model.embed_documents(queries)
+            runs.append({"name": f"torch-t{threads}", "backend": "huggingface", "threads": threads,
+                         "texts_per_second": round(len(texts) / seconds, 2)})
+            print(f"{runs[-1]['name']:<16} {runs[-1]['texts_per_second']:>9} texts/s")
+
+    for quantized in (False, True):
+        for threads in args.threads:
+            model = OnnxEmbeddings(EMBEDDING_MODEL, threads=threads, quantized=quantized)
+            vectors, seconds = timed_embed(model, texts, args.repeat)
+            result = {"name": f"onnx{'-int8' if quantized else ''}-t{threads}", "backend": "onnx",
+                      "quantized": quantized, "threads": threads,
+                      "texts_per_second": round(len(texts) / seconds, 2)}
+            if reference is not None:
+                result.update(drift(np, reference, vectors, reference_queries,
+                                    model.embed_documents(queries), args.k))
+            runs.append(result)
+            line = f"{result['name']:<16} {result['texts_per_second']:>9} texts/s"
+            if reference is not None:
+                line += f"  cosine mean={result['cosine_mean']} min={result['cosine_min']}"
+                line += f"  top{args.k} overlap={result[f'top{args.k}_overlap']}"
+            print(line)
+
+    results = {"model": EMBEDDING_MODEL, "texts": args.texts, "words": args.words, "runs": runs,
+               "peak_rss_mb": common.peak_rss_mb()}
+    print(f"results written to {common.write_results('embeddings', results, args.output)}")
+
+
+if __name__ == "__main__":
+    main()
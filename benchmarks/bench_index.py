@@ -0,0 +1,94 @@
+"""Recall/latency/memory benchmark of the quantized indexes vs flat
+
+Builds flat, sq8 and ivfpq indexes (api/vector_index.py) over clustered
+synthetic unit vectors shaped like MiniLM embeddings, then reports
+recall@k against exact search (with and without exact re-scoring), query
+latency percentiles and index memory per vector.
+
+    python benchmarks/bench_index.py --sizes 1000 10000 50000 --queries 500
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import common  # noqa: E402
+
+
+def clustered_vectors(n, dim, clusters, rng):
+    import numpy as np
+
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    assignment = rng.integers(0, clusters, n)
+    vectors = centers[assignment] + 0.6 * rng.standard_normal((n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def recall(found, truth):
+    hits = sum(len(set(f) & set(t)) for f, t in zip(found, truth))
+    return round(hits / sum(len(t) for t in truth), 4)
+
+
+def bench_kind(vi, kind, vectors, queries, truth, k, rescore_factor):
+    build_start = time.perf_counter()
+    index = vi.build_index(vectors, kind)
+    build_s = time.perf_counter() - build_start
+
+    def fetch(positions):
+        return vectors[positions]
+
+    results = {"index": index.kind, "build_seconds": round(build_s, 4),
+               "bytes_per_vector": round(index.memory_bytes / len(vectors), 2)}
+    modes = [("raw", None)] if index.exact else [("raw", None), ("rescored", fetch)]
+    for mode, fetch_vectors in modes:
+        latencies, found = [], []
+        for query in queries:
+            start = time.perf_counter()
+            _, positions = vi.search(index, query[None, :], k, fetch_vectors, rescore_factor)
+            latencies.append(time.perf_counter() - start)
+            found.append(positions[0].tolist())
+        results[mode] = {"recall": recall(found, truth), **common.percentiles(latencies)}
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--rescore-factor", type=int, default=4)
+    parser.add_argument("--kinds", nargs="+", default=["flat", "sq8", "ivfpq"])
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--output", help="results JSON path (default: benchmarks/results/)")
+    args = parser.parse_args()
+
+    import numpy as np
+    from api import vector_index as vi
+
+    # Benchmark ivfpq at every size rather than silently falling back to sq8
+    vi.IVFPQ_MIN_VECTORS = min(args.sizes)
+    rng = np.random.default_rng(args.seed)
+    runs = []
+    for n in args.sizes:
+        vectors = clustered_vectors(n, args.dim, max(8, n // 200), rng)
+        queries = clustered_vectors(args.queries, args.dim, 8, rng)
+        _, truth = vi.FlatIndex(vectors).search(queries, args.k)
+        truth = truth.tolist()
+        for kind in args.kinds:
+            result = {"name": f"{kind}-{n}", "vectors": n, **bench_kind(vi, kind, vectors, queries, truth, args.k, args.rescore_factor)}
+            runs.append(result)
+            line = f"{result['name']:<14} {result['bytes_per_vector']:>8} B/vec"
+            for mode in ("raw", "rescored"):
+                if mode in result:
+                    line += f"  {mode}: recall={result[mode]['recall']} p50={result[mode]['p50']}ms p95={result[mode]['p95']}ms"
+            print(line)
+
+    results = {"dim": args.dim, "k": args.k, "rescore_factor": args.rescore_factor, "runs": runs,
+               "peak_rss_mb": common.peak_rss_mb()}
+    print(f"results written to {common.write_results('index', results, args.output)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""Offline benchmark for PDF ingestion and question answering
+
+Generates PDFs of several page counts, ingests each through
+``process_pdf_file`` + ``create_vector_store`` against a throwaway SQLite
+database, then answers questions with a stub LLM the way /api/ask does
+(chunks without embeddings, the cached per-document index over the
+memory-mapped vectors). Reports pages/sec and chunks/sec for ingestion,
+p50/p95/p99 QA latency (and the first, uncached question's) and peak RSS as
+JSON.
+
+    python benchmarks/bench_pipeline.py --pages 10 100 500 --questions 200
+    python benchmarks/bench_pipeline.py --fake-embeddings   # no model download
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import common  # noqa: E402
+
+QUESTIONS = [
+    "What are the termination notice obligations?",
+    "Summarize the warranty clause.",
+    "Which party is responsible for maintenance and repair?",
+    "What is the forecast for revenue growth?",
+    "How is insurance coverage handled?",
+    "What does the audit policy require?",
+    "When is payment due on an invoice?",
+    "What are the compliance risks?",
+]
+
+
+def bench_ingestion(api, server, workdir, page_counts, seed):
+    from api import crud, models
+    from api.database import SessionLocal
+    from api.pdf_processor import process_pdf_file, create_vector_store
+
+    results = []
+    document_ids = {}
+    db = SessionLocal()
+    try:
+        crud.create_user(db, {"clerk_id": "bench_user", "email": "bench@example.com"})
+        for pages in page_counts:
+            filename = f"bench-{pages}.pdf"
+            common.generate_pdf(os.path.join(workdir, filename), pages, seed=seed + pages)
+            url = f"{server.base_url}/{filename}"
+            document = crud.create_document(db, {
+                "filename": filename,
+                "fileUrl": url,
+                "key": f"bench-{pages}-{seed}",
+                "fileSize": os.path.getsize(os.path.join(workdir, filename)),
+                "fileType": "application/pdf",
+            }, "bench_user")
+
+            start = time.perf_counter()
+            documents = process_pdf_file(url)
+            extracted = time.perf_counter()
+            create_vector_store(documents, document.id, db)
+            elapsed = time.perf_counter() - start
+
+            chunk_count = db.query(models.DocumentChunk).filter(
+                models.DocumentChunk.document_id == document.id
+            ).count()
+            document_ids[pages] = document.id
+            results.append({
+                "pages": pages,
+                "chunks": chunk_count,
+                "seconds": round(elapsed, 4),
+                "extraction_seconds": round(extracted - start, 4),
+                "pages_per_sec": round(pages / elapsed, 2),
+                "chunks_per_sec": round(chunk_count / elapsed, 2),
+            })
+            print(f"ingest {pages:>5} pages: {elapsed:8.2f}s  "
+                  f"{pages / elapsed:8.1f} pages/s  {chunk_count / elapsed:8.1f} chunks/s")
+    finally:
+        db.close()
+    return results, document_ids
+
+
+def bench_questions(api, document_id, count, seed):
+    from api import crud
+    from api.database import SessionLocal
+    from api.pdf_processor import answer_question
+
+    rng = random.Random(seed)
+    latencies = []
+    db = SessionLocal()
+    try:
+        for _ in range(count):
+            question = rng.choice(QUESTIONS)
+            start = time.perf_counter()
+            # Same work as the /api/ask background task (index.process_answer)
+            chunks = crud.get_document_chunks(db, document_id, embeddings=False)
+            answer_question(question, chunks, document_id,
+                            lambda chunk_ids: crud.get_chunk_embeddings(db, chunk_ids))
+            latencies.append(time.perf_counter() - start)
+    finally:
+        db.close()
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 100, 500])
+    parser.add_argument("--questions", type=int, default=100)
+    parser.add_argument("--qa-pages", type=int, help="page count of the document to query (default: largest)")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="seconds the stub LLM sleeps per call")
+    parser.add_argument("--fake-embeddings", action="store_true")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--output", help="results JSON path (default: benchmarks/results/)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        api = common.setup_database(workdir)
+        from api.embeddings import set_embeddings
+        from api.llm import set_llm
+
+        if args.fake_embeddings:
+            set_embeddings(common.fake_embeddings())
+        set_llm(common.stub_llm(args.llm_latency))
+
+        with common.FileServer(workdir) as server:
+            ingestion, document_ids = bench_ingestion(api, server, workdir, args.pages, args.seed)
+
+        qa_pages = args.qa_pages or max(args.pages)
+        latencies = bench_questions(api, document_ids[qa_pages], args.questions, args.seed)
+        qa = {"pages": qa_pages, "questions": args.questions, **common.percentiles(latencies),
+              "first_ms": round(latencies[0] * 1000, 3) if latencies else None}
+        print(f"qa over {qa_pages} pages: p50={qa['p50']}ms p95={qa['p95']}ms p99={qa['p99']}ms "
+              f"first={qa['first_ms']}ms")
+
+        results = {
+            "config": {
+                "fake_embeddings": args.fake_embeddings,
+                "llm_latency": args.llm_latency,
+                "seed": args.seed,
+            },
+            "ingestion": ingestion,
+            "qa": qa,
+            "peak_rss_mb": common.peak_rss_mb(),
+        }
+        path = common.write_results("pipeline", results, args.output)
+        print(f"peak RSS {results['peak_rss_mb']} MB; results written to {path}")
+
+
+if __name__ == "__main__":
+    main()
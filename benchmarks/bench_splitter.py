@@ -0,0 +1,121 @@
+"""Benchmark the token-aware splitter against RecursiveCharacterTextSplitter
+
+Splits generated page texts (1,000 pages by default) with both splitters and
+reports time, chunk counts, speedup, and how many chunks exceed the
+embedding model's 256-token input limit (those get silently truncated).
+
+Pass the embedding model's tokenizer.json with --tokenizer when it can't be
+downloaded: without it the token splitter falls back to counting words, and
+its timing says nothing about ingestion. --rare-words mixes in distinct
+words (figures, identifiers) so the vocabulary isn't unrealistically small.
+
+    python benchmarks/bench_splitter.py --pages 1000 --repeat 3 --tokenizer path/to/tokenizer.json
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import common  # noqa: E402
+
+MODEL_MAX_TOKENS = 256
+
+
+def best_time(fn, repeat):
+    best, result = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def add_rare_words(rng, text, rate):
+    """Replace about ``rate`` of the words with one-off figures and identifiers"""
+    words = text.split()
+    for i in range(len(words)):
+        if rng.random() < rate:
+            words[i] = rng.choice((
+                lambda: f"{rng.randint(0, 10**6):,}",
+                lambda: f"INV-{rng.randint(10**4, 10**6)}",
+                lambda: "".join(rng.choice("bcdfghjklmnprstvz") + rng.choice("aeiou") for _ in range(rng.randint(2, 5))),
+            ))()
+    return " ".join(words)
+
+
+def over_limit(texts, tokenizer):
+    if tokenizer is None:
+        return None
+    # +2 for the [CLS] and [SEP] tokens the model adds
+    return sum(1 for e in tokenizer.encode_batch(texts, add_special_tokens=False)
+               if len(e.ids) + 2 > MODEL_MAX_TOKENS)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=1000)
+    parser.add_argument("--words-per-page", type=int, default=450)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--rare-words", type=float, default=0.05, help="fraction of words made distinct")
+    parser.add_argument("--tokenizer", help="tokenizer.json of the embedding model (default: download it)")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--output", help="results JSON path (default: benchmarks/results/)")
+    args = parser.parse_args()
+
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+    from langchain_core.documents import Document
+    from api.text_splitter import TokenTextSplitter, get_tokenizer
+
+    rng = random.Random(args.seed)
+    documents = [
+        Document(page_content=add_rare_words(rng, common.make_text(rng, args.words_per_page), args.rare_words),
+                 metadata={"page": i})
+        for i in range(args.pages)
+    ]
+    if args.tokenizer:
+        from tokenizers import Tokenizer
+        tokenizer = Tokenizer.from_file(args.tokenizer)
+        tokenizer.no_truncation()
+        tokenizer.no_padding()
+    else:
+        tokenizer = get_tokenizer()
+    if tokenizer is None:
+        print("warning: no model tokenizer, timing the word approximation (pass --tokenizer)")
+
+    recursive = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
+    token = TokenTextSplitter(tokenizer=tokenizer or False)
+    token.split_documents(documents[:1])  # warm up the tokenizer
+
+    recursive_s, recursive_chunks = best_time(lambda: recursive.split_documents(documents), args.repeat)
+    token_s, token_chunks = best_time(lambda: token.split_documents(documents), args.repeat)
+
+    results = {
+        "pages": args.pages,
+        "words_per_page": args.words_per_page,
+        "rare_words": args.rare_words,
+        "tokenizer": "model" if tokenizer is not None else "word-approximation",
+        "recursive": {
+            "seconds": round(recursive_s, 4),
+            "chunks": len(recursive_chunks),
+            "over_token_limit": over_limit([c.page_content for c in recursive_chunks], tokenizer),
+        },
+        "token": {
+            "seconds": round(token_s, 4),
+            "chunks": len(token_chunks),
+            "over_token_limit": over_limit([c.page_content for c in token_chunks], tokenizer),
+        },
+        "speedup": round(recursive_s / token_s, 2),
+    }
+    print(f"recursive: {recursive_s:.3f}s {len(recursive_chunks)} chunks, "
+          f"{results['recursive']['over_token_limit']} over {MODEL_MAX_TOKENS} tokens")
+    print(f"token:     {token_s:.3f}s {len(token_chunks)} chunks, "
+          f"{results['token']['over_token_limit']} over {MODEL_MAX_TOKENS} tokens")
+    print(f"speedup:   {results['speedup']}x")
+    print(f"results written to {common.write_results('splitter', results, args.output)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""Shared helpers for the offline benchmarks
+
+Everything here runs without network access: PDFs are generated locally,
+served from a local HTTP server, stored in a throwaway SQLite database, and
+answered by a stub LLM. ``--fake-embeddings`` swaps the MiniLM model for a
+deterministic hashing embedder when the model isn't available offline.
+"""
+import hashlib
+import http.server
+import json
+import math
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import threading
+import time
+from functools import partial
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+WORDS = (
+    "revenue contract liability invoice payment quarter growth margin customer "
+    "supplier agreement warranty clause section schedule termination notice party "
+    "obligation delivery service level report analysis forecast risk compliance "
+    "audit policy procedure employee benefit insurance claim coverage premium "
+    "property lease tenant landlord maintenance repair budget capital expense"
+).split()
+
+
+def setup_database(workdir: str):
+    """Point the API at a fresh SQLite database and vector store and create the schema
+
+    Must run before anything imports ``api``; returns the api package.
+    """
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    # Document IDs restart at 1, so vector files from other runs must not be found
+    os.environ["VECTOR_STORE_DIR"] = os.path.join(workdir, "vectors")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    import api.database
+    from api.migrations import run_migrations
+    from api.observability import configure_logging
+
+    configure_logging()
+    run_migrations(api.database.engine)
+    return api
+
+
+def make_text(rng: random.Random, words: int) -> str:
+    sentences = []
+    while words > 0:
+        n = min(words, rng.randint(8, 20))
+        sentence = " ".join(rng.choice(WORDS) for _ in range(n))
+        sentences.append(sentence.capitalize() + ".")
+        words -= n
+    return " ".join(sentences)
+
+
+def generate_pdf(path: str, pages: int, words_per_page: int = 350, seed: int = 0):
+    """Write a text PDF with ``pages`` pages of deterministic filler"""
+    import fitz
+
+    rng = random.Random(seed)
+    doc = fitz.open()
+    for i in range(pages):
+        page = doc.new_page()
+        text = f"Page {i + 1}\n\n" + make_text(rng, words_per_page)
+        page.insert_textbox(fitz.Rect(50, 50, 550, 800), text, fontsize=9)
+    doc.save(path)
+    doc.close()
+    return path
+
+
+class FileServer:
+    """Serve a directory over HTTP on a free local port"""
+
+    def __init__(self, directory: str):
+        handler = partial(_QuietHandler, directory=directory)
+        self.httpd = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class _QuietHandler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def fake_embeddings(dim: int = 384):
+    """Deterministic feature-hashing embedder with the langchain interface"""
+    import numpy as np
+    from langchain_core.embeddings import Embeddings
+
+    class HashingEmbeddings(Embeddings):
+        def _embed(self, text):
+            vector = np.zeros(dim, dtype=np.float32)
+            for word in text.lower().split():
+                h = int.from_bytes(hashlib.blake2b(word.encode(), digest_size=8).digest(), "little")
+                vector[h % dim] += 1.0 if (h >> 32) & 1 else -1.0
+            norm = np.linalg.norm(vector)
+            return (vector / norm if norm else vector).tolist()
+
+        def embed_documents(self, texts):
+            return [self._embed(t) for t in texts]
+
+        def embed_query(self, text):
+            return self._embed(text)
+
+    return HashingEmbeddings()
+
+
+def stub_llm(latency: float = 0.0):
+    """LLM stand-in that sleeps ``latency`` seconds and echoes the question"""
+    from langchain_core.language_models.llms import LLM
+
+    class StubLLM(LLM):
+        delay: float = 0.0
+
+        @property
+        def _llm_type(self):
+            return "stub"
+
+        def _call(self, prompt, stop=None, run_manager=None, **kwargs):
+            if self.delay:
+                time.sleep(self.delay)
+            question = prompt.split("Question:")[-1].split("Answer:")[0].strip()
+            return f"Stub answer to: {question}"
+
+    return StubLLM(delay=latency)
+
+
+def percentiles(samples, points=(50, 95, 99)):
+    """Nearest-rank percentiles in milliseconds from samples in seconds"""
+    if not samples:
+        return {f"p{p}": None for p in points}
+    ordered = sorted(samples)
+    out = {}
+    for p in points:
+        rank = max(1, math.ceil(p / 100 * len(ordered)))
+        out[f"p{p}"] = round(ordered[rank - 1] * 1000, 3)
+    return out
+
+
+def peak_rss_mb():
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True, stderr=subprocess.DEVNULL
+        ).strip()
+    except Exception:
+        return "unknown"
+
+
+def write_results(name: str, results: dict, output: str = None):
+    """Write results plus environment metadata as JSON; returns the path"""
+    commit = git_commit()
+    payload = {
+        "benchmark": name,
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "results": results,
+    }
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"{name}-{commit}.json")
+    with open(output, "w") as f:
+        json.dump(payload, f, indent=2, sort_keys=True)
+    return output
@@ -0,0 +1,48 @@
+"""Compare two benchmark result files
+
+Prints every numeric metric that appears in both files with its relative
+change, e.g. results from the base branch against a feature branch.
+
+    python benchmarks/compare.py results/pipeline-abc123.json results/pipeline-def456.json
+"""
+import argparse
+import json
+
+
+def flatten(value, prefix=""):
+    """Yield (dotted_path, number) for every numeric leaf"""
+    if isinstance(value, dict):
+        for key, item in value.items():
+            yield from flatten(item, f"{prefix}.{key}" if prefix else str(key))
+    elif isinstance(value, list):
+        for i, item in enumerate(value):
+            # Label list entries by a distinguishing field when there is one
+            label = next((f"{k}={item[k]}" for k in ("pages", "name", "kind") if isinstance(item, dict) and k in item), str(i))
+            yield from flatten(item, f"{prefix}[{label}]")
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        yield prefix, value
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("base")
+    parser.add_argument("head")
+    args = parser.parse_args()
+
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.head) as f:
+        head = json.load(f)
+
+    print(f"{base.get('benchmark')}: {base.get('commit')} -> {head.get('commit')}")
+    base_metrics = dict(flatten(base["results"]))
+    for path, new in flatten(head["results"]):
+        old = base_metrics.get(path)
+        if old is None:
+            continue
+        change = f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+        print(f"  {path:<50} {old:>12} -> {new:>12}  {change}")
+
+
+if __name__ == "__main__":
+    main()
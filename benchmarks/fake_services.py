@@ -0,0 +1,140 @@
+"""Local stand-ins for UploadThing, S3 and the Hugging Face endpoint
+
+One threaded HTTP server answers all three so load tests never leave the
+machine:
+
+- ``POST /api/uploadFiles``  UploadThing presign: one presigned POST per file
+- ``POST /s3/upload``        presigned S3 upload target (body is discarded)
+- ``GET  /files/<key>``      public file URL; always serves the sample PDF
+- ``POST /hf/generate``      text-generation endpoint with configurable latency
+
+    python benchmarks/fake_services.py --port 9100 --pages 20 --llm-latency 0.5
+"""
+import argparse
+import http.server
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import common  # noqa: E402
+
+
+class FakeServices:
+    def __init__(self, host="127.0.0.1", port=0, pdf_pages=20, llm_latency=0.0):
+        with tempfile.TemporaryDirectory() as workdir:
+            path = common.generate_pdf(os.path.join(workdir, "sample.pdf"), pdf_pages)
+            with open(path, "rb") as f:
+                self.pdf_bytes = f.read()
+        self.llm_latency = llm_latency
+        self.counts = {"presign": 0, "s3": 0, "download": 0, "llm": 0}
+        self._lock = threading.Lock()
+
+        services = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _read_body(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                return self.rfile.read(length) if length else b""
+
+            def _send(self, status, body=b"", content_type="application/json"):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                body = self._read_body()
+                if self.path.startswith("/api/uploadFiles"):
+                    services._count("presign")
+                    files = json.loads(body or b"{}").get("files", [])
+                    data = []
+                    for file in files:
+                        key = uuid.uuid4().hex
+                        data.append({
+                            "key": key,
+                            "url": f"{services.base_url}/s3/upload",
+                            "fields": {"key": key},
+                            "fileUrl": f"{services.base_url}/files/{key}",
+                            "name": file.get("name"),
+                        })
+                    self._send(200, json.dumps({"data": data}).encode())
+                elif self.path.startswith("/s3/upload"):
+                    services._count("s3")
+                    self._send(204)
+                elif self.path.startswith("/hf/"):
+                    services._count("llm")
+                    if services.llm_latency:
+                        time.sleep(services.llm_latency)
+                    text = json.dumps([{"generated_text": "Fake answer from the local LLM stand-in."}])
+                    self._send(200, text.encode())
+                else:
+                    self._send(404, b"{}")
+
+            def do_GET(self):
+                if self.path.startswith("/files/"):
+                    services._count("download")
+                    self._send(200, services.pdf_bytes, "application/pdf")
+                else:
+                    self._send(404, b"{}")
+
+        self.httpd = http.server.ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def _count(self, name):
+        with self._lock:
+            self.counts[name] += 1
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def env(self):
+        """Environment variables that point the API at these stand-ins"""
+        return {
+            "UPLOADTHING_API_KEY": "fake-uploadthing-key",
+            "UPLOADTHING_API_URL": f"{self.base_url}/api/uploadFiles",
+            "HUGGINGFACEHUB_API_TOKEN": "fake-hf-token",
+            "HUGGINGFACE_ENDPOINT_URL": f"{self.base_url}/hf/generate",
+        }
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--pages", type=int, default=20, help="pages in the served sample PDF")
+    parser.add_argument("--llm-latency", type=float, default=0.0)
+    args = parser.parse_args()
+
+    services = FakeServices(args.host, args.port, args.pages, args.llm_latency).start()
+    for key, value in services.env().items():
+        print(f"export {key}={value}")
+    try:
+        services.thread.join()
+    except KeyboardInterrupt:
+        services.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Report the import-time cost of the API module
+
+Runs ``python -X importtime -c "import api.index"`` in a fresh interpreter
+and prints the total plus the slowest top-level imports, so cold-start
+regressions (e.g. an eager langchain/torch import) show up immediately.
+
+    python benchmarks/import_profile.py [--module api.index] [--top 15] [--json out.json]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def profile_imports(module: str):
+    """Return [(cumulative_us, self_us, depth, name)] for one fresh import"""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr[-2000:]}")
+
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((int(cumulative_us), int(self_us), depth, name.strip()))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--module", default="api.index")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--json", help="write the report to this file")
+    args = parser.parse_args()
+
+    rows = profile_imports(args.module)
+    target = next((r for r in rows if r[3] == args.module), None)
+    total_us = target[0] if target else sum(r[1] for r in rows)
+    top_level = sorted((r for r in rows if r[2] <= 1 and r[3] != args.module), reverse=True)[: args.top]
+
+    print(f"import {args.module}: {total_us / 1000:.1f} ms ({len(rows)} modules)")
+    for cumulative_us, _, _, name in top_level:
+        print(f"  {cumulative_us / 1000:9.1f} ms  {name}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({
+                "module": args.module,
+                "total_ms": total_us / 1000,
+                "modules": len(rows),
+                "top": [{"name": n, "cumulative_ms": c / 1000} for c, _, _, n in top_level],
+            }, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
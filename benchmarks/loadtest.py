@@ -0,0 +1,272 @@
+"""Load test for the FastAPI endpoints with local service stand-ins
+
+Starts the fake UploadThing/S3/Hugging Face services, launches one uvicorn
+worker against a throwaway SQLite database (or targets ``--target``), then
+drives /api/upload, /api/ask, /api/questions/{id} and /api/documents with a
+weighted mix of operations from ``--concurrency`` concurrent clients.
+Reports per-operation throughput and tail latency, plus event-loop lag both
+as seen by the server's lag monitor and by a client probing /api/hello.
+
+    python benchmarks/loadtest.py --concurrency 50 --duration 30 \\
+        --mix upload=1,ask=5,questions=10,documents=4
+"""
+import argparse
+import asyncio
+import base64
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import common  # noqa: E402
+from fake_services import FakeServices  # noqa: E402
+
+LAG_METRIC = "pdfetch_event_loop_lag_seconds"
+QUESTIONS = [
+    "What are the termination notice obligations?",
+    "Summarize the warranty clause.",
+    "What is the forecast for revenue growth?",
+    "How is insurance coverage handled?",
+]
+
+
+def parse_mix(value: str):
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        if name not in ("upload", "ask", "questions", "documents"):
+            raise argparse.ArgumentTypeError(f"unknown operation: {name}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def dev_token(user_id: str) -> str:
+    """Unsigned JWT carrying ``sub``; the API only reads the subject claim"""
+    def encode(obj):
+        return base64.urlsafe_b64encode(json.dumps(obj).encode()).rstrip(b"=").decode()
+    return f"{encode({'alg': 'none'})}.{encode({'sub': user_id})}.sig"
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_api(workdir, services, port):
+    env = dict(os.environ)
+    env.update(services.env())
+    env.update({
+        "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'loadtest.db')}",
+        "LOG_LEVEL": env.get("LOG_LEVEL", "WARNING"),
+        "EVENT_LOOP_LAG_INTERVAL": "0.1",
+    })
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "api.index:app", "--host", "127.0.0.1",
+         "--port", str(port), "--workers", "1", "--log-level", "warning"],
+        cwd=common.ROOT,
+        env=env,
+    )
+
+
+async def wait_ready(client, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get("/api/hello")).status_code == 200:
+                return
+        except Exception:
+            pass
+        await asyncio.sleep(0.25)
+    raise RuntimeError("API did not become ready")
+
+
+def parse_histogram(text, name):
+    """{le: cumulative_count} for an unlabelled histogram in /metrics text"""
+    buckets = {}
+    for line in text.splitlines():
+        if line.startswith(f"{name}_bucket"):
+            le = line.split('le="', 1)[1].split('"', 1)[0]
+            buckets[float("inf") if le == "+Inf" else float(le)] = float(line.rsplit(" ", 1)[1])
+    return buckets
+
+
+def histogram_quantiles(before, after, points=(50, 95, 99)):
+    """Upper-bound quantiles (ms) from the bucket delta between two scrapes"""
+    delta = sorted((le, after.get(le, 0) - before.get(le, 0)) for le in after)
+    total = delta[-1][1] if delta else 0
+    out = {"samples": int(total)}
+    for p in points:
+        target = total * p / 100
+        bound = next((le for le, count in delta if count >= target), None) if total else None
+        out[f"p{p}_le_ms"] = None if bound is None or bound == float("inf") else bound * 1000
+    return out
+
+
+class LoadTest:
+    def __init__(self, client, pdf_bytes, mix, users):
+        self.client = client
+        self.pdf_bytes = pdf_bytes
+        self.ops = list(mix)
+        self.weights = [mix[op] for op in self.ops]
+        self.headers = [{"Authorization": f"Bearer {dev_token(f'loadtest_user_{i}')}"} for i in range(users)]
+        self.documents = {i: [] for i in range(users)}
+        self.latencies = {op: [] for op in self.ops}
+        self.errors = {op: 0 for op in self.ops}
+
+    async def upload(self, user):
+        files = {"file": ("loadtest.pdf", self.pdf_bytes, "application/pdf")}
+        response = await self.client.post("/api/upload", files=files, headers=self.headers[user])
+        if response.status_code == 200:
+            self.documents[user].append(response.json()["documentId"])
+        return response
+
+    async def ask(self, user):
+        document_id = random.choice(self.documents[user])
+        body = {"content": random.choice(QUESTIONS), "document_id": document_id}
+        return await self.client.post("/api/ask", json=body, headers=self.headers[user])
+
+    async def questions(self, user):
+        document_id = random.choice(self.documents[user])
+        return await self.client.get(f"/api/questions/{document_id}", headers=self.headers[user])
+
+    async def documents_list(self, user):
+        return await self.client.get("/api/documents", headers=self.headers[user])
+
+    async def run_op(self, op, user):
+        if op in ("ask", "questions") and not self.documents[user]:
+            op = "upload"
+        handler = {
+            "upload": self.upload,
+            "ask": self.ask,
+            "questions": self.questions,
+            "documents": self.documents_list,
+        }[op]
+        start = time.perf_counter()
+        try:
+            response = await handler(user)
+            ok = response.status_code < 400
+        except Exception:
+            ok = False
+        self.latencies.setdefault(op, []).append(time.perf_counter() - start)
+        if not ok:
+            self.errors[op] = self.errors.get(op, 0) + 1
+
+    async def worker(self, index, deadline):
+        user = index % len(self.headers)
+        while time.monotonic() < deadline:
+            op = random.choices(self.ops, self.weights)[0]
+            await self.run_op(op, user)
+
+
+async def probe_lag(client, deadline, interval=0.1):
+    """Client-side view of loop responsiveness: /api/hello round-trip times"""
+    samples = []
+    while time.monotonic() < deadline:
+        start = time.perf_counter()
+        try:
+            await client.get("/api/hello")
+            samples.append(time.perf_counter() - start)
+        except Exception:
+            pass
+        await asyncio.sleep(interval)
+    return samples
+
+
+async def run(args, base_url, pdf_bytes):
+    import httpx
+
+    limits = httpx.Limits(max_connections=args.concurrency + 2, max_keepalive_connections=args.concurrency + 2)
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+        await wait_ready(client)
+        test = LoadTest(client, pdf_bytes, args.mix, args.users)
+        # Give every user a document so ask/questions have something to hit
+        await asyncio.gather(*(test.upload(user) for user in range(args.users)))
+
+        metrics_before = (await client.get("/metrics")).text
+        start = time.monotonic()
+        deadline = start + args.duration
+        probe = asyncio.create_task(probe_lag(client, deadline))
+        await asyncio.gather(*(test.worker(i, deadline) for i in range(args.concurrency)))
+        elapsed = time.monotonic() - start
+        probe_samples = await probe
+        metrics_after = (await client.get("/metrics")).text
+
+    operations = {}
+    for op, samples in test.latencies.items():
+        operations[op] = {
+            "requests": len(samples),
+            "errors": test.errors.get(op, 0),
+            "rps": round(len(samples) / elapsed, 2),
+            **common.percentiles(samples, (50, 95, 99, 100)),
+        }
+    total = sum(len(s) for s in test.latencies.values())
+    return {
+        "config": {
+            "concurrency": args.concurrency,
+            "duration": args.duration,
+            "mix": args.mix,
+            "users": args.users,
+            "pdf_pages": args.pdf_pages,
+            "llm_latency": args.llm_latency,
+        },
+        "throughput_rps": round(total / elapsed, 2),
+        "operations": operations,
+        "event_loop_lag": histogram_quantiles(
+            parse_histogram(metrics_before, LAG_METRIC), parse_histogram(metrics_after, LAG_METRIC)
+        ),
+        "probe_latency": common.percentiles(probe_samples, (50, 95, 99, 100)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("upload=1,ask=5,questions=10,documents=4"))
+    parser.add_argument("--users", type=int, default=5)
+    parser.add_argument("--pdf-pages", type=int, default=20)
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="seconds per fake LLM call")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--target", help="base URL of an already running API (skips launching one)")
+    parser.add_argument("--output", help="results JSON path (default: benchmarks/results/)")
+    args = parser.parse_args()
+
+    services = FakeServices(pdf_pages=args.pdf_pages, llm_latency=args.llm_latency).start()
+    api_process = None
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            base_url = args.target
+            if not base_url:
+                port = free_port()
+                api_process = start_api(workdir, services, port)
+                base_url = f"http://127.0.0.1:{port}"
+            results = asyncio.run(run(args, base_url, services.pdf_bytes))
+            results["fake_service_calls"] = dict(services.counts)
+            if api_process:
+                api_process.terminate()
+                api_process.wait(timeout=30)
+                api_process = None
+    finally:
+        if api_process:
+            api_process.kill()
+        services.stop()
+
+    print(f"throughput: {results['throughput_rps']} req/s")
+    for op, stats in results["operations"].items():
+        print(f"  {op:<10} {stats['requests']:>7} req  {stats['errors']:>5} err  "
+              f"p50={stats['p50']}ms p99={stats['p99']}ms max={stats['p100']}ms")
+    lag = results["event_loop_lag"]
+    print(f"event loop lag (server): p50<={lag['p50_le_ms']}ms p99<={lag['p99_le_ms']}ms "
+          f"over {lag['samples']} probes")
+    print(f"/api/hello probe (client): {results['probe_latency']}")
+    print(f"results written to {common.write_results('loadtest', results, args.output)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -27,6 +27,8 @@ export default function DocumentDetail() {
   const [document, setDocument] = useState(null);
   const [questions, setQuestions] = useState([]);
   const [newQuestion, setNewQuestion] = useState("");
+  const [suggestions, setSuggestions] = useState([]);
+  const [summary, setSummary] = useState(null);
   const [loading, setLoading] = useState(true);
   const [dataFetched, setDataFetched] = useState(false);
   const [asking, setAsking] = useState(false);
@@ -54,6 +56,18 @@ export default function DocumentDetail() {
         // Fetch questions for this document
         const questionsData = await apiClient.getDocumentQuestions(id);
         setQuestions(questionsData);
+
+        // Suggestions are optional; the page works without them
+        apiClient
+          .getSuggestedQuestions()
+          .then((data) => setSuggestions(data.questions || []))
+          .catch((err) => console.error("Error fetching suggestions:", err));
+
+        // Summaries are generated at ingestion when enabled; may not exist yet
+        apiClient
+          .getDocumentSummary(id)
+          .then((data) => setSummary(data.summary))
+          .catch((err) => console.error("Error fetching summary:", err));
       } catch (err) {
         console.error("Error fetching data:", err);
         setError(err.message || "Failed to load document details");
@@ -175,6 +189,13 @@ export default function DocumentDetail() {
             </a>
           </div>
         </div>
+
+        {summary && (
+          <div className="mt-6 pt-4 border-t border-gray-100">
+            <h2 className="text-sm font-semibold text-gray-700 mb-2">Summary</h2>
+            <p className="text-gray-600 whitespace-pre-line">{summary}</p>
+          </div>
+        )}
       </div>
 
       <div className="mb-8">
@@ -206,6 +227,21 @@ export default function DocumentDetail() {
             )}
           </button>
         </form>
+        {suggestions.length > 0 && (
+          <div className="flex flex-wrap gap-2 mt-3">
+            {suggestions.map((suggestion) => (
+              <button
+                key={suggestion}
+                type="button"
+                onClick={() => setNewQuestion(suggestion)}
+                className="px-3 py-1.5 text-sm text-gray-600 bg-gray-100 rounded-full hover:bg-green-50 hover:text-green-600 disabled:opacity-50 transition-colors"
+                disabled={asking}
+              >
+                {suggestion}
+              </button>
+            ))}
+          </div>
+        )}
       </div>
 
       <div>
@@ -130,6 +130,24 @@ export function useApiClient() {
       return response.json();
     },
 
+    getSuggestedQuestions: async () => {
+      const response = await makeRequest("/suggested-questions");
+      if (!response.ok) {
+        const errorData = await response.json().catch(() => ({}));
+        throw new Error(errorData.detail || "Failed to fetch suggested questions");
+      }
+      return response.json();
+    },
+
+    getDocumentSummary: async (documentId) => {
+      const response = await makeRequest(`/documents/${documentId}/summary`);
+      if (!response.ok) {
+        const errorData = await response.json().catch(() => ({}));
+        throw new Error(errorData.detail || "Failed to fetch document summary");
+      }
+      return response.json();
+    },
+
     askQuestion: async (content, documentId) => {
       const response = await makeRequest("/ask", {
         method: "POST",
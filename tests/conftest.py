@@ -0,0 +1,11 @@
+import os
+import sys
+import tempfile
+
+# The API reads its configuration at import time, so this runs before any test imports it
+_db_dir = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{_db_dir}/test.db"
+os.environ["VECTOR_STORE_DIR"] = os.path.join(_db_dir, "vectors")
+os.environ["WARM_SUGGESTED_QUESTIONS"] = "0"
+os.environ["INGESTION_SWEEP_INTERVAL"] = "0"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,61 @@
+import os
+
+import numpy as np
+from fastapi.testclient import TestClient
+
+from api import crud, index, mmap_store
+from api.database import SessionLocal
+from api.vector_index import save_document_vectors
+
+USER = "user_delete"
+
+
+def _create_pdf(db, key):
+    return crud.create_document(db, {
+        "filename": f"{key}.pdf", "fileUrl": f"https://example.com/{key}.pdf", "key": key,
+        "fileSize": 1, "fileType": "application/pdf",
+    }, USER).id
+
+
+def test_cancelled_ingestion_persists_nothing():
+    # Starting the app creates the schema
+    with TestClient(index.app):
+        db = SessionLocal()
+        try:
+            document_id = _create_pdf(db, "delete-cancelled")
+            crud.cancel_ingestion_job(db, document_id)
+
+            assert crud.ingestion_cancelled(db, document_id)
+            assert not crud.checkpoint_ingestion_embeddings(db, document_id, [("key", "[1.0]")])
+            assert not crud.replace_document_chunks(db, document_id, [{"chunk_index": 0, "content": "text"}],
+                                                    unless_cancelled=True)
+            assert crud.get_ingestion_embeddings(db, document_id) == {}
+            assert not crud.has_document_chunks(db, document_id)
+            assert not crud.finish_ingestion_job(db, document_id, "done")
+        finally:
+            db.close()
+
+
+def test_delete_cancels_ingestion():
+    with TestClient(index.app) as client:
+        db = SessionLocal()
+        try:
+            document_id = _create_pdf(db, "delete-endpoint")
+            assert not crud.ingestion_cancelled(db, document_id)
+            response = client.delete(f"/api/documents/{document_id}", headers={"x-user-id": USER})
+            assert response.status_code == 200
+            # The job goes with the document; a worker still running sees it as cancelled
+            assert crud.ingestion_cancelled(db, document_id)
+        finally:
+            db.close()
+
+
+def test_vector_files_written_during_a_delete_are_removed():
+    vectors = np.ones((2, 4), dtype=np.float32)
+    assert save_document_vectors(987654, [1, 2], vectors, cancelled=lambda: True) is None
+    assert not os.path.exists(os.path.join(mmap_store.VECTOR_STORE_DIR, "987654.json"))
+
+    # Cancelled while the files were being written
+    checks = iter([False, True])
+    assert save_document_vectors(987654, [1, 2], vectors, cancelled=lambda: next(checks)) is None
+    assert mmap_store.load(987654) is None
@@ -0,0 +1,49 @@
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+
+from api import crud, index
+from api.database import SessionLocal
+
+USER = "user_pagination"
+
+
+def _create_documents(created_at):
+    """One document per ``created_at`` text, stored as SQLite's CURRENT_TIMESTAMP default is"""
+    db = SessionLocal()
+    ids = []
+    for i, timestamp in enumerate(created_at):
+        document = crud.create_document(db, {
+            "filename": f"{i}.txt", "fileUrl": f"https://example.com/{i}.txt", "key": f"pagination-{i}",
+            "fileSize": 1, "fileType": "text/plain",
+        }, USER)
+        ids.append(document.id)
+        db.execute(text("UPDATE documents SET created_at = :t WHERE id = :id"), {"t": timestamp, "id": document.id})
+    db.commit()
+    db.close()
+    return ids
+
+
+def test_cursor_walks_every_page():
+    with TestClient(index.app) as client:
+        headers = {"x-user-id": USER}
+        # Two share a second, so the id tie-break is exercised too
+        ids = _create_documents([
+            "2026-01-01 10:00:00",
+            "2026-01-01 10:00:01",
+            "2026-01-01 10:00:01",
+            "2026-01-01 10:00:02",
+            "2026-01-01 10:00:03",
+        ])
+
+        pages, cursor = [], None
+        while True:
+            params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+            response = client.get("/api/documents", params=params, headers=headers)
+            assert response.status_code == 200
+            pages.append([document["id"] for document in response.json()])
+            cursor = response.headers.get("X-Next-Cursor")
+            if not cursor:
+                break
+            assert len(pages) <= len(ids)
+
+        assert pages == [[ids[4], ids[3]], [ids[2], ids[1]], [ids[0]]]
@@ -0,0 +1,31 @@
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+
+from api import crud, index
+from api.database import SessionLocal
+
+USER = "user_questions"
+
+
+def test_updated_since_honours_the_utc_offset():
+    with TestClient(index.app) as client:
+        db = SessionLocal()
+        document = crud.create_document(db, {
+            "filename": "q.txt", "fileUrl": "https://example.com/q.txt", "key": "questions-updated-since",
+            "fileSize": 1, "fileType": "text/plain",
+        }, USER)
+        document_id = document.id
+        ids = []
+        # Stored as SQLite's CURRENT_TIMESTAMP default is: naive UTC text
+        for content, created_at in (("early", "2026-01-01 10:00:00"), ("late", "2026-01-01 12:00:00")):
+            question = crud.create_question(db, {"content": content, "document_id": document_id}, USER)
+            ids.append(question.id)
+            db.execute(text("UPDATE questions SET created_at = :t WHERE id = :id"), {"t": created_at, "id": question.id})
+        db.commit()
+        db.close()
+
+        # 13:30+02:00 is 11:30 UTC, between the two questions
+        response = client.get(f"/api/questions/{document_id}", params={"updated_since": "2026-01-01T13:30:00+02:00"},
+                              headers={"x-user-id": USER})
+        assert response.status_code == 200
+        assert [question["id"] for question in response.json()] == [ids[1]]
@@ -0,0 +1,42 @@
+import pytest
+from fastapi import HTTPException
+
+from api import ratelimit
+from api.observability import INGESTION_QUEUE_DEPTH
+
+
+@pytest.fixture
+def ingestion_depth(monkeypatch):
+    monkeypatch.setattr(ratelimit, "INGESTION_QUEUE_LIMIT", 10)
+    previous = INGESTION_QUEUE_DEPTH.value()
+    yield INGESTION_QUEUE_DEPTH.set
+    INGESTION_QUEUE_DEPTH.set(previous)
+
+
+def test_batch_counts_against_remaining_capacity(ingestion_depth):
+    ingestion_depth(8)
+    ratelimit.admit_ingestion(2)
+    with pytest.raises(HTTPException) as exc:
+        ratelimit.admit_ingestion(3)
+    assert exc.value.status_code == 429
+    assert "Retry-After" in exc.value.headers
+
+
+def test_batch_bigger_than_the_queue_waits_for_it_to_drain(ingestion_depth):
+    ingestion_depth(1)
+    with pytest.raises(HTTPException):
+        ratelimit.admit_ingestion(50)
+    ingestion_depth(0)
+    ratelimit.admit_ingestion(50)
+
+
+def test_batch_bigger_than_the_burst_is_refused():
+    limiter = ratelimit.RateLimiter("ask", rate_per_minute=30, burst=30)
+    with pytest.raises(HTTPException) as exc:
+        ratelimit.check_rate_limit(limiter, "user", cost=100)
+    assert exc.value.status_code == 413
+    # The refused batch took nothing from the bucket
+    ratelimit.check_rate_limit(limiter, "user", cost=30)
+    with pytest.raises(HTTPException) as exc:
+        ratelimit.check_rate_limit(limiter, "user", cost=1)
+    assert exc.value.status_code == 429
@@ -0,0 +1,26 @@
+from fastapi.testclient import TestClient
+
+from api import crud, index
+from api.database import SessionLocal
+
+USER = "user_reembed"
+
+
+def test_chunks_without_embeddings_are_not_stale():
+    with TestClient(index.app):
+        db = SessionLocal()
+        try:
+            document_id = crud.create_document(db, {
+                "filename": "reembed.pdf", "fileUrl": "https://example.com/reembed.pdf", "key": "reembed",
+                "fileSize": 1, "fileType": "application/pdf",
+            }, USER).id
+            crud.replace_document_chunks(db, document_id, [
+                {"chunk_index": 0, "content": "old", "embedding": "[1.0]", "embedding_model": "old-model",
+                 "embedding_version": "1"},
+                {"chunk_index": 1, "content": "legacy", "embedding": "[1.0]"},
+                {"chunk_index": 2, "content": "Error processing document: boom"},
+            ])
+            stale = crud.get_stale_chunks(db, "new-model", "1", document_id=document_id)
+            assert [chunk.content for chunk in stale] == ["old", "legacy"]
+        finally:
+            db.close()
@@ -0,0 +1,33 @@
+from fastapi.testclient import TestClient
+
+from api import crud, index
+from api.database import SessionLocal
+
+USER = "user_reprocess"
+
+
+def test_reprocess_is_refused_while_the_job_is_running(monkeypatch):
+    enqueued = []
+    monkeypatch.setattr(index, "enqueue_document", lambda document_id, file_url: enqueued.append(document_id))
+    with TestClient(index.app) as client:
+        db = SessionLocal()
+        try:
+            document_id = crud.create_document(db, {
+                "filename": "reprocess.pdf", "fileUrl": "https://example.com/reprocess.pdf", "key": "reprocess",
+                "fileSize": 1, "fileType": "application/pdf",
+            }, USER).id
+            assert crud.start_ingestion_job(db, document_id, "https://example.com/reprocess.pdf", "worker-1", 120)
+
+            url = f"/api/documents/{document_id}/reprocess"
+            response = client.post(url, headers={"x-user-id": USER})
+            assert response.status_code == 409
+            assert enqueued == []
+
+            crud.finish_ingestion_job(db, document_id, "done")
+            response = client.post(url, headers={"x-user-id": USER})
+            assert response.status_code == 200
+            assert enqueued == [document_id]
+            # Queued for this request's process; a second reprocess waits for it
+            assert client.post(url, headers={"x-user-id": USER}).status_code == 409
+        finally:
+            db.close()
@@ -0,0 +1,82 @@
+import random
+
+from tokenizers import Tokenizer, models, normalizers, pre_tokenizers
+
+from api.text_splitter import TokenTextSplitter, WordPieceCounter
+
+SPECIAL = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"]
+PIECES = ["the", "report", "in", "inv", "total", "a", "b", "ab", "1", "12", "123", "x", ",", ".", "-", "(", ")"]
+CONTINUATIONS = ["##s", "##ed", "##ing", "##1", "##2", "##3", "##23", "##x", "##b", "##port"]
+
+
+def _tokenizer():
+    vocab = {token: i for i, token in enumerate(SPECIAL + PIECES + CONTINUATIONS)}
+    tokenizer = Tokenizer(models.WordPiece(vocab, unk_token="[UNK]", max_input_chars_per_word=20))
+    tokenizer.normalizer = normalizers.BertNormalizer(lowercase=True)
+    tokenizer.pre_tokenizer = pre_tokenizers.BertPreTokenizer()
+    tokenizer.add_special_tokens(SPECIAL)
+    return tokenizer
+
+
+def _words(rng, n):
+    alphabet = "abx123TheReportINV,.-()!?$“”’—é"
+    words = ["the", "Reports", "INV-12345", "report,", "(a)", "don’t", "café", "[CLS]", "x[sep]y",
+             "a" * 25, "1" * 20 + ".", "“Quoted”", "—", "reporting", "zzz", "€5"]
+    words += ["".join(rng.choice(alphabet) for _ in range(rng.randint(1, 12))) for _ in range(n)]
+    return words
+
+
+def test_counter_matches_the_tokenizer():
+    tokenizer = _tokenizer()
+    counter = WordPieceCounter.from_tokenizer(tokenizer)
+    words = _words(random.Random(3), 5000)
+    counts = counter.count(words)
+    expected = [len(e.ids) for e in tokenizer.encode_batch(words, add_special_tokens=False)]
+    handled = [(word, count, want) for word, count, want in zip(words, counts.tolist(), expected) if count >= 0]
+    assert len(handled) > len(words) // 2
+    assert [(word, count) for word, count, want in handled if count != want] == []
+    # Words the normalizer changes beyond ASCII case, and added tokens, are left to the tokenizer
+    assert counts[words.index("café")] == -1
+    assert counts[words.index("[CLS]")] == -1
+    assert counts[words.index("x[sep]y")] == -1
+
+
+def test_chunks_fit_the_token_limit():
+    tokenizer = _tokenizer()
+    rng = random.Random(5)
+    pages = [" ".join(_words(rng, 300)) for _ in range(5)]
+    splitter = TokenTextSplitter(chunk_tokens=60, overlap_tokens=10, tokenizer=tokenizer)
+    chunks = splitter.split_pages(pages)
+    assert chunks
+    for chunk in chunks:
+        assert chunk.token_count == len(tokenizer.encode(chunk.text, add_special_tokens=False).ids)
+        # Only a single word may exceed the window
+        assert chunk.token_count <= 60 or len(chunk.text.split()) == 1
+
+
+def test_word_offsets_line_up_with_str_split():
+    text = "a 中文 b \U0001F600x　y z  (é)\n\nlast"
+    offsets = TokenTextSplitter._word_offsets(text)
+    assert [text[start:end] for start, end in offsets.tolist()] == text.split()
+
+
+def test_lone_surrogates_are_replaced():
+    pages = ["broken \ud800 text", "more\udfff words"]
+    chunks = TokenTextSplitter(chunk_tokens=60, overlap_tokens=10, tokenizer=_tokenizer()).split_pages(pages)
+    assert [chunk.text for chunk in chunks] == ["broken \ufffd text\n\nmore\ufffd words"]
+
+
+def test_spans_are_relative_to_the_first_page():
+    rng = random.Random(7)
+    pages = [" ".join(_words(rng, 80)) for _ in range(4)]
+    splitter = TokenTextSplitter(chunk_tokens=60, overlap_tokens=10, tokenizer=_tokenizer())
+    chunks = splitter.split_pages(pages, page_numbers=[1, 2, 3, 4])
+    assert any(chunk.end_page > chunk.page for chunk in chunks)
+    for chunk in chunks:
+        page_text = pages[chunk.page - 1][chunk.start_char:chunk.end_char]
+        if chunk.end_page == chunk.page:
+            assert page_text == chunk.text
+        else:
+            # The span runs past the end of its first page
+            assert chunk.text.startswith(page_text + "\n\n")
+            assert chunk.end_char - chunk.start_char == len(chunk.text)
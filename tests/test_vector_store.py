@@ -0,0 +1,45 @@
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+
+from api import crud, index, pdf_processor
+from api.database import SessionLocal
+
+USER = "user_vector_store"
+
+
+class FailingEmbeddings:
+    def embed_documents(self, texts):
+        raise RuntimeError("embedding service unavailable")
+
+
+@pytest.fixture
+def failing_embeddings(monkeypatch):
+    monkeypatch.setattr(pdf_processor, "get_embeddings", FailingEmbeddings)
+    monkeypatch.setattr(pdf_processor, "split_documents", lambda documents: [
+        SimpleNamespace(page_content=f"chunk {i}", metadata={"page": 0}) for i in range(3)
+    ])
+
+
+def test_embedding_failure_is_raised_until_the_last_attempt(failing_embeddings):
+    with TestClient(index.app):
+        db = SessionLocal()
+        try:
+            document_id = crud.create_document(db, {
+                "filename": "embed.pdf", "fileUrl": "https://example.com/embed.pdf", "key": "embed",
+                "fileSize": 1, "fileType": "application/pdf",
+            }, USER).id
+            pages = [SimpleNamespace(page_content="text", metadata={"page": 0})]
+
+            # Raised so the ingestion job retries it, with nothing stored
+            with pytest.raises(RuntimeError):
+                pdf_processor.create_vector_store(pages, document_id, db)
+            assert not crud.has_document_chunks(db, document_id)
+
+            assert pdf_processor.create_vector_store(pages, document_id, db, allow_unembedded=True) is None
+            chunks = crud.get_document_chunks(db, document_id)
+            assert [chunk.content for chunk in chunks] == ["chunk 0", "chunk 1", "chunk 2"]
+            assert all(chunk.embedding is None for chunk in chunks)
+        finally:
+            db.close()